@@ -0,0 +1,62 @@
+"""Compare two benchmark results files written by `benchmarks.run`.
+
+Usage:
+
+    python -m benchmarks.compare BASELINE.json RESULTS.json
+
+Exits with a non-zero status if any scenario is slower than the
+baseline by more than `--threshold`.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import click
+
+
+def compare_results(baseline: dict, results: dict) -> dict[str, float]:
+    """Return the ratio of the time of each scenario to the baseline (> 1 is slower)"""
+    return {
+        name: result["seconds"] / baseline["results"][name]["seconds"]
+        for name, result in results["results"].items()
+        if name in baseline["results"] and baseline["results"][name]["seconds"]
+    }
+
+
+@click.command()
+@click.argument(
+    "baseline", type=click.Path(exists=True, path_type=Path, dir_okay=False)
+)
+@click.argument("results", type=click.Path(exists=True, path_type=Path, dir_okay=False))
+@click.option(
+    "-t",
+    "--threshold",
+    default=0.1,
+    type=click.FloatRange(min=0),
+    help="fraction by which a scenario may be slower before it's a regression",
+    show_default=True,
+)
+def main(baseline: Path, results: Path, threshold: float) -> None:
+    """Compare benchmark RESULTS with a BASELINE"""
+    baseline_ = json.loads(baseline.read_text())
+    results_ = json.loads(results.read_text())
+    if baseline_["corpus"] != results_["corpus"]:
+        click.echo("warning: the results were measured on different corpora", err=True)
+
+    regressions = []
+    for name, ratio in compare_results(baseline_, results_).items():
+        before = baseline_["results"][name]["seconds"]
+        after = results_["results"][name]["seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        click.echo(f"{name:<20} {before:8.3f}s → {after:8.3f}s  {ratio:5.2f}x{flag}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
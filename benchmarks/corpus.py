@@ -0,0 +1,182 @@
+"""Generate synthetic corpora of Word documents for the tests and benchmarks"""
+
+import io
+import random
+import shutil
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from docx import Document
+
+DOCUMENT_EXTENSIONS = [".doc", ".docx"]
+OTHER_EXTENSIONS = [".xls", ".xlsx", ".pdf"]
+TEMPLATE_TIMESTAMP = datetime(2024, 1, 1)
+
+WORDS = (
+    "invoice total amount due date customer account number payment terms "
+    "net days item description quantity unit price vat subtotal balance "
+    "reference order delivery address phone email bank sort code iban"
+).split()
+
+
+@dataclass
+class Corpus:
+    """The files in a synthetic corpus"""
+
+    directory: Path
+    documents: list[Path] = field(default_factory=list)
+    other_files: list[Path] = field(default_factory=list)
+
+    @property
+    def docx_documents(self) -> list[Path]:
+        """The `.docx` documents, except the empty ones from `make_invoices_dir`"""
+        return [
+            path
+            for path in self.documents
+            if path.suffix == ".docx" and path.stat().st_size
+        ]
+
+    @property
+    def document_bytes(self) -> int:
+        return sum(path.stat().st_size for path in self.documents)
+
+
+def make_invoices_dir(directory: Path) -> Corpus:
+    """Create the same empty files as the `invoices_dir` test fixture, which
+    `test_make_invoices_dir_matches_fixture` checks"""
+    another_level = directory / "another-level"
+    another_level.mkdir(parents=True, exist_ok=True)
+
+    corpus = Corpus(directory)
+    for filepath in [
+        directory / "document01.doc",
+        directory / "document02.docx",
+        directory / "spreadsheet01.xls",
+        another_level / "document03.doc",
+        another_level / "spreadsheet02.xlsx",
+    ]:
+        filepath.touch()
+        if filepath.suffix in DOCUMENT_EXTENSIONS:
+            corpus.documents.append(filepath)
+        else:
+            corpus.other_files.append(filepath)
+    return corpus
+
+
+def _docx_template() -> bytes:
+    """Return the bytes of an empty `.docx` document made by python-docx"""
+    document = Document()
+    # fix the timestamps so that the same seed always makes the same bytes
+    document.core_properties.created = TEMPLATE_TIMESTAMP
+    document.core_properties.modified = TEMPLATE_TIMESTAMP
+    with io.BytesIO() as buffer:
+        document.save(buffer)
+        return buffer.getvalue()
+
+
+def _document_xml(paragraphs: list[str]) -> bytes:
+    body = "".join(
+        f"<w:p><w:r><w:t>{escape(text)}</w:t></w:r></w:p>" for text in paragraphs
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    ).encode()
+
+
+def write_docx(filepath: Path, paragraphs: list[str], template: bytes) -> None:
+    """Write a `.docx` file with `paragraphs`, reusing the other parts of `template`
+
+    This is much faster than building each document with python-docx,
+    and the result can still be opened by python-docx.
+    """
+    with (
+        zipfile.ZipFile(io.BytesIO(template)) as src,
+        zipfile.ZipFile(filepath, "w", zipfile.ZIP_DEFLATED) as dst,
+    ):
+        for item in src.infolist():
+            # python-docx stamps the zip entries with the time it saved the template
+            item.date_time = TEMPLATE_TIMESTAMP.timetuple()[:6]
+            data = (
+                _document_xml(paragraphs)
+                if item.filename == "word/document.xml"
+                else src.read(item)
+            )
+            dst.writestr(item, data)
+
+
+def _paragraphs(rng: random.Random, n_bytes: int) -> list[str]:
+    paragraphs = []
+    while n_bytes > 0:
+        text = " ".join(rng.choices(WORDS, k=rng.randint(3, 40)))
+        paragraphs.append(text)
+        n_bytes -= len(text)
+    return paragraphs
+
+
+def make_corpus(
+    directory: Path,
+    n_documents: int,
+    *,
+    seed: int = 0,
+    max_depth: int = 6,
+    min_size: int = 1024,
+    max_size: int = 1024 * 1024,
+    duplicate_fraction: float = 0.1,
+    other_fraction: float = 0.2,
+) -> Corpus:
+    """Create a corpus of `n_documents` synthetic `.doc` and `.docx` files.
+
+    The corpus extends the layout of `make_invoices_dir` with documents
+    spread over directories up to `max_depth` levels deep. Document sizes
+    are log-uniform between `min_size` and `max_size` bytes; `.doc` files
+    hold random bytes and `.docx` files hold paragraphs of text. About
+    `duplicate_fraction` of the documents are copies of other documents,
+    and `other_fraction` as many other files (e.g., spreadsheets) are
+    mixed in. The same `seed` always produces the same corpus.
+    """
+    rng = random.Random(seed)
+    template = _docx_template()
+    corpus = make_invoices_dir(directory)
+
+    directories = [directory]
+    for i in range(max(1, n_documents // 20)):
+        parent = rng.choice(directories)
+        depth = len(parent.relative_to(directory).parts)
+        if depth >= max_depth:
+            parent = directory
+        subdirectory = parent / f"folder{i:04d}"
+        subdirectory.mkdir(exist_ok=True)
+        directories.append(subdirectory)
+
+    for i in range(n_documents):
+        filepath = (
+            rng.choice(directories)
+            / f"document{i:06d}{rng.choice(DOCUMENT_EXTENSIONS)}"
+        )
+        if corpus.documents and rng.random() < duplicate_fraction:
+            original = rng.choice(corpus.documents)
+            shutil.copyfile(original, filepath.with_suffix(original.suffix))
+            corpus.documents.append(filepath.with_suffix(original.suffix))
+            continue
+
+        size = int(min_size * (max_size / min_size) ** rng.random())
+        if filepath.suffix == ".docx":
+            # the text is compressed, so the document is smaller than `size`
+            write_docx(filepath, _paragraphs(rng, size // 4), template)
+        else:
+            filepath.write_bytes(rng.randbytes(size))
+        corpus.documents.append(filepath)
+
+    for i in range(int(n_documents * other_fraction)):
+        filepath = (
+            rng.choice(directories) / f"other{i:06d}{rng.choice(OTHER_EXTENSIONS)}"
+        )
+        filepath.write_bytes(rng.randbytes(rng.randint(0, min_size)))
+        corpus.other_files.append(filepath)
+
+    return corpus
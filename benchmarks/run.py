@@ -0,0 +1,354 @@
+"""Run timed benchmark scenarios against a synthetic corpus.
+
+Usage:
+
+    python -m benchmarks.run --documents 2000 --output results.json
+
+Each scenario is run `--repeat` times and the results, along with the
+commit and the corpus parameters, are written to a JSON file which can
+be compared with `python -m benchmarks.compare`. Exits with a non-zero
+status if a scenario with a time budget, such as `startup`, is over it.
+"""
+
+import hashlib
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+import click
+
+from benchmarks.corpus import DOCUMENT_EXTENSIONS, Corpus, make_corpus
+from invoicetool.archive import write_archive
+from invoicetool.hashes import calculate_hash, find_duplicate_files, hash_files
+from invoicetool.inventory import FileInventory
+from invoicetool.iotools import copy_files, get_filepaths_of_interest, scantree
+from invoicetool.profiling import read_process_counters
+from invoicetool.word import extract_text_from_docx
+
+PROJECT_DIRECTORY = Path(__file__).resolve().parent.parent
+
+# bytes read & written, and the number of read & write syscalls
+IO_COUNTERS = ["rchar", "wchar", "syscr", "syscw"]
+
+
+@dataclass
+class Scenario:
+    """A timed piece of work against a corpus"""
+
+    name: str
+    run: Callable[[Corpus, Path], None]
+    # returns the number of files & bytes processed by a run
+    size: Callable[[Corpus], tuple[int, int]]
+    # the best time above which the run fails, if any
+    budget_seconds: float | None = None
+
+
+def _documents_size(corpus: Corpus) -> tuple[int, int]:
+    return len(corpus.documents), corpus.document_bytes
+
+
+def _docx_size(corpus: Corpus) -> tuple[int, int]:
+    docx_documents = corpus.docx_documents
+    return len(docx_documents), sum(path.stat().st_size for path in docx_documents)
+
+
+def _scan(corpus: Corpus, workdir: Path) -> None:
+    list(get_filepaths_of_interest(corpus.directory, set(DOCUMENT_EXTENSIONS)))
+
+
+def _scantree(corpus: Corpus, workdir: Path) -> None:
+    list(scantree(corpus.directory))
+
+
+def _hash_8k(corpus: Corpus, workdir: Path) -> None:
+    # the original `calculate_hash` loop, as a baseline for the adaptive reads
+    for filepath in corpus.documents:
+        hash_fn = hashlib.sha1()
+        with open(filepath, "rb") as f:
+            for chunk in iter(partial(f.read, 8192), b""):
+                hash_fn.update(chunk)
+        hash_fn.hexdigest()
+
+
+def _hash(**kwargs) -> Callable[[Corpus, Path], None]:
+    def run(corpus: Corpus, workdir: Path) -> None:
+        for filepath in corpus.documents:
+            calculate_hash(filepath, "sha1", **kwargs)
+
+    return run
+
+
+def _hash_parallel(corpus: Corpus, workdir: Path) -> None:
+    list(hash_files(corpus.documents, "sha1", jobs=0))
+
+
+def _duplicates(corpus: Corpus, workdir: Path) -> None:
+    find_duplicate_files(corpus.directory, set(DOCUMENT_EXTENSIONS), "sha1", jobs=0)
+
+
+def _copy(jobs: int) -> Callable[[Corpus, Path], None]:
+    def run(corpus: Corpus, workdir: Path) -> None:
+        copy_files(
+            workdir / corpus.directory.name,
+            FileInventory.from_filepaths(corpus.documents),
+            jobs=jobs,
+        )
+
+    return run
+
+
+def _archive(archive_format: str) -> Callable[[Corpus, Path], None]:
+    def run(corpus: Corpus, workdir: Path) -> None:
+        write_archive(
+            workdir / corpus.directory.name,
+            corpus.documents,
+            archive_format=archive_format,
+        )
+
+    return run
+
+
+def _extract(fast: bool) -> Callable[[Corpus, Path], None]:
+    def run(corpus: Corpus, workdir: Path) -> None:
+        for filepath in corpus.docx_documents:
+            extract_text_from_docx(filepath, fast=fast)
+
+    return run
+
+
+def _startup(corpus: Corpus, workdir: Path) -> None:
+    # a fresh interpreter, like a script which runs `invoicetool` in a loop
+    subprocess.run(
+        [sys.executable, "-m", "invoicetool.cli", "--version"],
+        check=True,
+        capture_output=True,
+    )
+
+
+def _corpus_size(corpus: Corpus) -> tuple[int, int]:
+    return len(corpus.documents) + len(corpus.other_files), 0
+
+
+def _no_size(corpus: Corpus) -> tuple[int, int]:
+    return 0, 0
+
+
+SCENARIOS = [
+    Scenario("scan", _scan, _corpus_size),
+    Scenario("scantree", _scantree, _corpus_size),
+    Scenario("hash-8k", _hash_8k, _documents_size),
+    Scenario("hash", _hash(), _documents_size),
+    Scenario("hash-readinto", _hash(mmap_threshold=None), _documents_size),
+    Scenario("hash-mmap", _hash(mmap_threshold=1), _documents_size),
+    Scenario("hash-parallel", _hash_parallel, _documents_size),
+    Scenario("duplicates", _duplicates, _documents_size),
+    Scenario("copy", _copy(jobs=1), _documents_size),
+    Scenario("copy-parallel", _copy(jobs=0), _documents_size),
+    Scenario("archive-tar", _archive("tar"), _documents_size),
+    Scenario("archive-gz", _archive("gz"), _documents_size),
+    Scenario("extract-docx", _extract(fast=False), _docx_size),
+    Scenario("extract-docx-fast", _extract(fast=True), _docx_size),
+    # the interpreter starting up & importing the CLI; well above what it
+    # takes, but well below importing python-docx, NumPy & co.
+    Scenario("startup", _startup, _no_size, budget_seconds=0.5),
+]
+
+
+def git_commit() -> str | None:
+    """Return the commit of the working tree, or `None` outside a git repository"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=PROJECT_DIRECTORY,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def time_scenario(scenario: Scenario, corpus: Corpus, repeat: int) -> dict:
+    """Run `scenario` `repeat` times, each in a fresh working directory
+
+    The I/O counters (see `invoicetool.profiling`) are from the last run.
+    """
+    timings = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="invoicetool-bench-") as workdir:
+            counters = read_process_counters()
+            start = time.perf_counter()
+            scenario.run(corpus, Path(workdir))
+            timings.append(time.perf_counter() - start)
+            end = read_process_counters()
+
+    files, n_bytes = scenario.size(corpus)
+    best = min(timings)
+    return {
+        "seconds": best,
+        "budget_seconds": scenario.budget_seconds,
+        "median_seconds": statistics.median(timings),
+        "timings": timings,
+        "files": files,
+        "bytes": n_bytes,
+        "files_per_second": files / best if best else None,
+        "megabytes_per_second": n_bytes / 1e6 / best if best else None,
+        **{
+            counter: end[counter] - counters[counter]
+            for counter in IO_COUNTERS
+            if counter in end
+        },
+    }
+
+
+def run_benchmarks(
+    corpus: Corpus,
+    *,
+    repeat: int = 3,
+    scenarios: list[str] | None = None,
+    log: Callable[[str], None] = print,
+) -> dict:
+    """Run the `scenarios` (default: all) against `corpus` and return the results"""
+    results = {}
+    for scenario in SCENARIOS:
+        if scenarios and scenario.name not in scenarios:
+            continue
+        results[scenario.name] = time_scenario(scenario, corpus, repeat)
+        result = results[scenario.name]
+        syscalls = f"  {result['syscr']:>8} read syscalls" if "syscr" in result else ""
+        over_budget = (
+            f"  OVER BUDGET ({scenario.budget_seconds}s)"
+            if scenario.name in over_budget_scenarios({scenario.name: result})
+            else ""
+        )
+        log(f"{scenario.name:<20} {result['seconds']:8.3f}s{syscalls}{over_budget}")
+    return results
+
+
+def over_budget_scenarios(results: dict) -> list[str]:
+    """Return the scenarios whose best time is above their budget"""
+    return [
+        name
+        for name, result in results.items()
+        if result.get("budget_seconds") is not None
+        and result["seconds"] > result["budget_seconds"]
+    ]
+
+
+@click.command()
+@click.option(
+    "-n",
+    "--documents",
+    "n_documents",
+    default=2000,
+    type=click.IntRange(min=1),
+    help="number of documents in the corpus",
+    show_default=True,
+)
+@click.option("--seed", default=0, help="seed of the corpus", show_default=True)
+@click.option(
+    "--max-size",
+    default=1024 * 1024,
+    type=click.IntRange(min=1024),
+    help="maximum size of a document in bytes",
+    show_default=True,
+)
+@click.option(
+    "-r",
+    "--repeat",
+    default=3,
+    type=click.IntRange(min=1),
+    help="number of times to run each scenario",
+    show_default=True,
+)
+@click.option(
+    "-s",
+    "--scenario",
+    "scenarios",
+    multiple=True,
+    type=click.Choice([scenario.name for scenario in SCENARIOS]),
+    help="scenario to run (can be repeated)  [default: all]",
+)
+@click.option(
+    "--corpus-directory",
+    type=click.Path(path_type=Path, file_okay=False),
+    help="directory to generate the corpus in  [default: a temporary directory]",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(path_type=Path, dir_okay=False),
+    help="results file  [default: .out/benchmarks/COMMIT.json]",
+)
+def main(
+    n_documents: int,
+    seed: int,
+    max_size: int,
+    repeat: int,
+    scenarios: tuple[str, ...],
+    corpus_directory: Path | None,
+    output: Path | None,
+) -> None:
+    """Benchmark the scan, hash, copy, archive and extract paths"""
+    commit = git_commit()
+    if output is None:
+        output = (
+            PROJECT_DIRECTORY / ".out" / "benchmarks" / f"{commit or 'results'}.json"
+        )
+
+    temporary_directory = None
+    if corpus_directory is None:
+        temporary_directory = tempfile.mkdtemp(prefix="invoicetool-corpus-")
+        corpus_directory = Path(temporary_directory)
+    try:
+        start = time.perf_counter()
+        corpus = make_corpus(
+            corpus_directory / "invoices", n_documents, seed=seed, max_size=max_size
+        )
+        click.echo(
+            f"generated {len(corpus.documents)} documents ({corpus.document_bytes / 1e6:.1f} MB) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        results = run_benchmarks(
+            corpus, repeat=repeat, scenarios=list(scenarios), log=click.echo
+        )
+    finally:
+        if temporary_directory is not None:
+            shutil.rmtree(temporary_directory)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "corpus": {
+                    "documents": n_documents,
+                    "seed": seed,
+                    "max_size": max_size,
+                },
+                "repeat": repeat,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    click.echo(f"wrote results to {output}")
+
+    if over_budget_scenarios(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
-from importlib.metadata import version
+def __getattr__(name: str) -> str:
+    # `importlib.metadata` is slow to import, so the version is only looked up when needed
+    if name == "__version__":
+        from importlib.metadata import version
 
-__version__ = version(__name__)
+        return version(__name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,230 @@
+import bz2
+import gzip
+import lzma
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, Callable, ClassVar, Iterable
+
+from invoicetool.iotools import ensure_dir, get_relative_filepath
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# archive format -> archive file extension
+ARCHIVE_FORMATS = {
+    "tar": ".tar",
+    "gz": ".tar.gz",
+    "bz2": ".tar.bz2",
+    "xz": ".tar.xz",
+    "zst": ".tar.zst",
+    "zip": ".zip",
+}
+
+
+# archive format -> the range of its compression levels
+COMPRESSION_LEVELS = {
+    "gz": range(0, 10),
+    "bz2": range(1, 10),
+    "xz": range(0, 10),
+    "zst": range(1, 23),
+    "zip": range(0, 10),
+}
+
+
+def available_archive_formats() -> list[str]:
+    """Return the archive formats supported by the installed modules"""
+    return [
+        archive_format
+        for archive_format in ARCHIVE_FORMATS
+        if archive_format != "zst" or zstandard is not None
+    ]
+
+
+def archive_filepath(destination: Path, archive_format: str) -> Path:
+    """Return the path of the archive for `destination`, e.g., `destination.tar.bz2`"""
+    return Path(f"{destination}{ARCHIVE_FORMATS[archive_format]}")
+
+
+def validate_compression_level(archive_format: str, level: int | None) -> None:
+    """Raise a `ValueError` if `level` isn't a compression level of `archive_format`
+
+    An uncompressed `tar` archive ignores the level.
+    """
+    levels = COMPRESSION_LEVELS.get(archive_format)
+    if level is None or levels is None:
+        return
+    if level not in levels:
+        raise ValueError(
+            f"Invalid compression level for {archive_format}: {level} (expected {levels.start}-{levels.stop - 1})"
+        )
+
+
+def get_compress_function(
+    archive_format: str, level: int | None
+) -> Callable[[bytes], bytes]:
+    """Return a function which compresses a chunk of data into a complete stream.
+
+    The defaults for `level` match those used by `tarfile`.
+    """
+    if archive_format == "gz":
+        return partial(
+            gzip.compress, compresslevel=9 if level is None else level, mtime=0
+        )
+    elif archive_format == "bz2":
+        return partial(bz2.compress, compresslevel=9 if level is None else level)
+    elif archive_format == "xz":
+        return partial(lzma.compress, preset=level)
+    else:
+        raise ValueError(
+            f"Unsupported archive format for chunked compression: {archive_format}"
+        )
+
+
+class ParallelCompressor:
+    """A write-only file object which compresses its input on a pool of threads.
+
+    The input is split into chunks of `CHUNK_SIZE` bytes, and each chunk
+    is compressed independently and written out in order. The output is
+    a sequence of complete gzip members (or bzip2/xz streams), which
+    `gzip`/`bzip2`/`xz` and Python's `tarfile` decompress as a single
+    file. zlib, bz2 and lzma release the GIL while compressing, so the
+    chunks compress in parallel.
+    """
+
+    CHUNK_SIZE: ClassVar[int] = 4 * 1024 * 1024
+
+    def __init__(
+        self, fileobj: BinaryIO, compress: Callable[[bytes], bytes], threads: int
+    ):
+        self._fileobj = fileobj
+        self._compress = compress
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        # bound the number of chunks held in memory
+        self._max_pending = 2 * threads
+        self._pending: deque[Future[bytes]] = deque()
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.CHUNK_SIZE:
+            self._submit(bytes(self._buffer[: self.CHUNK_SIZE]))
+            del self._buffer[: self.CHUNK_SIZE]
+        return len(data)
+
+    def _submit(self, chunk: bytes) -> None:
+        self._pending.append(self._executor.submit(self._compress, chunk))
+        while len(self._pending) > self._max_pending:
+            self._fileobj.write(self._pending.popleft().result())
+
+    def close(self) -> None:
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._fileobj.write(self._pending.popleft().result())
+        self._executor.shutdown()
+
+
+def write_archive(
+    destination: Path,
+    filepaths: Iterable[Path],
+    *,
+    archive_format: str = "bz2",
+    level: int | None = None,
+    threads: int = 1,
+) -> Path:
+    """Write `filepaths` straight into an archive named `destination`.`ext`
+
+    Unlike `make_archive`, the files are read from their original
+    location, so nothing is copied to a staging directory first. The
+    layout of the archive is the same: each file is stored at
+    `destination.name / get_relative_filepath(...)`.
+
+    With `threads > 1`, `gz`, `bz2` and `xz` archives are compressed
+    with a `ParallelCompressor`, and `zst` archives use zstandard's
+    own threads. `zip` archives are always compressed serially.
+
+    If writing fails, the partial archive is removed.
+
+    Returns:
+        the path to the archive.
+    """
+    if archive_format not in available_archive_formats():
+        raise ValueError(f"Unsupported archive format: {archive_format}")
+    validate_compression_level(archive_format, level)
+
+    archive_path = archive_filepath(destination, archive_format)
+    ensure_dir(archive_path.parent)
+    members = [
+        (
+            filepath,
+            f"{destination.name}/{get_relative_filepath(filepath, destination.name).as_posix()}",
+        )
+        for filepath in filepaths
+    ]
+
+    try:
+        _write_archive(archive_path, members, archive_format, level, threads)
+    except BaseException:
+        archive_path.unlink(missing_ok=True)
+        raise
+    return archive_path
+
+
+def _write_archive(
+    archive_path: Path,
+    members: list[tuple[Path, str]],
+    archive_format: str,
+    level: int | None,
+    threads: int,
+) -> None:
+    if archive_format == "zip":
+        with zipfile.ZipFile(
+            archive_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=level
+        ) as zf:
+            for filepath, arcname in members:
+                zf.write(filepath, arcname)
+        return
+
+    with open(archive_path, "wb") as f:
+        if archive_format == "tar":
+            _write_tar(f, members)
+        elif archive_format == "zst":
+            compressor = zstandard.ZstdCompressor(
+                level=3 if level is None else level,
+                threads=threads if threads > 1 else 0,
+            )
+            with compressor.stream_writer(f, closefd=False) as writer:
+                _write_tar(writer, members)
+        elif threads > 1:
+            writer = ParallelCompressor(
+                f, get_compress_function(archive_format, level), threads
+            )
+            _write_tar(writer, members)
+            writer.close()
+        elif archive_format == "gz":
+            compresslevel = 9 if level is None else level
+            with gzip.GzipFile(
+                fileobj=f, mode="wb", compresslevel=compresslevel
+            ) as writer:
+                _write_tar(writer, members)
+        elif archive_format == "bz2":
+            compresslevel = 9 if level is None else level
+            with bz2.BZ2File(f, "wb", compresslevel=compresslevel) as writer:
+                _write_tar(writer, members)
+        else:
+            with lzma.LZMAFile(f, "wb", preset=level) as writer:
+                _write_tar(writer, members)
+
+
+def _write_tar(fileobj, members: list[tuple[Path, str]]) -> None:
+    """Write an uncompressed tar stream of `members` to `fileobj`"""
+    with tarfile.open(fileobj=fileobj, mode="w|") as tf:
+        for filepath, arcname in members:
+            tf.add(filepath, arcname=arcname, recursive=False)
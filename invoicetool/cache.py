@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import ClassVar
+
+from invoicetool.iotools import ensure_dir
+
+# (size, mtime_ns, inode, digest)
+CacheEntry = tuple[int, int, int, str]
+
+
+class HashCache:
+    """Persistent on-disk cache of file hashes.
+
+    Entries are keyed by the filepath and hash algorithm, and are only
+    considered valid while the size, modification time and inode of the
+    file are unchanged.
+    """
+
+    FILENAME: ClassVar[str] = "hash_cache.sqlite"
+    _FLUSH_THRESHOLD: ClassVar[int] = 1000
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        ensure_dir(self.path.parent)
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hashes (
+                path TEXT NOT NULL,
+                algorithm TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (path, algorithm)
+            ) WITHOUT ROWID
+            """
+        )
+        self._entries: dict[str, dict[str, CacheEntry]] = {}
+        self._pending: list[tuple[str, str, int, int, int, str]] = []
+
+    @classmethod
+    def in_directory(cls, directory: Path) -> "HashCache":
+        """Open the cache stored in `directory`"""
+        return cls(directory / cls.FILENAME)
+
+    def _load(self, algorithm: str) -> dict[str, CacheEntry]:
+        """Load all entries for `algorithm` with a single query"""
+        if algorithm not in self._entries:
+            rows = self._connection.execute(
+                "SELECT path, size, mtime_ns, inode, digest FROM hashes WHERE algorithm = ?",
+                (algorithm,),
+            )
+            self._entries[algorithm] = {
+                path: (size, mtime_ns, inode, digest)
+                for path, size, mtime_ns, inode, digest in rows
+            }
+        return self._entries[algorithm]
+
+    def get(self, path: str, stat: os.stat_result, algorithm: str) -> str | None:
+        """Return the cached digest for `path`, or `None` if missing or stale"""
+        entry = self._load(algorithm.upper()).get(path)
+        if entry is None:
+            return None
+        size, mtime_ns, inode, digest = entry
+        if (size, mtime_ns, inode) != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return None
+        return digest
+
+    def put(self, path: str, stat: os.stat_result, algorithm: str, digest: str) -> None:
+        """Add or replace the digest for `path`"""
+        algorithm = algorithm.upper()
+        entry = (stat.st_size, stat.st_mtime_ns, stat.st_ino, digest)
+        self._load(algorithm)[path] = entry
+        self._pending.append((path, algorithm, *entry))
+        if len(self._pending) >= self._FLUSH_THRESHOLD:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write any pending entries to disk"""
+        if not self._pending:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                self._pending,
+            )
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self) -> "HashCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class TextCache:
+    """Persistent, size-bounded cache of the paragraphs extracted from documents.
+
+    Entries are keyed by the hash of the document's contents, so
+    duplicate documents share an entry, and a document is never
+    extracted again while its contents are unchanged. Paragraphs are
+    stored as zlib-compressed JSON, and the least recently used entries
+    are evicted once the compressed size exceeds `max_bytes`.
+
+    Hits update the time an entry was last used in batches, rather than
+    with a transaction per hit.
+    """
+
+    FILENAME: ClassVar[str] = "text_cache.sqlite"
+    DEFAULT_MAX_BYTES: ClassVar[int] = 256 * 1024 * 1024
+    _FLUSH_THRESHOLD: ClassVar[int] = 1000
+
+    def __init__(self, path: Path | str, *, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        ensure_dir(self.path.parent)
+        self._connection = sqlite3.connect(self.path)
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS texts (
+                    digest TEXT NOT NULL,
+                    algorithm TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used INTEGER NOT NULL,
+                    PRIMARY KEY (digest, algorithm)
+                ) WITHOUT ROWID
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS texts_last_used ON texts (last_used)"
+            )
+        (total,) = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM texts"
+        ).fetchone()
+        self._total_bytes: int = total
+        # the time each entry was last used, which hasn't been written yet
+        self._touched: dict[tuple[str, str], int] = {}
+
+    @classmethod
+    def in_directory(cls, directory: Path, **kwargs) -> "TextCache":
+        """Open the cache stored in `directory`"""
+        return cls(directory / cls.FILENAME, **kwargs)
+
+    def get(self, digest: str, algorithm: str) -> list[str] | None:
+        """Return the cached paragraphs for a document, or `None` if missing"""
+        key = (digest, algorithm.upper())
+        row = self._connection.execute(
+            "SELECT data FROM texts WHERE digest = ? AND algorithm = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        self._touched[key] = time.time_ns()
+        if len(self._touched) >= self._FLUSH_THRESHOLD:
+            self.flush()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, digest: str, algorithm: str, paragraphs: list[str]) -> None:
+        """Add the paragraphs for a document, evicting old entries if needed"""
+        key = (digest, algorithm.upper())
+        data = zlib.compress(json.dumps(paragraphs, ensure_ascii=False).encode())
+        self._touched.pop(key, None)
+        with self._connection:
+            previous = self._connection.execute(
+                "SELECT size FROM texts WHERE digest = ? AND algorithm = ?", key
+            ).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?, ?)",
+                (*key, data, len(data), time.time_ns()),
+            )
+        self._total_bytes += len(data) - (previous[0] if previous else 0)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in `max_bytes`"""
+        self.flush()
+        rows = self._connection.execute(
+            "SELECT digest, algorithm, size FROM texts ORDER BY last_used"
+        )
+        evicted = []
+        for digest, algorithm, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            evicted.append((digest, algorithm))
+            self._total_bytes -= size
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM texts WHERE digest = ? AND algorithm = ?", evicted
+            )
+
+    def flush(self) -> None:
+        """Write the times of any entries used since the last flush"""
+        if not self._touched:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE texts SET last_used = ? WHERE digest = ? AND algorithm = ?",
+                [(last_used, *key) for key, last_used in self._touched.items()],
+            )
+        self._touched.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self) -> "TextCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
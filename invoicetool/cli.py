@@ -1,29 +1,76 @@
 #!/usr/bin/env python
 """CLI tools for creating and working with an invoices database"""
 
+import json
+import sqlite3
+from itertools import islice
 from pathlib import Path
 
 import click
 
-from invoicetool import __version__
+from invoicetool.archive import (
+    available_archive_formats,
+    validate_compression_level,
+    write_archive,
+)
+from invoicetool.cache import HashCache, TextCache
 from invoicetool.config import Config
-from invoicetool.hashes import calculate_hashes, get_duplicate_files
+from invoicetool.hashes import (
+    available_hash_functions,
+    find_duplicate_files,
+    get_duplicate_files,
+    read_hashes_jsonl,
+    write_hashes_jsonl,
+)
+from invoicetool.inventory import FileInventory
 from invoicetool.iotools import (
     build_output_directory,
     copy_files,
+    ensure_dir,
     get_filepaths_of_interest,
-    make_archive,
+    get_files_of_interest,
     pathify,
-    remove_directory_with_files_matching_extensions,
+    resolve_jobs,
     write_json,
 )
+from invoicetool.journal import Journal, journal_filepath
 from invoicetool.log import get_logger
+from invoicetool.profiling import Profiler, activate, stage
+from invoicetool.progress import Progress
+
+# modules which are slow to import (e.g., python-docx and NumPy) are imported
+# by the commands which use them, so that starting the CLI stays cheap
 
 
 @click.group()
-@click.version_option(version=__version__)
-def cli():
+@click.version_option(package_name="invoicetool")
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="log the time & I/O of each stage, and write COMMAND.profile.json next to the outputs",
+)
+@click.option(
+    "--cprofile",
+    is_flag=True,
+    default=False,
+    help="like --profile, and also write cProfile stats to COMMAND.profile.pstats",
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool = False, cprofile: bool = False):
     """CLI tools for creating and working with an invoices database"""
+    profiler = Profiler(ctx.invoked_subcommand, enabled=profile, cprofile=cprofile)
+    ctx.obj = profiler
+    activate(profiler)
+    profiler.start()
+
+    @ctx.call_on_close
+    def stop_profiling():
+        profiler.stop()
+        activate(Profiler())
+
+
+pass_profiler = click.make_pass_decorator(Profiler, ensure=True)
 
 
 base_output_directory_option = click.option(
@@ -35,6 +82,14 @@ base_output_directory_option = click.option(
 start_dir_argument = click.argument(
     "start_dir", type=click.Path(resolve_path=True, path_type=Path, file_okay=False)
 )
+jobs_option = click.option(
+    "-j",
+    "--jobs",
+    default=1,
+    type=click.IntRange(min=0),
+    help="number of parallel workers (0 = one per CPU)",
+    show_default=True,
+)
 config_option = click.option(
     "-c",
     "--config",
@@ -53,19 +108,69 @@ config_option = click.option(
     default=False,
     help="create a compressed archive",
 )
+@click.option(
+    "-f",
+    "--archive-format",
+    type=click.Choice(available_archive_formats(), case_sensitive=False),
+    help="compression format of the archive  [default: from config]",
+)
+@click.option(
+    "-l",
+    "--compression-level",
+    type=int,
+    help="compression level of the archive  [default: from config]",
+)
+@click.option(
+    "-i",
+    "--incremental",
+    is_flag=True,
+    default=False,
+    help="hard link unchanged documents from the previous dump instead of copying",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="skip documents which today's journal shows were already copied",
+)
+@jobs_option
 @start_dir_argument
 @config_option
+@pass_profiler
 def dump_documents(
+    profiler: Profiler,
     start_dir: Path,
     archive: bool,
     base_output_directory: Path | None = None,
     config_filepath: Path | None = None,
+    incremental: bool = False,
+    jobs: int = 1,
+    archive_format: str | None = None,
+    compression_level: int | None = None,
+    resume: bool = False,
 ) -> None:
     """Search for & copy Word documents"""
-    logger = get_logger()
+    if archive and incremental:
+        raise click.UsageError("--incremental can't be used with --archive")
+    if archive and resume:
+        raise click.UsageError("--resume can't be used with --archive")
+
     config = Config.from_file(config_filepath)
+    logger = get_logger(config_filepath=config_filepath)
     logger.info(config)
 
+    if archive:
+        archive_format = (archive_format or config.archive_format).lower()
+        if compression_level is None:
+            compression_level = config.archive_compression_level
+        # fail before scanning, rather than part way through the archive
+        try:
+            validate_compression_level(archive_format, compression_level)
+        except ValueError as e:
+            raise click.BadParameter(
+                str(e), param_hint="'-l' / '--compression-level'"
+            ) from None
+
     # the `~` doesn't get expanded with `click.Path`
     start_dir = pathify(start_dir)
 
@@ -76,29 +181,115 @@ def dump_documents(
     )
     # output_directory_ = base_output_directory / YYYY-MM-DD / START_DIR
     output_directory_ = build_output_directory(base_output_directory_, start_dir)
+    ensure_dir(output_directory_.parent)
+    profiler.report_to(output_directory_.parent, logger)
 
-    document_filepaths = list(get_filepaths_of_interest(start_dir, config.extensions))
-    num_documents = len(document_filepaths)
+    progress = Progress(logger)
+    progress.begin("scan")
+    with stage("scan") as scan_stage:
+        inventory = FileInventory.from_entries(
+            get_files_of_interest(start_dir, config.extensions, progress=progress)
+        )
+        scan_stage.add(files=len(inventory))
+    progress.end()
+    num_documents = len(inventory)
     logger.info(f"→ found {num_documents} documents of interest")
-    logger.debug(f"→ documents: {document_filepaths}")
-
-    copy_files(output_directory_, document_filepaths)
+    logger.debug(f"→ documents: {list(inventory.paths())}")
 
     if archive:
-        # TODO: allow configuration of compression format via config file and command line option
-        archive_path = make_archive(output_directory_)
-        # we don't need the uncompressed directory anymore so remove it
-        remove_directory_with_files_matching_extensions(
-            output_directory_,
-            extensions=config.extensions,
-            dry_run=False,
-            logger=logger,
-        )
+        # write the archive straight from the source documents, without
+        # copying them to `output_directory_` first
+        with stage("archive") as archive_stage:
+            archive_path = write_archive(
+                output_directory_,
+                inventory.filepaths(),
+                archive_format=archive_format,
+                level=compression_level,
+                threads=resolve_jobs(jobs),
+            )
+            archive_stage.add(files=num_documents)
         logger.info(
             f"→ created compressed archive with {num_documents} documents at {archive_path}"
         )
+        return
+
+    # every copied document is journaled, so that an interrupted dump
+    # can be resumed without copying the same documents again
+    journal = Journal(journal_filepath(output_directory_), resume=resume)
+    to_copy = [
+        i
+        for i in range(num_documents)
+        if not journal.is_done(inventory.path(i), inventory.stat(i))
+    ]
+    if resume:
+        logger.info(
+            f"→ resuming, {num_documents - len(to_copy)} documents already copied"
+        )
+
+    # the total for the progress is cheap, as the stats were already read
+    to_copy_bytes = sum(inventory.sizes[i] for i in to_copy)
+
+    def on_copied(i: int) -> None:
+        stat = inventory.stat(i)
+        journal.record(inventory.filepath(i).as_posix(), stat, status="copied")
+        progress.update(bytes=stat.st_size)
+
+    with journal:
+        if incremental:
+            from invoicetool.manifest import (
+                copy_files_incremental,
+                find_previous_dump,
+                generate_manifest,
+                manifest_filepath,
+            )
+
+            previous_dump = find_previous_dump(output_directory_)
+            logger.info(f"→ previous dump: {previous_dump}")
+            with (
+                stage("manifest") as manifest_stage,
+                HashCache.in_directory(base_output_directory_) as cache,
+            ):
+                manifest = generate_manifest(
+                    inventory,
+                    output_directory_,
+                    config.hash_function_algorithm,
+                    cache=cache,
+                    jobs=jobs,
+                )
+                manifest_stage.add(files=num_documents)
+            progress.begin("copy", total_files=len(to_copy), total_bytes=to_copy_bytes)
+            with stage("copy") as copy_stage:
+                counts, stats = copy_files_incremental(
+                    output_directory_,
+                    inventory,
+                    to_copy,
+                    manifest,
+                    previous_dump,
+                    jobs=jobs,
+                    on_copied=on_copied,
+                )
+                copy_stage.add(files=stats.files, bytes=stats.bytes)
+            write_json(manifest, manifest_filepath(output_directory_))
+        else:
+            progress.begin("copy", total_files=len(to_copy), total_bytes=to_copy_bytes)
+            with stage("copy") as copy_stage:
+                stats = copy_files(
+                    output_directory_,
+                    inventory,
+                    to_copy,
+                    jobs=jobs,
+                    on_copied=on_copied,
+                )
+                copy_stage.add(files=stats.files, bytes=stats.bytes)
+            counts = {"copied": stats.files}
+        progress.end()
+    logger.info(f"→ copy throughput: {stats}")
+    if incremental:
+        logger.info(
+            f"→ copied {counts['copied']}, linked {counts['linked']} and kept {counts['unchanged']} unchanged documents in {output_directory_}"
+        )
     else:
-        logger.info(f"→ copied {num_documents} documents to {output_directory_}")
+        logger.info(f"→ copied {counts['copied']} documents to {output_directory_}")
 
 
 @cli.command()
@@ -106,29 +297,89 @@ def dump_documents(
     "-a",
     "--algorithm",
     "hash_function",
-    type=click.Choice(["MD5", "SHA1", "SHA256", "SHA512"], case_sensitive=False),
+    type=click.Choice(available_hash_functions(), case_sensitive=False),
     help="algorithm to use for the hash function",
 )
-# @click.option(
-#     "-b",
-#     "--block-size",
-#     default=8192,
-#     type=int,
-#     help="block size to read when computing the hash",
-#     show_default=True,
-# )
+@click.option(
+    "-e",
+    "--extra-algorithm",
+    "extra_hash_functions",
+    multiple=True,
+    type=click.Choice(available_hash_functions(), case_sensitive=False),
+    help="also compute this digest in the same read pass (can be repeated; needs --format jsonl)",
+)
+@click.option(
+    "-b",
+    "--block-size",
+    type=click.IntRange(min=4096),
+    help="block size to read when computing the hash  [default: from config]",
+)
+@jobs_option
+@click.option(
+    "--processes",
+    "use_processes",
+    is_flag=True,
+    default=False,
+    help="hash with a process pool instead of a thread pool",
+)
+@click.option(
+    "--no-cache",
+    "use_cache",
+    is_flag=True,
+    flag_value=False,
+    default=True,
+    help="rehash every file instead of using the hash cache",
+)
+@click.option(
+    "--duplicates-only",
+    is_flag=True,
+    default=False,
+    help="only hash files which may be duplicates, and only write duplicates.json",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["json", "jsonl"], case_sensitive=False),
+    default="json",
+    help="write hashes.json at the end, or stream each hash to hashes.jsonl",
+    show_default=True,
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    default=False,
+    help="skip files which today's journal shows were already hashed",
+)
 @base_output_directory_option
 @start_dir_argument
 @config_option
+@pass_profiler
 def hashes(
+    profiler: Profiler,
     start_dir: Path,
     base_output_directory: Path | None = None,
     config_filepath: Path | None = None,
     hash_function: str | None = None,
+    jobs: int = 1,
+    use_processes: bool = False,
+    use_cache: bool = True,
+    duplicates_only: bool = False,
+    output_format: str = "json",
+    resume: bool = False,
+    block_size: int | None = None,
+    extra_hash_functions: tuple[str, ...] = (),
 ):
     """Compute the hashes of Word documents"""
-    logger = get_logger()
+    output_format = output_format.lower()
+    if extra_hash_functions and output_format != "jsonl":
+        raise click.UsageError("--extra-algorithm needs --format jsonl")
+    if duplicates_only and output_format == "jsonl":
+        raise click.UsageError("--duplicates-only can't be used with --format jsonl")
+    if duplicates_only and resume:
+        raise click.UsageError("--duplicates-only can't be used with --resume")
+
     config = Config.from_file(config_filepath)
+    logger = get_logger(config_filepath=config_filepath)
     logger.info(config)
 
     # the `~` doesn't get expanded with `click.Path`
@@ -140,14 +391,594 @@ def hashes(
         else config.base_output_directory
     )
     output_directory_ = build_output_directory(base_output_directory_, start_dir)
+    ensure_dir(output_directory_.parent)
+    profiler.report_to(output_directory_.parent, logger)
 
     hash_algo = hash_function or config.hash_function_algorithm
-    hashes = calculate_hashes(start_dir, config.extensions, hash_algo)
-    duplicates = get_duplicate_files(hashes)
-    write_json(hashes, output_directory_.parent / "hashes.json")
+    block_size = block_size or config.hash_function_block_size
+    cache = HashCache.in_directory(base_output_directory_) if use_cache else None
+    progress = Progress(logger)
+    try:
+        if duplicates_only:
+            with stage("duplicates"):
+                duplicates = find_duplicate_files(
+                    start_dir,
+                    config.extensions,
+                    hash_algo,
+                    jobs=jobs,
+                    use_processes=use_processes,
+                    cache=cache,
+                    block_size=block_size,
+                    progress=progress,
+                )
+            progress.end()
+        else:
+            # with --format jsonl the output is also the journal of the run,
+            # otherwise hashes.json is written from the journal at the end
+            hashes_filepath = output_directory_.parent / (
+                "hashes.jsonl" if output_format == "jsonl" else "hashes.journal.jsonl"
+            )
+            with stage("hash") as hash_stage:
+                n_records, scanned = write_hashes_jsonl(
+                    start_dir,
+                    config.extensions,
+                    hash_algo,
+                    hashes_filepath,
+                    resume=resume,
+                    jobs=jobs,
+                    use_processes=use_processes,
+                    cache=cache,
+                    block_size=block_size,
+                    extra_hash_functions=extra_hash_functions,
+                    progress=progress,
+                )
+                hash_stage.add(files=n_records)
+            progress.end()
+            logger.info(f"→ wrote {n_records} hashes to {hashes_filepath}")
+            # a resumed journal may have records of files which were deleted
+            # since, or which are in another tree hashed earlier the same day
+            hashes = read_hashes_jsonl(hashes_filepath, scanned)
+            duplicates = get_duplicate_files(hashes)
+    finally:
+        progress.end()
+        if cache is not None:
+            cache.close()
+
+    if output_format == "json" and not duplicates_only:
+        write_json(hashes, output_directory_.parent / "hashes.json")
     write_json(duplicates, output_directory_.parent / "duplicates.json")
     logger.info(f"Wrote hashes and duplicates to {output_directory_.parent!s}")
 
 
+@cli.command()
+@base_output_directory_option
+@click.option(
+    "-j",
+    "--jobs",
+    default=0,
+    type=click.IntRange(min=0),
+    help="number of processes used to parse .docx files (0 = one per CPU)",
+    show_default=True,
+)
+@click.option(
+    "--max-subprocesses",
+    type=click.IntRange(min=1),
+    help="maximum number of concurrent antiword subprocesses  [default: --jobs]",
+)
+@click.option(
+    "--fast/--no-fast",
+    default=True,
+    help="parse .docx files with the streaming parser instead of python-docx",
+    show_default=True,
+)
+@click.option(
+    "--no-cache",
+    "use_cache",
+    is_flag=True,
+    flag_value=False,
+    default=True,
+    help="extract every document instead of using the text cache",
+)
+@start_dir_argument
+@config_option
+@pass_profiler
+def extract(
+    profiler: Profiler,
+    start_dir: Path,
+    base_output_directory: Path | None = None,
+    config_filepath: Path | None = None,
+    jobs: int = 0,
+    max_subprocesses: int | None = None,
+    fast: bool = True,
+    use_cache: bool = True,
+):
+    """Extract the text from Word documents"""
+    from invoicetool.extract import write_extracted_text
+
+    config = Config.from_file(config_filepath)
+    logger = get_logger(config_filepath=config_filepath)
+    logger.info(config)
+
+    # the `~` doesn't get expanded with `click.Path`
+    start_dir = pathify(start_dir)
+
+    base_output_directory_ = (
+        pathify(base_output_directory)
+        if base_output_directory is not None
+        else config.base_output_directory
+    )
+    output_directory_ = build_output_directory(base_output_directory_, start_dir)
+    ensure_dir(output_directory_.parent)
+    profiler.report_to(output_directory_.parent, logger)
+
+    with stage("scan") as scan_stage:
+        document_filepaths = list(
+            get_filepaths_of_interest(start_dir, config.extensions)
+        )
+        scan_stage.add(files=len(document_filepaths))
+    logger.info(f"→ found {len(document_filepaths)} documents of interest")
+
+    output_filepath = output_directory_.parent / "text.jsonl"
+    if use_cache:
+        with (
+            stage("extract") as extract_stage,
+            HashCache.in_directory(base_output_directory_) as hash_cache,
+            TextCache.in_directory(base_output_directory_) as text_cache,
+        ):
+            counts = write_extracted_text(
+                document_filepaths,
+                output_filepath,
+                jobs=jobs,
+                max_subprocesses=max_subprocesses,
+                fast=fast,
+                text_cache=text_cache,
+                hash_function=config.hash_function_algorithm,
+                hash_cache=hash_cache,
+            )
+    else:
+        with stage("extract") as extract_stage:
+            counts = write_extracted_text(
+                document_filepaths,
+                output_filepath,
+                jobs=jobs,
+                max_subprocesses=max_subprocesses,
+                fast=fast,
+            )
+    extract_stage.add(files=counts["extracted"] + counts["failed"])
+    logger.info(
+        f"→ extracted text from {counts['extracted']} documents ({counts['failed']} failed) to {output_filepath}"
+    )
+
+
+@cli.group()
+def db():
+    """Build & query the invoices database"""
+
+
+@db.command()
+@base_output_directory_option
+@click.option(
+    "-j",
+    "--jobs",
+    default=0,
+    type=click.IntRange(min=0),
+    help="number of parallel workers (0 = one per CPU)",
+    show_default=True,
+)
+@click.option(
+    "--fast/--no-fast",
+    default=True,
+    help="parse .docx files with the streaming parser instead of python-docx",
+    show_default=True,
+)
+@start_dir_argument
+@config_option
+@pass_profiler
+def build(
+    profiler: Profiler,
+    start_dir: Path,
+    base_output_directory: Path | None = None,
+    config_filepath: Path | None = None,
+    jobs: int = 0,
+    fast: bool = True,
+):
+    """Add or update Word documents in the invoices database"""
+    from invoicetool.database import InvoiceDatabase, build_database, extract_fields
+    from invoicetool.fields import FieldExtractor
+
+    config = Config.from_file(config_filepath)
+    logger = get_logger(config_filepath=config_filepath)
+    logger.info(config)
+
+    # the `~` doesn't get expanded with `click.Path`
+    start_dir = pathify(start_dir)
+
+    base_output_directory_ = (
+        pathify(base_output_directory)
+        if base_output_directory is not None
+        else config.base_output_directory
+    )
+    profiler.report_to(base_output_directory_, logger)
+    # the rules are loaded & compiled once for the whole run
+    extractor = FieldExtractor.from_file(config_filepath)
+
+    with (
+        stage("build") as build_stage,
+        InvoiceDatabase.in_directory(base_output_directory_) as database,
+        HashCache.in_directory(base_output_directory_) as hash_cache,
+        TextCache.in_directory(base_output_directory_) as text_cache,
+    ):
+        counts = build_database(
+            database,
+            start_dir,
+            config.extensions,
+            config.hash_function_algorithm,
+            jobs=jobs,
+            fast=fast,
+            hash_cache=hash_cache,
+            text_cache=text_cache,
+        )
+        build_stage.add(files=counts["scanned"])
+        logger.info(
+            f"→ scanned {counts['scanned']} documents, removed {counts['removed']} and extracted {counts['extracted']} into {database.path}"
+        )
+
+        if extractor.rules:
+            with stage("fields") as fields_stage:
+                n_documents = extract_fields(database, extractor)
+                fields_stage.add(files=n_documents)
+            logger.info(
+                f"→ extracted {len(extractor.rules)} fields from {n_documents} documents"
+            )
+
+
+@cli.command()
+@click.argument("query")
+@base_output_directory_option
+@click.option(
+    "-n",
+    "--limit",
+    default=20,
+    type=click.IntRange(min=1),
+    help="maximum number of documents to show",
+    show_default=True,
+)
+@click.option(
+    "--raw",
+    is_flag=True,
+    default=False,
+    help="use QUERY as an SQLite FTS5 query instead of matching each word",
+)
+@config_option
+def search(
+    query: str,
+    base_output_directory: Path | None = None,
+    config_filepath: Path | None = None,
+    limit: int = 20,
+    raw: bool = False,
+):
+    """Search the text of documents in the invoices database"""
+    from invoicetool.database import InvoiceDatabase, quote_query
+
+    config = Config.from_file(config_filepath)
+    base_output_directory_ = (
+        pathify(base_output_directory)
+        if base_output_directory is not None
+        else config.base_output_directory
+    )
+
+    database_filepath = base_output_directory_ / InvoiceDatabase.FILENAME
+    if not database_filepath.exists():
+        raise click.ClickException(
+            f"{database_filepath} doesn't exist, run `invoicetool db build` first"
+        )
+
+    with InvoiceDatabase(database_filepath) as database:
+        try:
+            results = database.search(query if raw else quote_query(query), limit=limit)
+        except sqlite3.OperationalError as e:
+            # e.g., an unbalanced quote in a --raw query
+            raise click.ClickException(f"Invalid search query: {e}") from None
+
+    for result in results:
+        for path in result.paths:
+            click.echo(path)
+        click.echo(f"    {result.snippet}")
+
+
+@cli.command()
+@base_output_directory_option
+@click.option(
+    "-t",
+    "--threshold",
+    default=0.8,
+    type=click.FloatRange(min=0, max=1),
+    help="minimum similarity of the text of near-duplicate documents",
+    show_default=True,
+)
+@click.option(
+    "--num-perm",
+    default=128,
+    type=click.IntRange(min=1),
+    help="number of MinHash permutations",
+    show_default=True,
+)
+@jobs_option
+@start_dir_argument
+@config_option
+@pass_profiler
+def near_duplicates(
+    profiler: Profiler,
+    start_dir: Path,
+    base_output_directory: Path | None = None,
+    config_filepath: Path | None = None,
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    jobs: int = 1,
+):
+    """Find Word documents with similar text"""
+    from invoicetool.extract import extract_paragraphs
+    from invoicetool.similarity import find_near_duplicates
+
+    config = Config.from_file(config_filepath)
+    logger = get_logger(config_filepath=config_filepath)
+    logger.info(config)
+
+    # the `~` doesn't get expanded with `click.Path`
+    start_dir = pathify(start_dir)
+
+    base_output_directory_ = (
+        pathify(base_output_directory)
+        if base_output_directory is not None
+        else config.base_output_directory
+    )
+    output_directory_ = build_output_directory(base_output_directory_, start_dir)
+    ensure_dir(output_directory_.parent)
+    profiler.report_to(output_directory_.parent, logger)
+
+    with stage("scan") as scan_stage:
+        document_filepaths = list(
+            get_filepaths_of_interest(start_dir, config.extensions)
+        )
+        scan_stage.add(files=len(document_filepaths))
+    logger.info(f"→ found {len(document_filepaths)} documents of interest")
+
+    with (
+        stage("extract"),
+        HashCache.in_directory(base_output_directory_) as hash_cache,
+        TextCache.in_directory(base_output_directory_) as text_cache,
+    ):
+        documents = extract_paragraphs(
+            document_filepaths,
+            jobs=jobs,
+            text_cache=text_cache,
+            hash_function=config.hash_function_algorithm,
+            hash_cache=hash_cache,
+        )
+    with stage("cluster"):
+        clusters = find_near_duplicates(
+            documents, threshold=threshold, num_perm=num_perm
+        )
+    clusters = [sorted(cluster) for cluster in clusters]
+
+    write_json(clusters, output_directory_.parent / "near_duplicates.json")
+    logger.info(
+        f"Wrote {len(clusters)} clusters of near duplicates to {output_directory_.parent!s}"
+    )
+
+
+@cli.command()
+@base_output_directory_option
+@click.option(
+    "-f",
+    "--format",
+    "report_format",
+    type=click.Choice(["html", "csv", "json"], case_sensitive=False),
+    default="html",
+    help="format of the report",
+    show_default=True,
+)
+@click.option(
+    "--duplicates",
+    "duplicates_filepath",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="report the duplicates in a duplicates.json written by `hashes`, rather than finding them",
+)
+@click.option(
+    "-a",
+    "--algorithm",
+    "hash_function",
+    type=click.Choice(available_hash_functions(), case_sensitive=False),
+    help="algorithm to find the duplicates with, or which the hashes in --duplicates were made with (e.g., by `hashes -a`)  [default: from the config file]",
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=1),
+    help="only report the N groups & directories with the most reclaimable space",
+)
+@jobs_option
+@start_dir_argument
+@config_option
+@pass_profiler
+def report(
+    profiler: Profiler,
+    start_dir: Path,
+    base_output_directory: Path | None = None,
+    config_filepath: Path | None = None,
+    report_format: str = "html",
+    duplicates_filepath: Path | None = None,
+    hash_function: str | None = None,
+    top: int | None = None,
+    jobs: int = 1,
+):
+    """Report duplicate files, ranked by the space they waste"""
+    from invoicetool.report import (
+        duplicate_report,
+        format_bytes,
+        inventory_from_duplicates,
+        write_report,
+    )
+
+    config = Config.from_file(config_filepath)
+    logger = get_logger(config_filepath=config_filepath)
+    logger.info(config)
+
+    # the `~` doesn't get expanded with `click.Path`
+    start_dir = pathify(start_dir)
+
+    base_output_directory_ = (
+        pathify(base_output_directory)
+        if base_output_directory is not None
+        else config.base_output_directory
+    )
+    output_directory_ = build_output_directory(base_output_directory_, start_dir)
+    ensure_dir(output_directory_.parent)
+    profiler.report_to(output_directory_.parent, logger)
+
+    hash_algo = hash_function or config.hash_function_algorithm
+    if duplicates_filepath is not None:
+        duplicates = json.loads(pathify(duplicates_filepath).read_text())
+    else:
+        progress = Progress(logger)
+        with (
+            stage("duplicates"),
+            HashCache.in_directory(base_output_directory_) as cache,
+        ):
+            duplicates = find_duplicate_files(
+                start_dir,
+                config.extensions,
+                hash_algo,
+                jobs=jobs,
+                cache=cache,
+                block_size=config.hash_function_block_size,
+                progress=progress,
+            )
+        progress.end()
+
+    with stage("report") as report_stage:
+        inventory = inventory_from_duplicates(duplicates, hash_algo)
+        duplicates_report = duplicate_report(inventory, top=top)
+        report_filepaths = write_report(
+            duplicates_report, output_directory_.parent, report_format
+        )
+        report_stage.add(files=len(inventory))
+    logger.info(
+        f"→ {duplicates_report.groups} groups of duplicates, {format_bytes(duplicates_report.reclaimable_bytes)} reclaimable"
+    )
+    logger.info(f"Wrote duplicates report to {', '.join(map(str, report_filepaths))}")
+
+
+@cli.command()
+@base_output_directory_option
+@click.option(
+    "--debounce",
+    default=2.0,
+    type=click.FloatRange(min=0),
+    help="seconds without new events before a batch of documents is ingested",
+    show_default=True,
+)
+@click.option(
+    "--poll",
+    is_flag=True,
+    default=False,
+    help="rescan the tree periodically instead of using inotify",
+)
+@click.option(
+    "--poll-interval",
+    default=5.0,
+    type=click.FloatRange(min=0.1),
+    help="seconds between rescans when polling",
+    show_default=True,
+)
+@click.option(
+    "--copy/--no-copy",
+    default=True,
+    help="copy new documents to the document dump as well as hashing them",
+    show_default=True,
+)
+@click.option(
+    "--initial-scan/--no-initial-scan",
+    default=True,
+    help="ingest documents which were added or changed before the watch started",
+    show_default=True,
+)
+@click.option(
+    "--max-batches",
+    type=click.IntRange(min=0),
+    help="stop after ingesting this many batches  [default: run until interrupted]",
+)
+@jobs_option
+@start_dir_argument
+@config_option
+def watch(
+    start_dir: Path,
+    base_output_directory: Path | None = None,
+    config_filepath: Path | None = None,
+    debounce: float = 2.0,
+    poll: bool = False,
+    poll_interval: float = 5.0,
+    copy: bool = True,
+    initial_scan: bool = True,
+    max_batches: int | None = None,
+    jobs: int = 1,
+):
+    """Hash & copy Word documents as they're added or changed"""
+    from invoicetool.watch import Ingester, iter_batches, open_watcher
+
+    config = Config.from_file(config_filepath)
+    logger = get_logger(config_filepath=config_filepath)
+    logger.info(config)
+
+    # the `~` doesn't get expanded with `click.Path`
+    start_dir = pathify(start_dir)
+
+    base_output_directory_ = (
+        pathify(base_output_directory)
+        if base_output_directory is not None
+        else config.base_output_directory
+    )
+
+    # the watch starts before the initial scan, so that no changes are missed
+    watcher = open_watcher(
+        start_dir,
+        config.extensions,
+        poll=poll,
+        poll_interval=poll_interval,
+        logger=logger,
+    )
+    logger.info(f"→ watching {start_dir} with {type(watcher).__name__}")
+    with (
+        HashCache.in_directory(base_output_directory_) as cache,
+        Ingester(
+            start_dir,
+            base_output_directory_,
+            config.extensions,
+            config.hash_function_algorithm,
+            cache=cache,
+            jobs=jobs,
+            copy=copy,
+            logger=logger,
+        ) as ingester,
+    ):
+        try:
+            if initial_scan:
+                counts = ingester.ingest(
+                    get_filepaths_of_interest(start_dir, config.extensions)
+                )
+                logger.info(
+                    f"→ initial scan: hashed {counts['hashed']} and copied {counts['copied']} documents"
+                )
+            batches = iter_batches(watcher, debounce=debounce)
+            for batch in islice(batches, max_batches):
+                counts = ingester.ingest(batch)
+                logger.info(
+                    f"→ {len(batch)} changed files: hashed {counts['hashed']} and copied {counts['copied']} documents into {ingester.output_directory}"
+                )
+        except KeyboardInterrupt:
+            logger.info("→ stopped watching")
+        finally:
+            watcher.close()
+
+
 if __name__ == "__main__":
     cli()
@@ -1,10 +1,30 @@
+import os
 from dataclasses import asdict, dataclass, field
+from functools import cache
 from pathlib import Path
-from typing import ClassVar
+from typing import Any, ClassVar
 
 import tomllib
 
-from invoicetool.iotools import ensure_dir, pathify
+from invoicetool.iotools import pathify
+
+# the repository, which contains `config.toml` and the `logs` directory
+PROJECT_DIRECTORY = Path(__file__).parent.parent
+
+
+@cache
+def _load_toml(path: str, mtime_ns: int) -> dict[str, Any]:
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def load_config_file(path: Path | str | None = None) -> dict[str, Any]:
+    """Parse a config file, once per process for as long as it's unchanged
+
+    The same dict is returned to every caller, so it mustn't be modified.
+    """
+    path = Config._DEFAULT_CONFIG_PATH if path is None else path
+    return _load_toml(os.path.abspath(path), os.stat(path).st_mtime_ns)
 
 
 @dataclass
@@ -13,18 +33,22 @@ class Config:
     _DEFAULT_CONFIG_PATH: ClassVar[str] = "./config.toml"
     _DEFAULT_BASE_OUTPUT_DIRECTORY: ClassVar[str] = "~/.invoicetool"
     _DEFAULT_HASH_FUNCTION_ALGORITHM: ClassVar[str] = "sha1"
+    _DEFAULT_ARCHIVE_FORMAT: ClassVar[str] = "bz2"
+    _DEFAULT_HASH_FUNCTION_BLOCK_SIZE: ClassVar[int] = 1024 * 1024
 
     hash_function_algorithm: str
     base_output_directory: Path
     extensions: set[str] = field(default_factory=set)
+    archive_format: str = _DEFAULT_ARCHIVE_FORMAT
+    archive_compression_level: int | None = None
+    hash_function_block_size: int = _DEFAULT_HASH_FUNCTION_BLOCK_SIZE
 
     def __post_init__(self):
         self.base_output_directory = pathify(self.base_output_directory)
         self.extensions = set(self.extensions)
-        ensure_dir(self.base_output_directory)
 
     def __str__(self):
-        return f"Config(base_output_directory={self.base_output_directory}, extensions={self.extensions}, hash_function={self.hash_function_algorithm})"
+        return f"Config(base_output_directory={self.base_output_directory}, extensions={self.extensions}, hash_function={self.hash_function_algorithm}, archive_format={self.archive_format})"
 
     @classmethod
     def from_dict(cls, d) -> "Config":
@@ -58,7 +82,7 @@ class Config:
         Path(__file__).parent == Path("invoicetool")
         Path(__file__).parent.parent == Path("invoicetool_project")
         """
-        return Path(__file__).parent.parent
+        return PROJECT_DIRECTORY
 
     @property
     def default_config_filepath(self) -> Path:
@@ -66,8 +90,5 @@ class Config:
         return self.project_directory / self._DEFAULT_CONFIG_PATH
 
     @classmethod
-    def from_file(cls, path: str | None = None) -> "Config":
-        path = cls._DEFAULT_CONFIG_PATH if path is None else path
-        with open(path, "rb") as f:
-            config_dict = tomllib.load(f)["invoicetool"]
-        return cls.from_dict(config_dict)
+    def from_file(cls, path: Path | str | None = None) -> "Config":
+        return cls.from_dict(load_config_file(path)["invoicetool"])
@@ -0,0 +1,462 @@
+import asyncio
+import os
+import sqlite3
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, ClassVar, Iterable, Iterator, TypeVar
+
+from invoicetool.cache import HashCache, TextCache
+from invoicetool.extract import extract_documents
+from invoicetool.fields import FieldExtractor, from_sql, to_sql
+from invoicetool.hashes import hash_files, hash_files_cached
+from invoicetool.iotools import ensure_dir, get_files_of_interest, pathify
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    algorithm TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE INDEX IF NOT EXISTS files_mtime_ns ON files (mtime_ns);
+
+-- one row per distinct document contents, once its text has been extracted
+CREATE TABLE IF NOT EXISTS documents (
+    hash TEXT PRIMARY KEY,
+    error TEXT
+);
+
+CREATE TABLE IF NOT EXISTS paragraphs (
+    hash TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (hash, position)
+) WITHOUT ROWID;
+
+-- typed fields extracted from the text of each document, e.g., the invoice number
+CREATE TABLE IF NOT EXISTS fields (
+    hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value NOT NULL,
+    PRIMARY KEY (hash, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fields_name_value ON fields (name, value);
+
+-- the fingerprint of the rules the fields of each document were extracted with
+CREATE TABLE IF NOT EXISTS field_extractions (
+    hash TEXT PRIMARY KEY,
+    rules TEXT NOT NULL
+);
+
+-- full-text search index with one row per document, ranked with bm25
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5 (
+    hash UNINDEXED,
+    text,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+@dataclass
+class SearchResult:
+    """A document matching a search query"""
+
+    hash: str
+    paths: list[str]
+    snippet: str
+    score: float
+
+
+def quote_query(query: str) -> str:
+    """Quote each term of `query` so that it is matched literally by FTS5
+
+    Terms are matched as prefixes, and all terms must match.
+    """
+    return " ".join('"{}" *'.format(term.replace('"', '""')) for term in query.split())
+
+
+def batched(iterable: Iterable[T], n: int) -> Iterator[list[T]]:
+    """Yield lists of `n` items from `iterable` (the last list may be shorter)"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, n)):
+        yield batch
+
+
+class InvoiceDatabase:
+    """SQLite database of documents, their hashes and their text.
+
+    Files are keyed by path, and the extracted text is keyed by the hash
+    of the file contents, so duplicate documents share their paragraphs.
+    """
+
+    FILENAME: ClassVar[str] = "invoices.db"
+    BATCH_SIZE: ClassVar[int] = 1000
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        ensure_dir(self.path.parent)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    @classmethod
+    def in_directory(cls, directory: Path) -> "InvoiceDatabase":
+        """Open the database stored in `directory`"""
+        return cls(directory / cls.FILENAME)
+
+    def upsert_files(
+        self, rows: Iterable[tuple[str, os.stat_result, str]], algorithm: str
+    ) -> None:
+        """Add or update `(path, stat, hash)` rows in batched transactions"""
+        records = (
+            (
+                path,
+                stat.st_size,
+                stat.st_mtime_ns,
+                stat.st_ino,
+                digest,
+                algorithm.upper(),
+            )
+            for path, stat, digest in rows
+        )
+        for batch in batched(records, self.BATCH_SIZE):
+            with self.connection:
+                self.connection.executemany(
+                    """
+                    INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (path) DO UPDATE SET
+                        size = excluded.size,
+                        mtime_ns = excluded.mtime_ns,
+                        inode = excluded.inode,
+                        hash = excluded.hash,
+                        algorithm = excluded.algorithm
+                    """,
+                    batch,
+                )
+
+    def prune_files(self, directory: Path, paths: Iterable[str]) -> int:
+        """Remove files below `directory` which aren't in `paths`
+
+        Returns:
+            the number of files removed.
+        """
+        prefix = f"{pathify(directory).as_posix().rstrip('/')}/"
+        present = set(paths)
+        rows = self.connection.execute(
+            "SELECT path FROM files WHERE substr(path, 1, ?) = ?",
+            (len(prefix), prefix),
+        )
+        missing = [(path,) for (path,) in rows if path not in present]
+        with self.connection:
+            self.connection.executemany("DELETE FROM files WHERE path = ?", missing)
+        return len(missing)
+
+    def unextracted_hashes(self) -> set[str]:
+        """Return the hashes of files whose text hasn't been extracted, or
+        whose extraction failed (e.g., `antiword` wasn't installed)"""
+        rows = self.connection.execute(
+            """
+            SELECT DISTINCT files.hash FROM files
+            LEFT JOIN documents ON documents.hash = files.hash
+            WHERE documents.hash IS NULL OR documents.error IS NOT NULL
+            """
+        )
+        return {digest for (digest,) in rows}
+
+    def add_documents(
+        self, documents: Iterable[tuple[str, list[str] | None, str | None]]
+    ) -> None:
+        """Add `(hash, paragraphs, error)` rows in batched transactions"""
+        for batch in batched(documents, self.BATCH_SIZE):
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO documents VALUES (?, ?)",
+                    [(digest, error) for digest, _, error in batch],
+                )
+                self.connection.executemany(
+                    "DELETE FROM paragraphs WHERE hash = ?",
+                    [(digest,) for digest, _, _ in batch],
+                )
+                self.connection.executemany(
+                    "INSERT INTO paragraphs VALUES (?, ?, ?)",
+                    [
+                        (digest, position, text)
+                        for digest, paragraphs, _ in batch
+                        for position, text in enumerate(paragraphs or [])
+                    ],
+                )
+                self._index_documents(
+                    [(digest, paragraphs or []) for digest, paragraphs, _ in batch]
+                )
+
+    def _index_documents(self, documents: list[tuple[str, list[str]]]) -> None:
+        """Replace the search index rows of `(hash, paragraphs)` documents"""
+        self.connection.executemany(
+            "DELETE FROM documents_fts WHERE hash = ?",
+            [(digest,) for digest, _ in documents],
+        )
+        self.connection.executemany(
+            "INSERT INTO documents_fts (hash, text) VALUES (?, ?)",
+            [(digest, "\n".join(paragraphs)) for digest, paragraphs in documents],
+        )
+
+    def update_search_index(self) -> int:
+        """Index any documents which aren't in the search index yet
+
+        e.g., documents added before the search index existed.
+
+        Returns:
+            the number of documents indexed.
+        """
+        rows = self.connection.execute(
+            """
+            SELECT documents.hash, paragraphs.text FROM documents
+            LEFT JOIN paragraphs ON paragraphs.hash = documents.hash
+            WHERE documents.hash NOT IN (SELECT hash FROM documents_fts)
+            ORDER BY documents.hash, paragraphs.position
+            """
+        )
+        documents: dict[str, list[str]] = {}
+        for digest, text in rows:
+            paragraphs = documents.setdefault(digest, [])
+            # documents without any paragraphs are still indexed
+            if text is not None:
+                paragraphs.append(text)
+        with self.connection:
+            self._index_documents(list(documents.items()))
+        return len(documents)
+
+    def documents_without_fields(
+        self, fingerprint: str
+    ) -> Iterator[tuple[str, list[str]]]:
+        """Yield the `(hash, paragraphs)` of each document whose fields
+        haven't been extracted with the rules with `fingerprint`"""
+        rows = self.connection.execute(
+            """
+            SELECT hash FROM documents
+            WHERE error IS NULL AND hash NOT IN (
+                SELECT hash FROM field_extractions WHERE rules = ?
+            )
+            ORDER BY hash
+            """,
+            (fingerprint,),
+        )
+        for batch in batched([digest for (digest,) in rows], self.BATCH_SIZE):
+            documents: dict[str, list[str]] = {digest: [] for digest in batch}
+            rows = self.connection.execute(
+                f"""
+                SELECT hash, text FROM paragraphs
+                WHERE hash IN ({", ".join("?" * len(batch))})
+                ORDER BY hash, position
+                """,
+                batch,
+            )
+            for digest, text in rows:
+                documents[digest].append(text)
+            yield from documents.items()
+
+    def add_fields(
+        self,
+        documents: Iterable[tuple[str, dict[str, Any]]],
+        extractor: FieldExtractor,
+    ) -> None:
+        """Replace the fields of `(hash, fields)` documents in batched transactions"""
+        types = {rule.name: rule.type for rule in extractor.rules}
+        for batch in batched(documents, self.BATCH_SIZE):
+            with self.connection:
+                self.connection.executemany(
+                    "DELETE FROM fields WHERE hash = ?",
+                    [(digest,) for digest, _ in batch],
+                )
+                self.connection.executemany(
+                    "INSERT INTO fields VALUES (?, ?, ?, ?)",
+                    [
+                        (digest, name, types[name], to_sql(value))
+                        for digest, fields in batch
+                        for name, value in fields.items()
+                    ],
+                )
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO field_extractions VALUES (?, ?)",
+                    [(digest, extractor.fingerprint) for digest, _ in batch],
+                )
+
+    def fields(self, path: str) -> dict[str, Any]:
+        """Return the fields of the file at `path`, by field name"""
+        rows = self.connection.execute(
+            """
+            SELECT fields.name, fields.type, fields.value FROM files
+            JOIN fields ON fields.hash = files.hash
+            WHERE files.path = ?
+            ORDER BY fields.name
+            """,
+            (path,),
+        )
+        return {name: from_sql(field_type, value) for name, field_type, value in rows}
+
+    def search(self, query: str, *, limit: int = 20) -> list[SearchResult]:
+        """Return the documents which best match the FTS5 `query`, best first"""
+        rows = self.connection.execute(
+            """
+            SELECT
+                hash,
+                snippet(documents_fts, 1, '[', ']', '…', 12),
+                bm25(documents_fts) AS score
+            FROM documents_fts
+            WHERE documents_fts MATCH ?
+              AND hash IN (SELECT hash FROM files)
+            ORDER BY score
+            LIMIT ?
+            """,
+            (query, limit),
+        )
+        return [
+            SearchResult(
+                hash=digest,
+                paths=self.files_with_hash(digest),
+                snippet=snippet,
+                score=score,
+            )
+            for digest, snippet, score in rows.fetchall()
+        ]
+
+    def files_with_hash(self, digest: str) -> list[str]:
+        """Return the paths of all files with the hash `digest`"""
+        rows = self.connection.execute(
+            "SELECT path FROM files WHERE hash = ? ORDER BY path", (digest,)
+        )
+        return [path for (path,) in rows]
+
+    def paragraphs(self, path: str) -> list[str]:
+        """Return the paragraphs of the file at `path`"""
+        rows = self.connection.execute(
+            """
+            SELECT paragraphs.text FROM files
+            JOIN paragraphs ON paragraphs.hash = files.hash
+            WHERE files.path = ?
+            ORDER BY paragraphs.position
+            """,
+            (path,),
+        )
+        return [text for (text,) in rows]
+
+    def duplicates(self) -> dict[str, list[str]]:
+        """Return the files with duplicate hashes, like `get_duplicate_files`"""
+        rows = self.connection.execute(
+            """
+            SELECT hash, path FROM files
+            WHERE hash IN (SELECT hash FROM files GROUP BY hash HAVING COUNT(*) > 1)
+            ORDER BY hash, path
+            """
+        )
+        duplicates = defaultdict(list)
+        for digest, path in rows:
+            duplicates[digest].append(path)
+        return dict(sorted(duplicates.items(), key=lambda d: len(d[1]), reverse=True))
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "InvoiceDatabase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def build_database(
+    database: InvoiceDatabase,
+    directory: Path,
+    extensions: set[str],
+    hash_function: str,
+    *,
+    jobs: int = 0,
+    fast: bool = True,
+    hash_cache: HashCache | None = None,
+    text_cache: TextCache | None = None,
+) -> dict[str, int]:
+    """Scan, hash and extract the documents in `directory` into `database`.
+
+    The build is incremental: changed files are updated, files which no
+    longer exist are removed, and text is only extracted for contents
+    which aren't already in the database. Contents which failed to
+    extract are retried.
+
+    Returns:
+        the number of files scanned, files removed and documents extracted.
+    """
+    entries = list(get_files_of_interest(directory, extensions))
+    filepaths = [Path(entry.path) for entry in entries]
+    stats = [entry.stat() for entry in entries]
+    if hash_cache is None:
+        digests = list(hash_files(filepaths, hash_function, jobs=jobs))
+    else:
+        digests = hash_files_cached(
+            filepaths, hash_function, hash_cache, stats=stats, jobs=jobs
+        )
+
+    paths = [filepath.as_posix() for filepath in filepaths]
+    database.upsert_files(zip(paths, stats, digests), hash_function)
+    removed = database.prune_files(directory, paths)
+
+    # extract a single file for each of the new hashes
+    unextracted = database.unextracted_hashes()
+    to_extract = {}
+    for filepath, digest in zip(filepaths, digests):
+        if digest in unextracted and digest not in to_extract:
+            to_extract[digest] = filepath
+    hash_by_path = {
+        filepath.as_posix(): digest for digest, filepath in to_extract.items()
+    }
+
+    async def _extract() -> None:
+        batch = []
+        async for result in extract_documents(
+            to_extract.values(),
+            jobs=jobs,
+            fast=fast,
+            text_cache=text_cache,
+            hash_function=hash_function,
+            hash_cache=hash_cache,
+        ):
+            batch.append((hash_by_path[result.path], result.paragraphs, result.error))
+            if len(batch) >= database.BATCH_SIZE:
+                database.add_documents(batch)
+                batch.clear()
+        database.add_documents(batch)
+
+    asyncio.run(_extract())
+    database.update_search_index()
+    return {"scanned": len(paths), "removed": removed, "extracted": len(to_extract)}
+
+
+def extract_fields(database: InvoiceDatabase, extractor: FieldExtractor) -> int:
+    """Extract the fields of the documents in `database` with `extractor`
+
+    Only documents which haven't been extracted with the same rules
+    before are processed, so changing a rule re-extracts every document.
+
+    Returns:
+        the number of documents processed.
+    """
+    counts = {"documents": 0}
+
+    def _extract() -> Iterator[tuple[str, dict[str, Any]]]:
+        for digest, paragraphs in database.documents_without_fields(
+            extractor.fingerprint
+        ):
+            counts["documents"] += 1
+            yield digest, extractor.extract(paragraphs)
+
+    database.add_fields(_extract(), extractor)
+    return counts["documents"]
@@ -0,0 +1,196 @@
+import asyncio
+import locale
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterator, Iterable
+
+from invoicetool.cache import HashCache, TextCache
+from invoicetool.hashes import hash_files, hash_files_cached
+from invoicetool.iotools import JsonlWriter, resolve_jobs
+from invoicetool.word import (
+    ANTIWORD_COMMAND,
+    extract_text_from_docx_as_list,
+    text_to_paragraphs,
+)
+
+
+@dataclass
+class ExtractionResult:
+    """The paragraphs extracted from a document, or the reason extraction failed"""
+
+    path: str
+    paragraphs: list[str] | None = None
+    error: str | None = None
+
+
+async def extract_text_from_doc_as_list_async(filepath: Path) -> list[str]:
+    """Extract all text from a `.doc` file without blocking the event loop"""
+    process = await asyncio.create_subprocess_exec(
+        ANTIWORD_COMMAND,
+        filepath.as_posix(),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    encoding = locale.getpreferredencoding(False)
+    if process.returncode != 0:
+        # e.g., a corrupt document, which would otherwise look empty
+        raise RuntimeError(
+            f"{ANTIWORD_COMMAND} exited with status {process.returncode}: {stderr.decode(encoding, errors='replace').strip()}"
+        )
+    # decode the same way as `subprocess.run(..., text=True)`
+    raw_text = stdout.decode(encoding).replace("\r\n", "\n")
+    return text_to_paragraphs(raw_text.strip())
+
+
+async def _extract(
+    filepath: Path, executor: Executor, semaphore: asyncio.Semaphore, fast: bool
+) -> ExtractionResult:
+    """Extract the paragraphs from a single document"""
+    try:
+        if filepath.suffix == ".docx":
+            loop = asyncio.get_running_loop()
+            paragraphs = await loop.run_in_executor(
+                executor, partial(extract_text_from_docx_as_list, fast=fast), filepath
+            )
+        elif filepath.suffix == ".doc":
+            async with semaphore:
+                paragraphs = await extract_text_from_doc_as_list_async(filepath)
+        else:
+            raise ValueError(f"Unsupported file extension: {filepath.suffix}")
+    except Exception as e:
+        return ExtractionResult(path=filepath.as_posix(), error=repr(e))
+    return ExtractionResult(path=filepath.as_posix(), paragraphs=paragraphs)
+
+
+async def extract_documents(
+    filepaths: Iterable[Path],
+    *,
+    jobs: int = 0,
+    max_subprocesses: int | None = None,
+    fast: bool = True,
+    text_cache: TextCache | None = None,
+    hash_function: str = "sha1",
+    hash_cache: HashCache | None = None,
+) -> AsyncIterator[ExtractionResult]:
+    """Extract the paragraphs from many documents concurrently.
+
+    `.docx` files are parsed on a pool of `jobs` processes (`0` uses one
+    per CPU), and `.doc` files are converted by at most
+    `max_subprocesses` concurrent `antiword` subprocesses (defaults to
+    `jobs`). With `fast=True`, `.docx` files are parsed with the
+    streaming parser rather than python-docx.
+
+    If a `text_cache` is given, documents are hashed with
+    `hash_function` first: cached documents aren't extracted again, and
+    only one of each set of duplicate documents is extracted.
+
+    Yields:
+        an `ExtractionResult` for each document, in order of completion.
+    """
+    filepaths = list(filepaths)
+    jobs = resolve_jobs(jobs)
+
+    # documents to extract, and the other documents with the same contents
+    to_extract: dict[str, list[Path]] = {
+        filepath.as_posix(): [filepath] for filepath in filepaths
+    }
+    digests: dict[str, str] = {}
+    if text_cache is not None:
+        if hash_cache is None:
+            file_hashes = list(hash_files(filepaths, hash_function, jobs=jobs))
+        else:
+            file_hashes = hash_files_cached(
+                filepaths, hash_function, hash_cache, jobs=jobs
+            )
+        by_digest: dict[str, list[Path]] = defaultdict(list)
+        for filepath, digest in zip(filepaths, file_hashes):
+            by_digest[digest].append(filepath)
+
+        to_extract.clear()
+        for digest, group in by_digest.items():
+            paragraphs = text_cache.get(digest, hash_function)
+            if paragraphs is None:
+                to_extract[group[0].as_posix()] = group
+                digests[group[0].as_posix()] = digest
+                continue
+            for filepath in group:
+                yield ExtractionResult(path=filepath.as_posix(), paragraphs=paragraphs)
+
+    semaphore = asyncio.Semaphore(max_subprocesses or jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        tasks = [
+            _extract(group[0], executor, semaphore, fast)
+            for group in to_extract.values()
+        ]
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            if text_cache is not None and result.error is None:
+                text_cache.put(digests[result.path], hash_function, result.paragraphs)
+            for filepath in to_extract[result.path]:
+                yield ExtractionResult(
+                    path=filepath.as_posix(),
+                    paragraphs=result.paragraphs,
+                    error=result.error,
+                )
+
+
+def write_extracted_text(
+    filepaths: Iterable[Path],
+    output_filepath: Path,
+    *,
+    jobs: int = 0,
+    max_subprocesses: int | None = None,
+    fast: bool = True,
+    text_cache: TextCache | None = None,
+    hash_function: str = "sha1",
+    hash_cache: HashCache | None = None,
+    flush_every: int = 100,
+) -> dict[str, int]:
+    """Extract the paragraphs from `filepaths` and write them to a JSONL file.
+
+    Each line of the output is an `ExtractionResult`, written as soon as
+    the document has been extracted. See `extract_documents` for the
+    keyword-only args.
+
+    Returns:
+        the number of documents which were extracted and which failed.
+    """
+
+    async def _write() -> dict[str, int]:
+        counts = {"extracted": 0, "failed": 0}
+        with JsonlWriter(output_filepath, flush_every=flush_every) as writer:
+            async for result in extract_documents(
+                filepaths,
+                jobs=jobs,
+                max_subprocesses=max_subprocesses,
+                fast=fast,
+                text_cache=text_cache,
+                hash_function=hash_function,
+                hash_cache=hash_cache,
+            ):
+                writer.write(asdict(result))
+                counts["failed" if result.error else "extracted"] += 1
+        return counts
+
+    return asyncio.run(_write())
+
+
+def extract_paragraphs(filepaths: Iterable[Path], **kwargs) -> dict[str, list[str]]:
+    """Extract the paragraphs from `filepaths`, keyed by path.
+
+    Documents which fail to extract are left out. See
+    `extract_documents` for the keyword-only args.
+    """
+
+    async def _collect() -> dict[str, list[str]]:
+        return {
+            result.path: result.paragraphs
+            async for result in extract_documents(filepaths, **kwargs)
+            if result.error is None
+        }
+
+    return asyncio.run(_collect())
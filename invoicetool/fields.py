@@ -0,0 +1,196 @@
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Callable, ClassVar, Iterable
+
+from invoicetool.config import load_config_file
+
+DEFAULT_DATE_FORMATS = ["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%d %B %Y"]
+
+
+def _parse_str(text: str, rule: "FieldRule") -> str:
+    return " ".join(text.split())
+
+
+def _parse_int(text: str, rule: "FieldRule") -> int:
+    return int(text.replace(",", "").replace(" ", ""))
+
+
+def _parse_decimal(text: str, rule: "FieldRule") -> Decimal:
+    # drop currency symbols & thousands separators, e.g., "€1,234.50"
+    try:
+        return Decimal(re.sub(r"[^\d.\-]", "", text))
+    except InvalidOperation:
+        raise ValueError(f"Invalid decimal: {text}") from None
+
+
+def _parse_date(text: str, rule: "FieldRule") -> date:
+    text = " ".join(text.split())
+    for date_format in rule.date_formats:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {text}")
+
+
+# parse the matched text of a field into its type
+PARSERS: dict[str, Callable[[str, "FieldRule"], Any]] = {
+    "str": _parse_str,
+    "int": _parse_int,
+    "decimal": _parse_decimal,
+    "date": _parse_date,
+}
+
+
+def to_sql(value: Any) -> str | int:
+    """Convert a field value to the value stored in SQLite"""
+    if isinstance(value, (Decimal, date)):
+        return str(value)
+    return value
+
+
+def from_sql(field_type: str, value: str | int) -> Any:
+    """Convert a value stored in SQLite back to the type of the field"""
+    if field_type == "decimal":
+        return Decimal(value)
+    if field_type == "date":
+        return date.fromisoformat(value)
+    return value
+
+
+@dataclass
+class FieldRule:
+    """A regular expression which extracts a field, e.g., the invoice number
+
+    The value of the field is the text matched by the `value` group of
+    `pattern` if it has one, otherwise the whole match, parsed as
+    `type` (one of `PARSERS`).
+    """
+
+    name: str
+    pattern: str
+    type: str = "str"
+    ignore_case: bool = True
+    date_formats: list[str] = field(default_factory=lambda: list(DEFAULT_DATE_FORMATS))
+
+    def __post_init__(self):
+        if self.type not in PARSERS:
+            raise ValueError(f"Invalid type for field {self.name}: {self.type}")
+        try:
+            re.compile(self.pattern)
+            # the pattern must also work as a later alternative of the combined
+            # pattern, which rules out numbered backreferences, e.g., `\1`, and
+            # global flags, e.g., `(?x)`
+            re.compile(f"(?:)|{_alternative(self, FieldExtractor.GROUP.format(1))[0]}")
+        except re.error as e:
+            raise ValueError(
+                f"Invalid pattern for field {self.name}: {e} "
+                "(use named groups & backreferences, and scoped flags such as `(?x:...)`)"
+            ) from None
+
+
+def _alternative(rule: FieldRule, group: str) -> tuple[str, str]:
+    """Return the alternative for `rule` in a combined pattern, as named
+    group `group`, and the name of the group which matches its value"""
+    value_group = group
+    pattern = rule.pattern
+    if "(?P<value>" in pattern:
+        # the named groups of each rule must be unique in the combined pattern
+        value_group = f"{group}_value"
+        pattern = pattern.replace("(?P<value>", f"(?P<{value_group}>")
+        pattern = pattern.replace("(?P=value)", f"(?P={value_group})")
+    if rule.ignore_case:
+        pattern = f"(?i:{pattern})"
+    return f"(?P<{group}>{pattern})", value_group
+
+
+class FieldExtractor:
+    """Extract the fields of a document with a set of `FieldRule`s.
+
+    The rules are compiled once into a single regular expression: an
+    alternation with a named group for each rule. Each paragraph is
+    scanned once for all of the rules, rather than once per rule, and
+    the rule which matched is found from the name of the group.
+
+    The first value found for each field is kept, and a document stops
+    being scanned as soon as every field has a value. Matches don't
+    overlap, so text matched by one rule can't also be matched by
+    another.
+    """
+
+    # the group of the combined pattern for the rule at an index
+    GROUP: ClassVar[str] = "rule{}"
+
+    def __init__(self, rules: Iterable[FieldRule]):
+        self.rules = list(rules)
+        # the rule of each group, and the group its value is matched by
+        self._groups: dict[str, tuple[FieldRule, str]] = {}
+        alternatives = []
+        for i, rule in enumerate(self.rules):
+            group = self.GROUP.format(i)
+            alternative, value_group = _alternative(rule, group)
+            alternatives.append(alternative)
+            self._groups[group] = (rule, value_group)
+        self.regex = None
+        if alternatives:
+            pattern = "|".join(alternatives)
+            try:
+                self.regex = re.compile(pattern)
+            except re.error as e:
+                # find the rule whose alternative contains the error
+                end = 0
+                for rule, alternative in zip(self.rules, alternatives):
+                    end += len(alternative) + 1
+                    if e.pos is None or e.pos < end:
+                        break
+                raise ValueError(
+                    f"Invalid pattern for field {rule.name}: {e}"
+                ) from None
+
+    @classmethod
+    def from_file(cls, path: Path | str | None = None) -> "FieldExtractor":
+        """Load the rules in the `[fields]` tables of a config file"""
+        return cls(load_field_rules(path))
+
+    @property
+    def fingerprint(self) -> str:
+        """Return a hash of the rules, which changes whenever a rule changes"""
+        rules = json.dumps([asdict(rule) for rule in self.rules], sort_keys=True)
+        return hashlib.sha1(rules.encode()).hexdigest()
+
+    def extract(self, paragraphs: Iterable[str]) -> dict[str, Any]:
+        """Return the value of each field found in `paragraphs`, by field name"""
+        fields: dict[str, Any] = {}
+        if self.regex is None:
+            return fields
+        for paragraph in paragraphs:
+            for match in self.regex.finditer(paragraph):
+                rule, value_group = self._groups[match.lastgroup]
+                if rule.name in fields:
+                    continue
+                # the `value` group may not take part in the match, e.g., `(?P<value>\d+)?`
+                text = match.group(value_group) or match.group(match.lastgroup)
+                try:
+                    fields[rule.name] = PARSERS[rule.type](text, rule)
+                except ValueError:
+                    continue
+            if len(fields) == len(self.rules):
+                break
+        return fields
+
+
+def load_field_rules(path: Path | str | None = None) -> list[FieldRule]:
+    """Load the rules in the `[fields]` tables of a config file
+
+    e.g.,
+
+        [fields.invoice_number]
+        pattern = 'invoice\\s+(?:no\\.?|number)\\s*:?\\s*(?P<value>\\w+)'
+    """
+    tables = load_config_file(path).get("fields", {})
+    return [FieldRule(name=name, **table) for name, table in tables.items()]
@@ -1,49 +1,184 @@
 import hashlib
+import mmap
+import os
+import threading
 from collections import defaultdict
+from concurrent.futures import Executor, ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
+from typing import Callable, Container, Iterable, Iterator, Protocol, Sequence, TypeVar
 
-from .iotools import filepaths_with_extensions
+from .cache import HashCache
+from .inventory import FileInventory, FileStat
+from .iotools import pathify, read_jsonl, resolve_jobs, scan_files
+from .journal import Journal
+from .profiling import stage
+from .progress import Progress
 
+try:
+    import xxhash
+except ImportError:  # optional dependency
+    xxhash = None
 
-def calculate_hash(
+try:
+    import blake3
+except ImportError:  # optional dependency
+    blake3 = None
+
+T = TypeVar("T")
+
+
+class Hash(Protocol):
+    def update(self, data: bytes, /) -> None: ...
+
+    def hexdigest(self) -> str: ...
+
+
+HASH_FUNCTIONS = ("md5", "sha1", "sha256", "sha512", "blake2b", "blake2s")
+# available when the optional `xxhash` package is installed
+XXHASH_FUNCTIONS = ("xxh64", "xxh3_64", "xxh3_128")
+
+# size of the buffer files are read into when hashing; smaller files are read in one go
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+# files at least this size are memory-mapped when hashing
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# number of bytes read from each end of a file for a partial hash
+PARTIAL_HASH_SAMPLE_SIZE = 4096
+
+# per-thread read buffers for `calculate_hash`
+_buffers = threading.local()
+
+
+def _read_buffer(size: int) -> memoryview:
+    """Return a buffer of `size` bytes which is reused by each call in this thread"""
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None or len(buffer) != size:
+        buffer = _buffers.buffer = bytearray(size)
+    return memoryview(buffer)
+
+
+def available_hash_functions() -> list[str]:
+    """Return the hash functions which can be used, including optional ones which are installed"""
+    hash_functions = list(HASH_FUNCTIONS)
+    if xxhash is not None:
+        hash_functions.extend(XXHASH_FUNCTIONS)
+    if blake3 is not None:
+        hash_functions.append("blake3")
+    return hash_functions
+
+
+def new_hash(hash_function: str) -> Hash:
+    """Return a new hash object for `hash_function` (see `available_hash_functions`)"""
+    hash_function = hash_function.lower()
+    if hash_function in HASH_FUNCTIONS:
+        return hashlib.new(hash_function)
+    if hash_function in XXHASH_FUNCTIONS and xxhash is not None:
+        return getattr(xxhash, hash_function)()
+    if hash_function == "blake3" and blake3 is not None:
+        return blake3.blake3()
+    # Raise a ValueError if an invalid hash function is passed in.
+    raise ValueError(f"Invalid hash function: {hash_function.upper()}")
+
+
+def calculate_digests(
     filename: Path | str,
-    hash_function: str,
+    hash_functions: Sequence[str],
     *,
-    block_size: int = 8192,
-) -> str:
-    """Return the hash for `filename`.
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    mmap_threshold: int | None = MMAP_THRESHOLD,
+) -> tuple[str, ...]:
+    """Return the digest of `filename` for each of `hash_functions`, reading it once.
+
+    How the file is read depends on its size:
+
+    - files of up to `block_size` bytes are read with a single read
+    - files of at least `mmap_threshold` bytes are memory-mapped and
+      hashed without copying them into Python at all
+    - other files are read in `block_size` chunks into a buffer which
+      is reused between calls
 
     Args:
         filename: name of the file of interest.
-        hash_function: string name of hash function to use. valid
-            choices are (`md5`, `sha1`, `sha256`, `sha512`).
+        hash_functions: string names of the hash functions to use.
+            see `available_hash_functions` for the valid choices.
 
     Keyword-only args:
-        block_size: block size to read when computing the hash
+        block_size: size of the buffer to read the file into
+        mmap_threshold: minimum size of a file to memory-map, or
+            `None` to never memory-map files
 
     Returns:
-        hexidecimal representation of secure hash (digest) for given
-            hash function.
+        hexidecimal digests, in the same order as `hash_functions`.
     """
-    hash_function = hash_function.upper()
-    hash_map = {
-        "MD5": hashlib.md5(),
-        "SHA1": hashlib.sha1(),
-        "SHA256": hashlib.sha256(),
-        "SHA512": hashlib.sha512(),
-    }
+    hash_fns = [new_hash(hash_function) for hash_function in hash_functions]
 
-    # Raise a ValueError if an invalid hash function is passed in.
-    if hash_function not in hash_map:
-        raise ValueError(f"Invalid hash function: {hash_function}")
+    # unbuffered, so that each read is a single syscall straight into our buffer
+    with open(filename, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if mmap_threshold is not None and size >= max(mmap_threshold, 1):
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mm, "madvise"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    for hash_fn in hash_fns:
+                        hash_fn.update(mm)
+                return tuple(hash_fn.hexdigest() for hash_fn in hash_fns)
+            except (OSError, ValueError):
+                # e.g., the filesystem doesn't support mmap
+                pass
 
-    hash_fn = hash_map[hash_function]
+        if size <= block_size:
+            data = f.read(size)
+            for hash_fn in hash_fns:
+                hash_fn.update(data)
+            if len(data) == size:
+                return tuple(hash_fn.hexdigest() for hash_fn in hash_fns)
 
-    with open(filename, "rb") as f:
-        for chunk in iter(partial(f.read, block_size), b""):
-            hash_fn.update(chunk)
+        # a short read above (e.g., the file grew) carries on from here
+        buffer = _read_buffer(block_size)
+        while n := f.readinto(buffer):
+            chunk = buffer[:n]
+            for hash_fn in hash_fns:
+                hash_fn.update(chunk)
+
+    return tuple(hash_fn.hexdigest() for hash_fn in hash_fns)
+
+
+def calculate_hash(
+    filename: Path | str,
+    hash_function: str,
+    *,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    mmap_threshold: int | None = MMAP_THRESHOLD,
+) -> str:
+    """Return the hash for `filename` (see `calculate_digests`)."""
+    return calculate_digests(
+        filename,
+        [hash_function],
+        block_size=block_size,
+        mmap_threshold=mmap_threshold,
+    )[0]
 
+
+def calculate_partial_hash(
+    filename: Path | str,
+    hash_function: str,
+    *,
+    sample_size: int = PARTIAL_HASH_SAMPLE_SIZE,
+) -> str:
+    """Return the hash of the first and last `sample_size` bytes of `filename`.
+
+    Files of `2 * sample_size` bytes or fewer are read in full, so for
+    these files the partial hash is the same as `calculate_hash`.
+    """
+    hash_fn = new_hash(hash_function)
+    with open(filename, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        hash_fn.update(f.read(sample_size))
+        if size > sample_size:
+            f.seek(max(sample_size, size - sample_size))
+            hash_fn.update(f.read(sample_size))
     return hash_fn.hexdigest()
 
 
@@ -67,12 +202,515 @@ def get_duplicate_files(
         return duplicates
 
 
+def hash_files(
+    filepaths: Iterable[Path],
+    hash_function: str,
+    *,
+    jobs: int = 1,
+    use_processes: bool = False,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[str]:
+    """Yield the hash of each file in `filepaths`, in the same order.
+
+    Args:
+        filepaths: files to hash.
+        hash_function: string name of hash function to use.
+
+    Keyword-only args:
+        jobs: number of workers. `1` hashes serially in the calling
+            thread, `0` uses one worker per CPU.
+        use_processes: use a process pool instead of a thread pool.
+            hashlib releases the GIL while hashing large buffers so
+            threads are usually enough; processes help when the
+            hash function (e.g., SHA512) is CPU-bound.
+        block_size: passed on to `calculate_hash`.
+
+    Returns:
+        iterator of hexidecimal digests, ordered as `filepaths`.
+    """
+    for digests in hash_files_multi(
+        filepaths,
+        [hash_function],
+        jobs=jobs,
+        use_processes=use_processes,
+        block_size=block_size,
+    ):
+        yield digests[0]
+
+
+def hash_files_multi(
+    filepaths: Iterable[Path],
+    hash_functions: Sequence[str],
+    *,
+    jobs: int = 1,
+    use_processes: bool = False,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[tuple[str, ...]]:
+    """Yield the digests of each file in `filepaths` for each of
+    `hash_functions`, reading each file once (see `hash_files`)."""
+    digests_fn = partial(
+        calculate_digests, hash_functions=list(hash_functions), block_size=block_size
+    )
+    yield from parallel_map(
+        digests_fn, filepaths, jobs=jobs, use_processes=use_processes
+    )
+
+
+def parallel_map(
+    fn: Callable[[Path], T],
+    filepaths: Iterable[Path],
+    *,
+    jobs: int = 1,
+    use_processes: bool = False,
+) -> Iterator[T]:
+    """Yield `fn(filepath)` for each of `filepaths`, in the same order"""
+    jobs = resolve_jobs(jobs)
+
+    if jobs == 1:
+        yield from map(fn, filepaths)
+        return
+
+    filepaths = list(filepaths)
+    executor: Executor
+    if use_processes:
+        # `multiprocessing` is slow to import, so only import it when it's used
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        # amortise the pickling overhead over several files per task
+        chunksize = max(1, len(filepaths) // (jobs * 4))
+    else:
+        executor = ThreadPoolExecutor(max_workers=jobs)
+        chunksize = 1
+
+    with executor:
+        # `Executor.map` returns results in submission order, which
+        # keeps the output identical to the serial case
+        yield from executor.map(fn, filepaths, chunksize=chunksize)
+
+
+def hash_files_cached(
+    filepaths: list[Path],
+    hash_function: str,
+    cache: HashCache,
+    *,
+    stats: list[os.stat_result] | None = None,
+    jobs: int = 1,
+    use_processes: bool = False,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> list[str]:
+    """Return the hash of each file in `filepaths`, using `cache` where possible.
+
+    Only files which are missing from the cache, or which have changed
+    since they were cached, are hashed. The cache is updated with the
+    new hashes. Pass `stats` (e.g., from `scan_files`) to avoid
+    stat'ing each file again.
+    """
+    return list(
+        iter_hashes_cached(
+            filepaths,
+            hash_function,
+            cache,
+            stats=stats,
+            jobs=jobs,
+            use_processes=use_processes,
+            block_size=block_size,
+        )
+    )
+
+
+def iter_hashes_cached(
+    filepaths: list[Path],
+    hash_function: str,
+    cache: HashCache,
+    *,
+    stats: list[os.stat_result] | None = None,
+    jobs: int = 1,
+    use_processes: bool = False,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[str]:
+    """Yield the hash of each file in `filepaths`, in the same order.
+
+    Like `hash_files_cached`, but each hash is yielded as soon as it is
+    available: cached hashes straight away, and other hashes once the
+    file has been hashed.
+    """
+    for digests in iter_digests_cached(
+        filepaths,
+        [hash_function],
+        cache,
+        stats=stats,
+        jobs=jobs,
+        use_processes=use_processes,
+        block_size=block_size,
+    ):
+        yield digests[0]
+
+
+def iter_digests_cached(
+    filepaths: list[Path],
+    hash_functions: Sequence[str],
+    cache: HashCache,
+    *,
+    stats: list[os.stat_result] | None = None,
+    jobs: int = 1,
+    use_processes: bool = False,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[tuple[str, ...]]:
+    """Yield the digests of each file in `filepaths` for each of `hash_functions`.
+
+    Like `iter_hashes_cached`, but a file which is missing from the cache
+    for any of `hash_functions` is read once for all of them.
+    """
+    keys = [filepath.as_posix() for filepath in filepaths]
+    if stats is None:
+        stats = [os.stat(filepath) for filepath in filepaths]
+    cached = [
+        tuple(cache.get(key, stat, hash_function) for hash_function in hash_functions)
+        for key, stat in zip(keys, stats)
+    ]
+
+    misses = [i for i, digests in enumerate(cached) if None in digests]
+    # all of the misses are hashed in the background while we iterate
+    new_digests = hash_files_multi(
+        [filepaths[i] for i in misses],
+        hash_functions,
+        jobs=jobs,
+        use_processes=use_processes,
+        block_size=block_size,
+    )
+    for i, digests in enumerate(cached):
+        if None in digests:
+            digests = next(new_digests)
+            for hash_function, digest in zip(hash_functions, digests):
+                cache.put(keys[i], stats[i], hash_function, digest)
+        yield digests
+    cache.flush()
+
+
+def iter_directory_hashes(
+    directory: Path,
+    extensions: list[str],
+    hash_function: str,
+    *,
+    jobs: int = 1,
+    use_processes: bool = False,
+    cache: HashCache | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    extra_hash_functions: Sequence[str] = (),
+    skip: Callable[[str, os.stat_result], bool] | None = None,
+    progress: Progress | None = None,
+) -> Iterator[tuple[str, FileStat, str, dict[str, str]]]:
+    """Yield the `(path, stat, hash, extra_digests)` of each file in a
+    directory, as it is hashed
+
+    `extra_digests` maps each of `extra_hash_functions` to the digest of
+    the file, computed in the same pass as `hash`. Files for which
+    `skip(path, stat)` returns `True` aren't hashed. The scan, and then
+    the hashing, are reported to `progress`.
+    """
+    if progress is not None:
+        progress.begin("scan")
+    with stage("scan") as scan_stage:
+        inventory = FileInventory.from_entries(
+            scan_files(pathify(directory), extensions, progress=progress)
+        )
+        scan_stage.add(files=len(inventory))
+    if skip is not None:
+        inventory = inventory.subset(
+            i
+            for i in range(len(inventory))
+            if not skip(inventory.path(i), inventory.stat(i))
+        )
+    filepaths = list(inventory.filepaths())
+    stats = list(inventory.stats())
+    if progress is not None:
+        progress.begin(
+            "hash", total_files=len(inventory), total_bytes=sum(inventory.sizes)
+        )
+
+    hash_functions = [hash_function, *extra_hash_functions]
+    if cache is None:
+        file_digests = hash_files_multi(
+            filepaths,
+            hash_functions,
+            jobs=jobs,
+            use_processes=use_processes,
+            block_size=block_size,
+        )
+    else:
+        file_digests = iter_digests_cached(
+            filepaths,
+            hash_functions,
+            cache,
+            stats=stats,
+            jobs=jobs,
+            use_processes=use_processes,
+            block_size=block_size,
+        )
+
+    for filepath, stat, digests in zip(filepaths, stats, file_digests):
+        if progress is not None:
+            progress.update(bytes=stat.st_size)
+        extra_digests = dict(zip(extra_hash_functions, digests[1:]))
+        yield filepath.as_posix(), stat, digests[0], extra_digests
+
+
 def calculate_hashes(
-    directory: Path, extensions: list[str], hash_function: str
+    directory: Path,
+    extensions: list[str],
+    hash_function: str,
+    *,
+    jobs: int = 1,
+    use_processes: bool = False,
+    cache: HashCache | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
 ) -> dict[str, list[str]]:
     """Calculate the hashes of all files in a directory"""
+    with stage("scan") as scan_stage:
+        inventory = FileInventory.from_entries(
+            scan_files(pathify(directory), extensions)
+        )
+        scan_stage.add(files=len(inventory))
+    with stage("hash") as hash_stage:
+        hash_inventory(
+            inventory,
+            hash_function,
+            jobs=jobs,
+            use_processes=use_processes,
+            cache=cache,
+            block_size=block_size,
+        )
+        hash_stage.add(files=len(inventory))
+    return inventory.to_hashes()
+
+
+def hash_inventory(
+    inventory: FileInventory,
+    hash_function: str,
+    *,
+    jobs: int = 1,
+    use_processes: bool = False,
+    cache: HashCache | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    progress: Progress | None = None,
+    description: str = "hash",
+) -> None:
+    """Hash every file in `inventory`, and store the digests in it
+
+    The hashing is reported to `progress` as the `description` phase.
+    """
+    filepaths = list(inventory.filepaths())
+    if cache is None:
+        digests = hash_files(
+            filepaths,
+            hash_function,
+            jobs=jobs,
+            use_processes=use_processes,
+            block_size=block_size,
+        )
+    else:
+        digests = iter_hashes_cached(
+            filepaths,
+            hash_function,
+            cache,
+            stats=list(inventory.stats()),
+            jobs=jobs,
+            use_processes=use_processes,
+            block_size=block_size,
+        )
+    if progress is not None:
+        progress.begin(
+            description, total_files=len(inventory), total_bytes=sum(inventory.sizes)
+        )
+
+    def _digests() -> Iterator[str]:
+        for size, digest in zip(inventory.sizes, digests):
+            if progress is not None:
+                progress.update(bytes=size)
+            yield digest
+
+    inventory.set_digests(hash_function, _digests())
+
+
+def write_hashes_jsonl(
+    directory: Path,
+    extensions: list[str],
+    hash_function: str,
+    filepath: Path,
+    *,
+    resume: bool = False,
+    jobs: int = 1,
+    use_processes: bool = False,
+    cache: HashCache | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    extra_hash_functions: Sequence[str] = (),
+    flush_every: int = 1000,
+    progress: Progress | None = None,
+) -> tuple[int, set[str]]:
+    """Hash the files in a directory, journaling one record per file to a JSONL file.
+
+    Each record (`{"path", "size", "mtime_ns", "hash_function", "hash"}`)
+    is written as soon as the file is hashed, and the file is flushed
+    every `flush_every` records, so an interrupted run loses very little
+    work. With `resume=True`, files which already have a record in
+    `filepath` and haven't changed since are skipped, and new records
+    are appended. With `extra_hash_functions`, each record also has the
+    `"digests"` of the file for those functions, computed in the same
+    read pass as `"hash"`.
+
+    Returns:
+        the number of records written, and the paths of the files found
+        by the scan, i.e., the records of `filepath` which are current.
+    """
+    extra_hash_functions = [name.lower() for name in extra_hash_functions]
+    context = {"hash_function": hash_function.lower()}
+    if extra_hash_functions:
+        context["extra_hash_functions"] = extra_hash_functions
+    n_records = 0
+    scanned = set()
+
+    def skip(path: str, stat: os.stat_result) -> bool:
+        scanned.add(path)
+        return journal.is_done(path, stat)
+
+    with Journal(
+        filepath, resume=resume, context=context, flush_every=flush_every
+    ) as journal:
+        for path, stat, file_hash, extra_digests in iter_directory_hashes(
+            directory,
+            extensions,
+            hash_function,
+            jobs=jobs,
+            use_processes=use_processes,
+            block_size=block_size,
+            cache=cache,
+            extra_hash_functions=extra_hash_functions,
+            skip=skip if resume else None,
+            progress=progress,
+        ):
+            if extra_digests:
+                journal.record(path, stat, hash=file_hash, digests=extra_digests)
+            else:
+                journal.record(path, stat, hash=file_hash)
+            scanned.add(path)
+            n_records += 1
+    return n_records, scanned
+
+
+def read_hashes_jsonl(
+    filepath: Path, paths: Container[str] | None = None
+) -> dict[str, list[str]]:
+    """Read a JSONL file written by `write_hashes_jsonl` into the same
+    dictionary as `calculate_hashes`
+
+    If a file was rehashed after resuming, its latest record is used.
+    If given, only the records of `paths` are read, e.g., to leave out
+    files which were deleted since an interrupted run, or which are in
+    another tree journaled to the same file.
+    """
+    latest = {
+        record["path"]: record["hash"]
+        for record in read_jsonl(filepath)
+        if paths is None or record["path"] in paths
+    }
     hashes = defaultdict(list)
-    for filepath in filepaths_with_extensions(directory, extensions):
-        file_hash = calculate_hash(filepath, hash_function)
-        hashes[file_hash].append(filepath.as_posix())
+    for path, file_hash in latest.items():
+        hashes[file_hash].append(path)
     return hashes
+
+
+def find_duplicate_files(
+    directory: Path,
+    extensions: list[str],
+    hash_function: str,
+    *,
+    jobs: int = 1,
+    use_processes: bool = False,
+    cache: HashCache | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    sample_size: int = PARTIAL_HASH_SAMPLE_SIZE,
+    progress: Progress | None = None,
+) -> dict[str, list[str]]:
+    """Find duplicate files without hashing every file in full.
+
+    Files are narrowed down in stages, and only files which still
+    collide at the end of a stage are passed on to the next:
+
+    1. group by file size; a file with a unique size has no duplicate
+    2. group by a hash of the first and last `sample_size` bytes
+    3. group by the hash of the full file contents
+
+    Each stage is reported to `progress`.
+
+    Returns:
+        the same dictionary as `get_duplicate_files(calculate_hashes(...))`.
+    """
+    if progress is not None:
+        progress.begin("scan")
+    with stage("scan") as scan_stage:
+        inventory = FileInventory.from_entries(
+            scan_files(pathify(directory), extensions, progress=progress)
+        )
+        scan_stage.add(files=len(inventory))
+
+    # keep the walk order so that the output order matches `calculate_hashes`
+    candidates = sorted(
+        i for group in inventory.group_by_size().values() for i in group
+    )
+
+    partial_hash_fn = partial(
+        calculate_partial_hash, hash_function=hash_function, sample_size=sample_size
+    )
+    partial_hashes = parallel_map(
+        partial_hash_fn,
+        [inventory.filepath(i) for i in candidates],
+        jobs=jobs,
+        use_processes=use_processes,
+    )
+    by_partial_hash: dict[tuple[int, str], list[int]] = defaultdict(list)
+    if progress is not None:
+        progress.begin("partial hash", total_files=len(candidates))
+    with stage("partial-hash") as partial_hash_stage:
+        for i, partial_hash in zip(candidates, partial_hashes):
+            by_partial_hash[(inventory.sizes[i], partial_hash)].append(i)
+            if progress is not None:
+                progress.update()
+        partial_hash_stage.add(files=len(candidates))
+
+    digests: dict[int, str] = {}
+    needs_full_hash = []
+    for (size, partial_hash), group in by_partial_hash.items():
+        if len(group) == 1:
+            continue
+        if size <= 2 * sample_size:
+            # the whole file was read, so the partial hash is the full hash
+            digests.update((i, partial_hash) for i in group)
+        else:
+            needs_full_hash.extend(group)
+
+    to_hash = inventory.subset(needs_full_hash)
+    with stage("full-hash") as full_hash_stage:
+        hash_inventory(
+            to_hash,
+            hash_function,
+            jobs=jobs,
+            use_processes=use_processes,
+            cache=cache,
+            block_size=block_size,
+            progress=progress,
+            description="full hash",
+        )
+        full_hash_stage.add(files=len(to_hash))
+    digests.update((i, to_hash.hexdigest(j)) for j, i in enumerate(needs_full_hash))
+
+    # keep the walk order, so that the groups are in order of their first file
+    hashed_indices = sorted(digests)
+    hashed = inventory.subset(hashed_indices)
+    hashed.set_digests(hash_function, [digests[i] for i in hashed_indices])
+    return get_duplicate_files(
+        {
+            digest: [hashed.path(j) for j in group]
+            for digest, group in hashed.group_by_hash().items()
+        }
+    )
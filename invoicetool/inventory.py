@@ -0,0 +1,224 @@
+import os
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Hashable, Iterable, Iterator, NamedTuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+# inventories with at least this many files are grouped with NumPy, if it's installed
+NUMPY_GROUP_THRESHOLD = 10_000
+
+
+class FileStat(NamedTuple):
+    """The fields of an `os.stat_result` which the caches & journals use"""
+
+    st_size: int
+    st_mtime_ns: int
+    st_ino: int
+
+
+def import_numpy():
+    """Return the NumPy module, or `None` if it isn't installed
+
+    NumPy is an optional dependency, and slow to import, so it's only
+    imported by the code which uses it, e.g., to group large inventories.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def require_numpy(purpose: str):
+    """Return the NumPy module, or raise if it isn't installed"""
+    np = import_numpy()
+    if np is None:
+        raise ModuleNotFoundError(
+            f"NumPy is required for {purpose}, install it with: uv pip install -e '.[analysis]'"
+        )
+    return np
+
+
+def _group_in_python(keys: Iterable[K], min_count: int) -> dict[K, list[int]]:
+    groups: dict[K, list[int]] = defaultdict(list)
+    for i, key in enumerate(keys):
+        groups[key].append(i)
+    return {key: group for key, group in groups.items() if len(group) >= min_count}
+
+
+def _group_with_numpy(np, labels, min_count: int) -> list[list[int]]:
+    """Return the indices of each group of equal `labels`, in order of
+    their first index, with the indices of each group in order"""
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    counts = np.diff(np.r_[starts, len(labels)])
+    keep = counts >= min_count
+    groups = [
+        order[start : start + count].tolist()
+        for start, count in zip(starts[keep].tolist(), counts[keep].tolist())
+    ]
+    groups.sort(key=lambda group: group[0])
+    return groups
+
+
+class FileInventory:
+    """Compact, column-oriented inventory of files.
+
+    Rather than a `Path` and an `os.stat_result` for each file, each
+    directory is stored once, and a file is the index of its directory
+    plus its name. Sizes, modification times and inodes are stored in
+    `array` columns, and digests as fixed-width bytes in a single
+    `bytearray`, so that millions of files take tens rather than
+    thousands of MB.
+
+    Files are identified by their index, in the order they were added
+    (e.g., the order of the walk). `Path` objects and hexadecimal
+    digests are only created when asked for.
+    """
+
+    def __init__(self):
+        self.directories: list[str] = []
+        self._directory_ids: dict[str, int] = {}
+        self.directory_ids = array("I")
+        self.names: list[str] = []
+        self.sizes = array("q")
+        self.mtimes_ns = array("q")
+        self.inodes = array("Q")
+        self.hash_function: str | None = None
+        self.digest_size = 0
+        self.digests = bytearray()
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[os.DirEntry]) -> "FileInventory":
+        """Return an inventory of `entries`, e.g., from `scan_files`"""
+        inventory = cls()
+        for entry in entries:
+            inventory.add(entry.path, entry.stat())
+        return inventory
+
+    @classmethod
+    def from_filepaths(cls, filepaths: Iterable[Path]) -> "FileInventory":
+        """Return an inventory of `filepaths`, reading the stats of each file"""
+        inventory = cls()
+        for filepath in filepaths:
+            inventory.add(str(filepath), filepath.stat())
+        return inventory
+
+    def add(self, path: str, stat: os.stat_result | FileStat) -> int:
+        """Add the file at `path`, and return its index"""
+        directory, name = os.path.split(path)
+        directory_id = self._directory_ids.get(directory)
+        if directory_id is None:
+            directory_id = self._directory_ids[directory] = len(self.directories)
+            self.directories.append(directory)
+        self.directory_ids.append(directory_id)
+        self.names.append(name)
+        self.sizes.append(stat.st_size)
+        self.mtimes_ns.append(stat.st_mtime_ns)
+        self.inodes.append(stat.st_ino)
+        return len(self.names) - 1
+
+    def subset(self, indices: Iterable[int]) -> "FileInventory":
+        """Return an inventory of the files at `indices`, in that order"""
+        inventory = FileInventory()
+        inventory.directories = list(self.directories)
+        inventory._directory_ids = dict(self._directory_ids)
+        inventory.hash_function = self.hash_function
+        inventory.digest_size = self.digest_size
+        for i in indices:
+            inventory.directory_ids.append(self.directory_ids[i])
+            inventory.names.append(self.names[i])
+            inventory.sizes.append(self.sizes[i])
+            inventory.mtimes_ns.append(self.mtimes_ns[i])
+            inventory.inodes.append(self.inodes[i])
+            if self.digest_size:
+                inventory.digests += self.digest(i)
+        return inventory
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def path(self, i: int) -> str:
+        return os.path.join(self.directories[self.directory_ids[i]], self.names[i])
+
+    def filepath(self, i: int) -> Path:
+        return Path(self.path(i))
+
+    def paths(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.path(i)
+
+    def filepaths(self) -> Iterator[Path]:
+        for i in range(len(self)):
+            yield self.filepath(i)
+
+    def stat(self, i: int) -> FileStat:
+        return FileStat(self.sizes[i], self.mtimes_ns[i], self.inodes[i])
+
+    def stats(self) -> Iterator[FileStat]:
+        for i in range(len(self)):
+            yield self.stat(i)
+
+    def set_digests(self, hash_function: str, digests: Iterable[str]) -> None:
+        """Store the hexadecimal `digests` of every file, in order"""
+        packed = bytearray()
+        count = digest_size = 0
+        for digest in digests:
+            raw = bytes.fromhex(digest)
+            if count and len(raw) != digest_size:
+                raise ValueError("Expected a digest of the same size for every file")
+            digest_size = len(raw)
+            packed += raw
+            count += 1
+        if count != len(self):
+            raise ValueError("Expected a digest for every file")
+        self.hash_function = hash_function.lower()
+        self.digest_size = digest_size
+        self.digests = packed
+
+    def digest(self, i: int) -> bytes:
+        start = i * self.digest_size
+        return bytes(self.digests[start : start + self.digest_size])
+
+    def hexdigest(self, i: int) -> str:
+        return self.digest(i).hex()
+
+    def group_by_size(self, *, min_count: int = 2) -> dict[int, list[int]]:
+        """Return the indices of the files of each size shared by at least
+        `min_count` files, in order of the first file of each size"""
+        np = import_numpy() if len(self) >= NUMPY_GROUP_THRESHOLD else None
+        if np is None:
+            return _group_in_python(self.sizes, min_count)
+        sizes = np.frombuffer(self.sizes, dtype=np.int64)
+        return {
+            self.sizes[group[0]]: group
+            for group in _group_with_numpy(np, sizes, min_count)
+        }
+
+    def group_by_hash(self, *, min_count: int = 2) -> dict[str, list[int]]:
+        """Return the indices of the files with each digest shared by at
+        least `min_count` files, in order of the first file of each digest"""
+        if self.hash_function is None:
+            raise ValueError("The files haven't been hashed")
+        np = import_numpy() if len(self) >= NUMPY_GROUP_THRESHOLD else None
+        if np is None:
+            groups = _group_in_python(
+                (self.digest(i) for i in range(len(self))), min_count
+            )
+            return {digest.hex(): group for digest, group in groups.items()}
+        digests = np.frombuffer(self.digests, dtype=np.uint8).reshape(len(self), -1)
+        _, labels = np.unique(digests, axis=0, return_inverse=True)
+        return {
+            self.hexdigest(group[0]): group
+            for group in _group_with_numpy(np, labels.reshape(-1), min_count)
+        }
+
+    def to_hashes(self) -> dict[str, list[str]]:
+        """Return the paths of the files with each digest, like `calculate_hashes`"""
+        hashes: dict[str, list[str]] = defaultdict(list)
+        for i in range(len(self)):
+            hashes[self.hexdigest(i)].append(self.path(i))
+        return dict(hashes)
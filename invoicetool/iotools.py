@@ -1,10 +1,27 @@
+import errno
 import json
 import logging
+import os
 import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Iterable, Iterator
+from typing import Any, Callable, Iterable, Iterator
 
 from invoicetool.dates_times import today2ymd
+from invoicetool.inventory import FileInventory
+from invoicetool.progress import Progress
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+# ioctl request to share the data blocks of one file with another (see linux/fs.h)
+FICLONE = 0x40049409
 
 # def ensure_path(path: Path | str):
 #     """Ensure that a directory exists, creating if needed"""
@@ -21,30 +38,116 @@ def ensure_dir(path: Path | str) -> None:
     pathify(path).mkdir(exist_ok=True, parents=True)
 
 
+def scan_files(
+    directory: Path | str,
+    extensions: Iterable[str] | None = None,
+    *,
+    progress: Progress | None = None,
+    skip_missing: bool = False,
+) -> Iterator[os.DirEntry]:
+    """Yield an `os.DirEntry` for each file below `directory`.
+
+    The tree is walked depth-first with an explicit stack of
+    `os.scandir` iterators, so deep trees can't hit the recursion
+    limit. Files are filtered on the raw name before any `Path` is
+    built, and `DirEntry.stat()` caches its result so callers can
+    read the size & modification time without another syscall.
+
+    If `extensions` is `None` then all files are yielded. The number of
+    files found is reported to `progress` once per directory. If
+    `skip_missing=True`, directories (including `directory`) which are
+    removed while the tree is walked are skipped rather than raising.
+    """
+    extensions = None if extensions is None else set(extensions)
+
+    def _scandir(path: Path | str) -> list[Iterator[os.DirEntry]]:
+        try:
+            return [os.scandir(path)]
+        except (FileNotFoundError, NotADirectoryError):
+            if not skip_missing:
+                raise
+            return []
+
+    stack = _scandir(directory)
+    found = 0
+    try:
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop().close()
+                if progress is not None:
+                    progress.update(files=found)
+                    found = 0
+            elif entry.is_dir():
+                stack.extend(_scandir(entry.path))
+            elif extensions is None or os.path.splitext(entry.name)[1] in extensions:
+                found += 1
+                yield entry
+    finally:
+        for iterator in stack:
+            iterator.close()
+
+
 def scantree(path: Path) -> Iterator[Path]:
     """Recursively yield `Path` objects for given directory"""
-    for entry in path.iterdir():
-        if entry.is_dir():
-            yield from scantree(entry)
-        else:
-            yield entry
+    for entry in scan_files(path):
+        yield Path(entry.path)
 
 
 def filepaths_with_extensions(directory: Path, extensions: set[str]) -> Iterable[Path]:
     """Yield a sequence of absolute filepaths starting from `directory` which match `extensions`."""
-    for filepath in scantree(directory):
-        # skip files with extensions not in `extensions`
-        if filepath.suffix not in extensions:
+    for entry in scan_files(pathify(directory), extensions):
+        yield Path(entry.path)
+
+
+def get_files_of_interest(
+    directory: Path, extensions: set[str], *, progress: Progress | None = None
+) -> Iterator[os.DirEntry]:
+    """Yield a `DirEntry` for each file starting from `directory` which
+    matches `extensions` and isn't an empty temporary Word document.
+    """
+    for entry in scan_files(pathify(directory), extensions, progress=progress):
+        if is_empty_file(entry):
             continue
-        yield pathify(filepath)
+        yield entry
 
 
 def get_filepaths_of_interest(directory: Path, extensions: set[str]) -> Iterator[Path]:
     """Yield a sequence of absolute filepaths starting from the
     `target` directory which match `extensions`.
     """
-    for filepath in filepaths_with_extensions(directory, extensions):
-        if is_empty_file(filepath):
+    for entry in get_files_of_interest(directory, extensions):
+        yield Path(entry.path)
+
+
+def filter_filepaths_of_interest(
+    filepaths: Iterable[Path],
+    extensions: set[str],
+    *,
+    on_error: Callable[[Path, OSError], None] | None = None,
+) -> Iterator[Path]:
+    """Yield the filepaths in `filepaths` which match `extensions`, still
+    exist, and aren't empty temporary Word documents.
+
+    Like `get_filepaths_of_interest`, for a known list of files rather
+    than a directory tree. A file which is removed while it's checked
+    is skipped. If `on_error` is given, a file which can't be checked
+    for another reason is skipped, and `on_error` is called with the
+    file and the error; otherwise the error is raised.
+    """
+    for filepath in filepaths:
+        if filepath.suffix not in extensions:
+            continue
+        try:
+            if not filepath.is_file() or is_empty_file(filepath):
+                continue
+        except FileNotFoundError:
+            # e.g., a Word lock file which was removed when the document was closed
+            continue
+        except OSError as e:
+            if on_error is None:
+                raise
+            on_error(filepath, e)
             continue
         yield filepath
 
@@ -56,13 +159,13 @@ def remove_temporary_word_files(
     # Hard-code the extensions as we're removing specific file types
     extensions = {".doc", ".docx"}
 
-    for filepath in filepaths_with_extensions(directory, extensions):
-        if is_empty_file(filepath):
-            logger.info(f"Remove temporary Word document: {filepath.name}")
-            filepath.unlink()
+    for entry in scan_files(directory, extensions):
+        if is_empty_file(entry):
+            logger.info(f"Remove temporary Word document: {entry.name}")
+            os.unlink(entry.path)
 
 
-def is_empty_file(path: Path) -> bool:
+def is_empty_file(path: Path | os.DirEntry) -> bool:
     """Return whether or not a file is an empty temporary MS Word document.
 
     Checks:
@@ -70,31 +173,175 @@ def is_empty_file(path: Path) -> bool:
     - If the file size is exactly 162 bytes
 
     Files which match these criteria are empty temporary MS Word documents.
+    Passing an `os.DirEntry` reuses its cached stat result.
     """
     return path.name.startswith("~$") and path.stat().st_size == 162
 
 
-def copy_files(destination: Path, filepaths: Iterable[Path]) -> None:
+def resolve_jobs(jobs: int) -> int:
+    """Return the number of workers to use, where `0` means one per CPU"""
+    if jobs < 0:
+        raise ValueError(f"Invalid number of jobs: {jobs}")
+    return jobs or os.cpu_count() or 1
+
+
+@dataclass
+class CopyStats:
+    """Throughput of a batch of copies"""
+
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.files} files ({self.bytes / 1e6:.1f} MB) in {self.seconds:.2f}s: "
+            f"{self.files_per_second:.1f} files/s, {self.megabytes_per_second:.1f} MB/s"
+        )
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    """Share the data blocks of `src_fd` with `dst_fd` (copy-on-write), if supported"""
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except OSError:
+        return False
+    return True
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int) -> int | None:
+    """Copy `size` bytes from `src_fd` to `dst_fd` within the kernel, if supported
+
+    Returns:
+        the number of bytes copied, or `None` if nothing could be copied
+        this way.
+    """
+    if not hasattr(os, "copy_file_range"):
+        return None
+    copied = 0
+    while copied < size:
+        try:
+            n = os.copy_file_range(src_fd, dst_fd, size - copied)
+        except OSError:
+            if copied:
+                raise
+            # e.g., copying across filesystems on older kernels
+            return None
+        if n == 0:
+            if not copied:
+                # e.g., procfs, sysfs and some FUSE & network filesystems
+                return None
+            raise OSError(
+                errno.EIO, f"copy_file_range stopped after {copied} of {size} bytes"
+            )
+        copied += n
+    return copied
+
+
+def copy_file(src: Path, dst: Path) -> int:
+    """Copy `src` to `dst` along with its metadata, like `shutil.copy2`.
+
+    Tries a reflink first, then `os.copy_file_range`, and otherwise
+    falls back to `shutil.copyfile` (which uses `sendfile` or
+    `fcopyfile` where available).
+
+    The copy is written to a temporary file next to `dst`, which then
+    replaces `dst`. An existing `dst` is never written to, as it may be
+    hard linked to the same file in a previous dump.
+
+    Returns:
+        the number of bytes written to `dst`.
     """
-    Copy files in `filepaths` from `src` to `dst`.
+    fd, tmp_path = tempfile.mkstemp(dir=dst.parent, prefix=f".{dst.name}.")
+    tmp = Path(tmp_path)
+    try:
+        with open(src, "rb") as fsrc, open(fd, "wb") as fdst:
+            if _reflink(fsrc.fileno(), fdst.fileno()):
+                copied = os.fstat(fdst.fileno()).st_size
+            else:
+                size = os.fstat(fsrc.fileno()).st_size
+                copied = _copy_file_range(fsrc.fileno(), fdst.fileno(), size)
+        if copied is None:
+            shutil.copyfile(src, tmp)
+            copied = tmp.stat().st_size
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return copied
+
+
+def copy_files(
+    destination: Path,
+    inventory: FileInventory,
+    indices: Iterable[int] | None = None,
+    *,
+    jobs: int = 1,
+    on_copied: Callable[[int], None] | None = None,
+    on_error: Callable[[int, OSError], None] | None = None,
+) -> CopyStats:
+    """
+    Copy the files at `indices` (default: all) of `inventory` to `destination`.
 
     `destination` is the parent directory where the original
     directory structure will be mirrored to.
+
+    Files are copied by a pool of `jobs` threads (`0` uses one per
+    CPU), and each destination directory is created once up front.
+    If given, `on_copied` is called with the index of each file, in
+    order, once it has been copied. If `on_error` is given, a file which
+    can't be copied (e.g., it was deleted) is skipped, and `on_error` is
+    called with its index and the error; otherwise the error is raised.
     """
     # make sure the destination directory exists
     ensure_dir(destination)
-    for filepath in filepaths:
-        # path to the original file
-        src = filepath
-
-        # path to the new destination file
-        dst = destination / get_relative_filepath(src, destination.name)
-
-        # create the parent directory if it doesn't exist
-        ensure_dir(dst.parent)
 
-        # copy the file from `src` to `dst`
-        shutil.copy2(src, dst)
+    # path to the original file, and path to the new destination file
+    indices = range(len(inventory)) if indices is None else list(indices)
+    srcs = [inventory.filepath(i) for i in indices]
+    dsts = [destination / get_relative_filepath(src, destination.name) for src in srcs]
+
+    # create the parent directories, once per directory rather than once per file
+    for directory in sorted({dst.parent for dst in dsts}):
+        ensure_dir(directory)
+
+    def _copy_file(src: Path, dst: Path) -> int | OSError:
+        try:
+            return copy_file(src, dst)
+        except OSError as e:
+            if on_error is None:
+                raise
+            return e
+
+    start = time.perf_counter()
+    jobs = resolve_jobs(jobs)
+    sizes = []
+    with ThreadPoolExecutor(
+        max_workers=jobs
+    ) if jobs > 1 else nullcontext() as executor:
+        mapper = executor.map if executor is not None else map
+        for i, size in zip(indices, mapper(_copy_file, srcs, dsts)):
+            if isinstance(size, OSError):
+                on_error(i, size)
+                continue
+            sizes.append(size)
+            if on_copied is not None:
+                on_copied(i)
+
+    return CopyStats(
+        files=len(sizes), bytes=sum(sizes), seconds=time.perf_counter() - start
+    )
 
 
 def get_relative_filepath(abs_filepath: Path, start_dir: str) -> Path:
@@ -128,6 +375,71 @@ def write_json(obj: Any, filepath: Path) -> None:
     filepath.write_text(json.dumps(obj, indent=2))
 
 
+class JsonlWriter:
+    """Write JSON records to a file, one per line, flushing periodically.
+
+    When appending, a partial line left behind by an interrupted write
+    is removed first.
+    """
+
+    def __init__(
+        self, filepath: Path, *, append: bool = False, flush_every: int = 1000
+    ):
+        if append:
+            truncate_partial_line(filepath)
+        self._file = open(filepath, "a" if append else "w", encoding="utf-8")
+        self._flush_every = flush_every
+        self._n_unflushed = 0
+
+    def write(self, record: Any) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._n_unflushed += 1
+        if self._n_unflushed >= self._flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        self._file.flush()
+        self._n_unflushed = 0
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def truncate_partial_line(filepath: Path) -> None:
+    """Remove anything after the last newline in `filepath`, if it exists"""
+    if not filepath.exists():
+        return
+    with open(filepath, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        position = size
+        while position > 0:
+            block_start = max(0, position - 8192)
+            f.seek(block_start)
+            block = f.read(position - block_start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                f.truncate(block_start + newline + 1)
+                return
+            position = block_start
+        f.truncate(0)
+
+
+def read_jsonl(filepath: Path) -> Iterator[Any]:
+    """Yield the records in a JSONL file, ignoring a partial final line"""
+    with open(filepath, encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                # the write of the final record was interrupted
+                break
+            yield json.loads(line)
+
+
 def pathify(path: Path | str) -> Path:
     """Return an absolute Path object with the home directory expanded"""
     if isinstance(path, str):
@@ -161,12 +473,6 @@ def remove_directory_if_empty(directory: Path) -> None:
         directory.rmdir()
 
 
-def generate_manifest(
-    start_dir: Path, output_directory: Path, extensions: Iterable[str]
-):
-    return sorted(filepaths_with_extensions(start_dir, extensions))
-
-
 def build_output_directory(
     base_output_directory: Path, starting_directory: Path
 ) -> Path:
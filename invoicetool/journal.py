@@ -0,0 +1,77 @@
+import os
+from pathlib import Path
+from typing import Any
+
+from invoicetool.iotools import JsonlWriter, read_jsonl
+
+
+def journal_filepath(output_directory: Path) -> Path:
+    """Return the journal filepath for the document dump in `output_directory`
+
+    Like the manifest, the journal is written next to the dump rather
+    than inside it.
+    """
+    return output_directory.parent / f"{output_directory.name}.journal.jsonl"
+
+
+class Journal:
+    """Append-only log of the files which a long-running command has finished with.
+
+    Each record holds the path, size and modification time of a file,
+    the `context` of the run (e.g., the hash function), and the result
+    of the work (e.g., a hash or a copy status). Records are flushed
+    every `flush_every` writes, so an interrupted run loses very little.
+
+    With `resume=True` the existing records are loaded and new records
+    are appended; otherwise the journal is started afresh.
+    """
+
+    def __init__(
+        self,
+        filepath: Path,
+        *,
+        resume: bool = False,
+        context: dict[str, Any] | None = None,
+        flush_every: int = 100,
+    ):
+        self.filepath = filepath
+        self.context = context or {}
+        self.completed: dict[str, dict[str, Any]] = {}
+        if resume and filepath.exists():
+            for record in read_jsonl(filepath):
+                self.completed[record["path"]] = record
+        self._writer = JsonlWriter(filepath, append=resume, flush_every=flush_every)
+
+    def is_done(self, path: str, stat: os.stat_result) -> bool:
+        """Return `True` if `path` has a record and hasn't changed since"""
+        record = self.completed.get(path)
+        return (
+            record is not None
+            and record["size"] == stat.st_size
+            and record["mtime_ns"] == stat.st_mtime_ns
+            and all(record.get(key) == value for key, value in self.context.items())
+        )
+
+    def record(self, path: str, stat: os.stat_result, **result: Any) -> None:
+        """Append a record that the work on `path` is done"""
+        record = {
+            "path": path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            **self.context,
+            **result,
+        }
+        self._writer.write(record)
+        self.completed[path] = record
+
+    def flush(self) -> None:
+        self._writer.flush()
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,13 +1,11 @@
+import copy
 import logging
 import logging.config
 from pathlib import Path
 from typing import Any
 
-import tomllib
-
-from invoicetool.config import Config
+from invoicetool.config import PROJECT_DIRECTORY, load_config_file
 from invoicetool.dates_times import ymdhms_now
-from invoicetool.iotools import pathify
 
 
 def get_logger(
@@ -16,15 +14,8 @@ def get_logger(
     config_filepath: Path | str | None = None,
 ) -> logging.Logger:
     """Configure logging"""
-    _config = (
-        Config.from_file(config_filepath)
-        if config_filepath is not None
-        else Config.default()
-    )
-    logging_config = load_logging_config_dict(
-        config_filepath or _config._DEFAULT_CONFIG_PATH
-    )
-    logs_directory = pathify(_config.project_directory) / "logs"
+    logging_config = load_logging_config_dict(config_filepath)
+    logs_directory = PROJECT_DIRECTORY / "logs"
     logging_config["handlers"]["file_handler"]["filename"] = (
         logs_directory / f"{ymdhms_now()}.log"
     ).as_posix()
@@ -32,7 +23,7 @@ def get_logger(
     return logging.getLogger(logger_name)
 
 
-def load_logging_config_dict(path: Path | str) -> dict[str, Any]:
+def load_logging_config_dict(path: Path | str | None = None) -> dict[str, Any]:
     """Load a logging config file and return as a dict"""
-    with open(path, "rb") as f:
-        return tomllib.load(f)["log"]
+    # a copy, as the parsed config file is shared (see `load_config_file`)
+    return copy.deepcopy(load_config_file(path)["log"])
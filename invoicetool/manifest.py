@@ -0,0 +1,164 @@
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from invoicetool.cache import HashCache
+from invoicetool.hashes import hash_inventory
+from invoicetool.inventory import FileInventory
+from invoicetool.iotools import (
+    CopyStats,
+    copy_files,
+    ensure_dir,
+    get_relative_filepath,
+)
+
+Manifest = dict[str, Any]
+
+DATE_DIRECTORY_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def manifest_filepath(output_directory: Path) -> Path:
+    """Return the manifest filepath for the document dump in `output_directory`
+
+    The manifest is written next to the dump rather than inside it, so
+    that it isn't included in any archive of the dump.
+    """
+    return output_directory.parent / f"{output_directory.name}.manifest.json"
+
+
+def generate_manifest(
+    inventory: FileInventory,
+    output_directory: Path,
+    hash_function: str,
+    *,
+    cache: HashCache | None = None,
+    jobs: int = 1,
+) -> Manifest:
+    """Return a manifest of the files which will be dumped to `output_directory`.
+
+    The manifest maps the path of each file relative to the dump to its
+    size, modification time and hash.
+    """
+    if inventory.hash_function != hash_function.lower():
+        hash_inventory(inventory, hash_function, cache=cache, jobs=jobs)
+
+    files = {}
+    for i, filepath in enumerate(inventory.filepaths()):
+        relative_filepath = get_relative_filepath(filepath, output_directory.name)
+        files[relative_filepath.as_posix()] = {
+            "size": inventory.sizes[i],
+            "mtime_ns": inventory.mtimes_ns[i],
+            "hash": inventory.hexdigest(i),
+        }
+
+    return {"hash_function": hash_function.lower(), "files": files}
+
+
+def load_manifest(filepath: Path) -> Manifest:
+    """Load a manifest written by `write_json`"""
+    return json.loads(filepath.read_text())
+
+
+def find_previous_dump(output_directory: Path) -> Path | None:
+    """Return the most recent dump of the same starting directory which has a manifest.
+
+    Dumps are stored as `base_output_directory / YYYY-MM-DD / START_DIR.name`,
+    so the most recent dump is found by sorting the date directories.
+    """
+    base_output_directory = output_directory.parent.parent
+    if not base_output_directory.is_dir():
+        return None
+
+    date_directories = sorted(
+        (
+            path
+            for path in base_output_directory.iterdir()
+            if DATE_DIRECTORY_PATTERN.fullmatch(path.name)
+        ),
+        reverse=True,
+    )
+    for date_directory in date_directories:
+        previous_dump = date_directory / output_directory.name
+        if manifest_filepath(previous_dump).exists() and previous_dump.is_dir():
+            return previous_dump
+    return None
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    """Hard link `dst` to `src`, falling back to a copy if linking isn't possible"""
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        # e.g., the dumps are on different filesystems, or the
+        # filesystem doesn't support hard links
+        shutil.copy2(src, dst)
+
+
+def copy_files_incremental(
+    destination: Path,
+    inventory: FileInventory,
+    indices: Iterable[int] | None,
+    manifest: Manifest,
+    previous_dump: Path | None,
+    *,
+    jobs: int = 1,
+    on_copied: Callable[[int], None] | None = None,
+) -> tuple[dict[str, int], CopyStats]:
+    """Copy the files at `indices` (all if `None`) of `inventory` to
+    `destination`, reusing the previous dump.
+
+    Files whose size, modification time and hash match the manifest of
+    `previous_dump` are hard linked from the previous dump instead of
+    being copied. If `previous_dump` is `destination` (i.e., the dump
+    was already made today) then unchanged files are left in place.
+
+    If given, `on_copied` is called with the index of each file once
+    it's in the dump, whether it was copied, linked or unchanged.
+
+    Returns:
+        the number of files which were copied, linked and unchanged,
+        and the throughput of the files which were copied.
+    """
+    previous_files = {}
+    if previous_dump is not None:
+        previous_manifest = load_manifest(manifest_filepath(previous_dump))
+        if previous_manifest.get("hash_function") == manifest["hash_function"]:
+            previous_files = previous_manifest["files"]
+
+    counts = {"copied": 0, "linked": 0, "unchanged": 0}
+    to_copy = []
+    ensure_dir(destination)
+    if indices is None:
+        indices = range(len(inventory))
+    for i in indices:
+        relative_filepath = get_relative_filepath(
+            inventory.filepath(i), destination.name
+        )
+        key = relative_filepath.as_posix()
+        dst = destination / relative_filepath
+
+        if previous_files.get(key) != manifest["files"][key]:
+            to_copy.append(i)
+            continue
+
+        previous_filepath = previous_dump / relative_filepath
+        if previous_filepath == dst and dst.exists():
+            counts["unchanged"] += 1
+        elif previous_filepath.exists():
+            ensure_dir(dst.parent)
+            link_or_copy(previous_filepath, dst)
+            counts["linked"] += 1
+        else:
+            to_copy.append(i)
+            continue
+        if on_copied is not None:
+            on_copied(i)
+
+    stats = copy_files(destination, inventory, to_copy, jobs=jobs, on_copied=on_copied)
+    counts["copied"] = stats.files
+    return counts, stats
@@ -0,0 +1,205 @@
+import io
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, ContextManager, Iterator
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# counters from `/proc/self/io` (Linux only), covering every thread in the process
+PROC_IO_COUNTERS = ["rchar", "wchar", "syscr", "syscw", "read_bytes", "write_bytes"]
+# counters from `getrusage`
+RUSAGE_COUNTERS = {
+    "ru_minflt": "minor_page_faults",
+    "ru_majflt": "major_page_faults",
+    "ru_inblock": "block_input_operations",
+    "ru_oublock": "block_output_operations",
+    "ru_nvcsw": "voluntary_context_switches",
+    "ru_nivcsw": "involuntary_context_switches",
+}
+
+
+def read_process_counters() -> dict[str, float]:
+    """Return a snapshot of the time, I/O and scheduler counters of this process"""
+    times = os.times()
+    counters = {
+        "wall_seconds": time.perf_counter(),
+        "cpu_seconds": time.process_time(),
+        # only includes child processes which have exited, e.g., a process pool
+        "children_cpu_seconds": times.children_user + times.children_system,
+    }
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                name, value = line.split(":")
+                if name in PROC_IO_COUNTERS:
+                    counters[name] = int(value)
+    except OSError:
+        pass
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        for field, name in RUSAGE_COUNTERS.items():
+            counters[name] = getattr(usage, field)
+    return counters
+
+
+class Stage:
+    """Counters added to a stage while it runs, e.g., the number of files"""
+
+    def __init__(self):
+        self.counters: dict[str, int] = defaultdict(int)
+
+    def add(self, **counters: int) -> None:
+        for name, value in counters.items():
+            self.counters[name] += value
+
+
+class Profiler:
+    """Record the wall & CPU time, I/O and counters of each stage of a run.
+
+    Stages can be nested, and a nested stage is recorded as
+    `outer/inner`. When the profiler isn't enabled, stages cost next
+    to nothing. With `cprofile=True`, every function call is also
+    profiled with `cProfile`.
+
+    The I/O counters come from `/proc/self/io`, so they're only
+    recorded on Linux: `rchar`/`wchar` are the bytes passed to read &
+    write syscalls (including cached reads), `syscr`/`syscw` are the
+    number of those syscalls, and `read_bytes`/`write_bytes` are the
+    bytes which actually went to storage.
+    """
+
+    def __init__(
+        self,
+        name: str = "invoicetool",
+        *,
+        enabled: bool = False,
+        cprofile: bool = False,
+    ):
+        self.name = name
+        self.enabled = enabled or cprofile
+        self.stages: dict[str, dict[str, Any]] = {}
+        self._stack: list[str] = []
+        self._start: dict[str, float] = {}
+        self._cprofile = None
+        if cprofile:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+        self._output_directory: Path | None = None
+        self._logger: logging.Logger | None = None
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        self._start = read_process_counters()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        """Record the time, I/O and counters of the code in the `with` block"""
+        stage = Stage()
+        if not self.enabled:
+            yield stage
+            return
+
+        self._stack.append(name)
+        key = "/".join(self._stack)
+        start = read_process_counters()
+        try:
+            yield stage
+        finally:
+            end = read_process_counters()
+            self._stack.pop()
+            record = self.stages.setdefault(key, defaultdict(int))
+            for counter, value in end.items():
+                record[counter] += value - start[counter]
+            for counter, value in stage.counters.items():
+                record[counter] += value
+
+    def report_to(self, output_directory: Path, logger: logging.Logger) -> None:
+        """Write the profile of this run to `output_directory` and log it when the run ends"""
+        self._output_directory = output_directory
+        self._logger = logger
+
+    def summary(self) -> dict[str, Any]:
+        """Return the profile of the whole run and each stage"""
+        end = read_process_counters()
+        return {
+            "command": self.name,
+            "total": {
+                counter: value - self._start.get(counter, 0)
+                for counter, value in end.items()
+            },
+            "stages": self.stages,
+        }
+
+    def stop(self) -> None:
+        """Stop profiling, and log and write the profile if `report_to` was called"""
+        if not self.enabled:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._output_directory is None:
+            return
+
+        summary = self.summary()
+        for name, record in [("total", summary["total"]), *self.stages.items()]:
+            self._logger.info(f"→ profile: {name}: {format_record(record)}")
+
+        filepath = self._output_directory / f"{self.name}.profile.json"
+        filepath.write_text(json.dumps(summary, indent=2))
+        self._logger.info(f"→ wrote profile to {filepath}")
+
+        if self._cprofile is not None:
+            import pstats
+
+            pstats_filepath = filepath.with_suffix(".pstats")
+            self._cprofile.dump_stats(pstats_filepath)
+            stream = io.StringIO()
+            pstats.Stats(self._cprofile, stream=stream).sort_stats(
+                "cumulative"
+            ).print_stats(20)
+            self._logger.debug(stream.getvalue())
+            self._logger.info(f"→ wrote cProfile stats to {pstats_filepath}")
+
+
+# the profiler of the current run, which `stage` records into
+_profiler = Profiler()
+
+
+def activate(profiler: Profiler) -> None:
+    """Record the stages of this run with `profiler`"""
+    global _profiler
+    _profiler = profiler
+
+
+def stage(name: str) -> ContextManager[Stage]:
+    """Record a stage with the profiler of the current run (see `Profiler.stage`)"""
+    return _profiler.stage(name)
+
+
+def format_record(record: dict[str, Any]) -> str:
+    """Format the main counters of a stage on a single line"""
+    parts = [
+        f"{record['wall_seconds']:.2f}s wall",
+        f"{record['cpu_seconds'] + record['children_cpu_seconds']:.2f}s CPU",
+    ]
+    if "rchar" in record:
+        parts.append(
+            f"{record['rchar'] / 1e6:.1f} MB read ({record['syscr']} syscalls)"
+        )
+        parts.append(
+            f"{record['wchar'] / 1e6:.1f} MB written ({record['syscw']} syscalls)"
+        )
+    if "files" in record:
+        parts.append(f"{record['files']} files")
+    return ", ".join(parts)
@@ -0,0 +1,137 @@
+import logging
+import sys
+import time
+from datetime import timedelta
+from typing import ClassVar, TextIO
+
+
+class Progress:
+    """Report the progress of a run: files/s, MB/s and an ETA.
+
+    A run goes through phases (e.g., "scan" then "hash"), each started
+    with `begin`, optionally with the total number of files & bytes so
+    that the percentage done and ETA can be shown. The hot loops call
+    `update` as work is done; it only adds to the counters, and the
+    clock is checked every `CHECK_EVERY` updates so that reporting
+    costs next to nothing.
+
+    On a TTY the progress is redrawn on a single line of `stream` a few
+    times per second. Otherwise a line is logged every `LOG_INTERVAL`
+    seconds, and when each phase ends.
+    """
+
+    CHECK_EVERY: ClassVar[int] = 64
+    TTY_INTERVAL: ClassVar[float] = 0.2
+    LOG_INTERVAL: ClassVar[float] = 30.0
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        *,
+        stream: TextIO | None = None,
+        interval: float | None = None,
+    ):
+        self.logger = logger
+        self.stream = sys.stderr if stream is None else stream
+        self.is_tty = self.stream.isatty()
+        if interval is None:
+            interval = self.TTY_INTERVAL if self.is_tty else self.LOG_INTERVAL
+        self.interval = interval
+        self.description: str | None = None
+
+    def begin(
+        self,
+        description: str,
+        *,
+        total_files: int | None = None,
+        total_bytes: int | None = None,
+    ) -> None:
+        """End the current phase, if any, and start a new one"""
+        self.end()
+        self.description = description
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files = 0
+        self.bytes = 0
+        self._pending = 0
+        self._start = self._last_report = time.monotonic()
+
+    def update(self, files: int = 1, bytes: int = 0) -> None:
+        """Record that `files` files and `bytes` bytes were processed"""
+        self.files += files
+        self.bytes += bytes
+        self._pending += 1
+        if self._pending >= self.CHECK_EVERY:
+            self._pending = 0
+            now = time.monotonic()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                self._report(now)
+
+    def end(self) -> None:
+        """Report the final counts of the current phase"""
+        if self.description is None:
+            return
+        line = self.format(final=True)
+        if self.is_tty:
+            self.stream.write(f"\r{line}\x1b[K\n")
+            self.stream.flush()
+        else:
+            self.logger.info(f"→ {line}")
+        self.description = None
+
+    def _report(self, now: float) -> None:
+        if self.is_tty:
+            # `\x1b[K` clears the rest of the line
+            self.stream.write(f"\r{self.format(now)}\x1b[K")
+            self.stream.flush()
+        else:
+            self.logger.info(f"→ {self.format(now)}")
+
+    def format(self, now: float | None = None, *, final: bool = False) -> str:
+        """Format the progress of the current phase on a single line
+
+        The final line of a phase shows the elapsed time instead of the ETA.
+        """
+        elapsed = (time.monotonic() if now is None else now) - self._start
+        files_per_second = self.files / elapsed if elapsed else 0.0
+        megabytes_per_second = self.bytes / 1e6 / elapsed if elapsed else 0.0
+
+        files = f"{self.files}"
+        if self.total_files:
+            files += f"/{self.total_files} files ({self.files / self.total_files:.0%})"
+        else:
+            files += " files"
+        parts = [f"{self.description}: {files}"]
+        if self.bytes or self.total_bytes:
+            megabytes = f"{self.bytes / 1e6:.1f}"
+            if self.total_bytes:
+                megabytes += f"/{self.total_bytes / 1e6:.1f}"
+            parts.append(f"{megabytes} MB")
+        parts.append(f"{files_per_second:.1f} files/s")
+        if self.bytes:
+            parts.append(f"{megabytes_per_second:.1f} MB/s")
+
+        if final:
+            parts.append(f"in {elapsed:.2f}s")
+            return ", ".join(parts)
+
+        # estimate from bytes if we know them, as file sizes vary a lot
+        if self.total_bytes and self.bytes:
+            remaining = elapsed * (self.total_bytes - self.bytes) / self.bytes
+        elif self.total_files and self.files:
+            remaining = elapsed * (self.total_files - self.files) / self.files
+        else:
+            remaining = None
+        if remaining is not None:
+            parts.append(f"ETA {timedelta(seconds=round(max(remaining, 0)))}")
+        return ", ".join(parts)
+
+    def close(self) -> None:
+        self.end()
+
+    def __enter__(self) -> "Progress":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
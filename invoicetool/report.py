@@ -0,0 +1,295 @@
+import csv
+import html
+import json
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from invoicetool.inventory import FileInventory, require_numpy
+
+
+@dataclass
+class DuplicateGroup:
+    """Files with the same contents. The oldest copy is kept, and is first in `paths`"""
+
+    hash: str
+    size: int
+    copies: int
+    reclaimable_bytes: int
+    oldest_mtime_ns: int
+    newest_mtime_ns: int
+    paths: list[str]
+
+
+@dataclass
+class DirectoryWaste:
+    """The redundant copies in a directory, i.e., the copies which aren't kept"""
+
+    directory: str
+    redundant_files: int
+    reclaimable_bytes: int
+
+
+@dataclass
+class DuplicateReport:
+    hash_function: str
+    groups: int
+    duplicate_files: int
+    redundant_files: int
+    reclaimable_bytes: int
+    top_groups: list[DuplicateGroup]
+    top_directories: list[DirectoryWaste]
+
+
+def inventory_from_duplicates(
+    duplicates: dict[str, list[str]], hash_function: str
+) -> FileInventory:
+    """Return a hashed inventory of the files in `duplicates`, e.g., from
+    `duplicates.json`. Files which no longer exist are left out."""
+    inventory = FileInventory()
+    digests = []
+    for digest, paths in duplicates.items():
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            inventory.add(path, stat)
+            digests.append(digest)
+    inventory.set_digests(hash_function, digests)
+    return inventory
+
+
+def duplicate_report(
+    inventory: FileInventory, *, top: int | None = None
+) -> DuplicateReport:
+    """Rank the groups of duplicates in a hashed `inventory`, and the
+    directories they're in, by the space which would be reclaimed by
+    removing every copy but the oldest of each group.
+
+    The statistics are computed over NumPy views of the inventory's
+    columns, so Python objects are only created for the `top` groups
+    and directories (all of them if `None`).
+    """
+    np = require_numpy("duplicate reports")
+    if inventory.hash_function is None:
+        raise ValueError("The files haven't been hashed")
+    n = len(inventory)
+    if n == 0:
+        return DuplicateReport(inventory.hash_function, 0, 0, 0, 0, [], [])
+
+    # compare the digests as big-endian 64-bit words, which sort in the same
+    # order as the bytes and are much faster to sort than rows of bytes
+    digest_size = inventory.digest_size
+    words = np.zeros((n, -(-digest_size // 8) * 8), dtype=np.uint8)
+    words[:, :digest_size] = np.frombuffer(inventory.digests, dtype=np.uint8).reshape(
+        n, digest_size
+    )
+    words = words.view(">u8")
+    sizes = np.frombuffer(inventory.sizes, dtype=np.int64)
+    mtimes = np.frombuffer(inventory.mtimes_ns, dtype=np.int64)
+    directory_ids = np.frombuffer(inventory.directory_ids, dtype=np.uint32)
+
+    # sort by group, then oldest first, so the first file of each group is kept
+    order = np.lexsort((np.arange(n), mtimes, *words.T[::-1]))
+    sorted_words = words[order]
+    starts = np.flatnonzero(
+        np.r_[True, (sorted_words[1:] != sorted_words[:-1]).any(axis=1)]
+    )
+    copies = np.diff(np.r_[starts, n])
+    is_duplicate = np.repeat(copies >= 2, copies)
+    is_kept = np.zeros(n, dtype=bool)
+    is_kept[starts] = True
+    redundant = order[is_duplicate & ~is_kept]
+
+    # a file whose copies no longer exist isn't a duplicate
+    keep = copies >= 2
+    starts, copies = starts[keep], copies[keep]
+    group_sizes = sizes[order[starts]]
+    reclaimable = group_sizes * (copies - 1)
+    oldest = mtimes[order[starts]]
+    newest = mtimes[order[starts + copies - 1]]
+
+    directory_files = np.bincount(
+        directory_ids[redundant], minlength=len(inventory.directories)
+    )
+    directory_bytes = np.bincount(
+        directory_ids[redundant],
+        weights=sizes[redundant],
+        minlength=len(inventory.directories),
+    ).astype(np.int64)
+
+    # most reclaimable space first, then most copies; ties keep the digest order
+    group_ranking = np.lexsort((-copies, -reclaimable))[:top]
+    directory_ranking = np.lexsort((-directory_files, -directory_bytes))
+    directory_ranking = directory_ranking[directory_files[directory_ranking] > 0][:top]
+
+    top_groups = [
+        DuplicateGroup(
+            hash=inventory.hexdigest(order[start]),
+            size=size,
+            copies=count,
+            reclaimable_bytes=reclaimable_bytes,
+            oldest_mtime_ns=oldest_mtime_ns,
+            newest_mtime_ns=newest_mtime_ns,
+            paths=[inventory.path(i) for i in order[start : start + count].tolist()],
+        )
+        for start, size, count, reclaimable_bytes, oldest_mtime_ns, newest_mtime_ns in zip(
+            starts[group_ranking].tolist(),
+            group_sizes[group_ranking].tolist(),
+            copies[group_ranking].tolist(),
+            reclaimable[group_ranking].tolist(),
+            oldest[group_ranking].tolist(),
+            newest[group_ranking].tolist(),
+        )
+    ]
+    top_directories = [
+        DirectoryWaste(inventory.directories[i], redundant_files, reclaimable_bytes)
+        for i, redundant_files, reclaimable_bytes in zip(
+            directory_ranking.tolist(),
+            directory_files[directory_ranking].tolist(),
+            directory_bytes[directory_ranking].tolist(),
+        )
+    ]
+    return DuplicateReport(
+        hash_function=inventory.hash_function,
+        groups=len(starts),
+        duplicate_files=int(copies.sum()),
+        redundant_files=len(redundant),
+        reclaimable_bytes=int(reclaimable.sum()),
+        top_groups=top_groups,
+        top_directories=top_directories,
+    )
+
+
+def format_bytes(n: int) -> str:
+    """Return `n` bytes in human-readable units, e.g., `1.5 MB`"""
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(n) < 1024 or unit == "TB":
+            return f"{n} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def format_mtime(mtime_ns: int) -> str:
+    return datetime.fromtimestamp(mtime_ns / 1e9).isoformat(sep=" ", timespec="seconds")
+
+
+def write_report_json(report: DuplicateReport, directory: Path) -> list[Path]:
+    filepath = directory / "duplicates_report.json"
+    filepath.write_text(json.dumps(asdict(report), indent=2))
+    return [filepath]
+
+
+def write_report_csv(report: DuplicateReport, directory: Path) -> list[Path]:
+    """Write a row for each file of each group, and a row for each directory"""
+    groups_filepath = directory / "duplicates_report.csv"
+    with open(groups_filepath, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["rank", "hash", "size", "copies", "reclaimable_bytes", "keep", "path"]
+        )
+        for rank, group in enumerate(report.top_groups, start=1):
+            for i, path in enumerate(group.paths):
+                writer.writerow(
+                    [
+                        rank,
+                        group.hash,
+                        group.size,
+                        group.copies,
+                        group.reclaimable_bytes,
+                        i == 0,
+                        path,
+                    ]
+                )
+
+    directories_filepath = directory / "duplicates_report_directories.csv"
+    with open(directories_filepath, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "directory", "redundant_files", "reclaimable_bytes"])
+        for rank, waste in enumerate(report.top_directories, start=1):
+            writer.writerow(
+                [rank, waste.directory, waste.redundant_files, waste.reclaimable_bytes]
+            )
+    return [groups_filepath, directories_filepath]
+
+
+def _html_table(headers: list[str], rows: list[list[str]]) -> str:
+    header = "".join(f"<th>{html.escape(h)}</th>" for h in headers)
+    body = "\n".join(
+        "<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows
+    )
+    return f"<table>\n<tr>{header}</tr>\n{body}\n</table>"
+
+
+def write_report_html(report: DuplicateReport, directory: Path) -> list[Path]:
+    filepath = directory / "duplicates_report.html"
+    group_rows = [
+        [
+            str(rank),
+            format_bytes(group.reclaimable_bytes),
+            str(group.copies),
+            format_bytes(group.size),
+            f"{format_mtime(group.oldest_mtime_ns)} – {format_mtime(group.newest_mtime_ns)}",
+            f"<b>{html.escape(group.paths[0])}</b><br>"
+            + "<br>".join(html.escape(path) for path in group.paths[1:]),
+        ]
+        for rank, group in enumerate(report.top_groups, start=1)
+    ]
+    directory_rows = [
+        [
+            str(rank),
+            format_bytes(waste.reclaimable_bytes),
+            str(waste.redundant_files),
+            html.escape(waste.directory),
+        ]
+        for rank, waste in enumerate(report.top_directories, start=1)
+    ]
+    filepath.write_text(
+        f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Duplicate files</title>
+<style>
+body {{ font-family: sans-serif; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: left; vertical-align: top; }}
+</style>
+</head>
+<body>
+<h1>Duplicate files</h1>
+<p>{report.groups} groups of duplicates ({report.duplicate_files} files, {report.hash_function}).
+Removing every copy but the oldest of each group would remove {report.redundant_files} files
+and reclaim {format_bytes(report.reclaimable_bytes)}.</p>
+<h2>Directories</h2>
+{_html_table(["Rank", "Reclaimable", "Redundant files", "Directory"], directory_rows)}
+<h2>Groups</h2>
+<p>The oldest copy of each group, which is kept, is in bold.</p>
+{_html_table(["Rank", "Reclaimable", "Copies", "Size", "Modified", "Paths"], group_rows)}
+</body>
+</html>
+"""
+    )
+    return [filepath]
+
+
+# write a report to a directory, returning the paths of the files written
+REPORT_WRITERS: dict[str, Callable[[DuplicateReport, Path], list[Path]]] = {
+    "html": write_report_html,
+    "csv": write_report_csv,
+    "json": write_report_json,
+}
+
+
+def write_report(
+    report: DuplicateReport, directory: Path, report_format: str = "html"
+) -> list[Path]:
+    """Write `report` to `directory` as `duplicates_report.{report_format}`
+
+    Returns:
+        the paths of the files written. A CSV report is written to two
+        files, one for the groups and one for the directories.
+    """
+    return REPORT_WRITERS[report_format.lower()](report, directory)
@@ -0,0 +1,161 @@
+import zlib
+from typing import TYPE_CHECKING, Hashable, Iterable, TypeVar
+
+from invoicetool.inventory import require_numpy
+
+if TYPE_CHECKING:
+    import numpy as np
+
+K = TypeVar("K", bound=Hashable)
+
+
+def shingles(paragraphs: Iterable[str], *, k: int = 5) -> set[int]:
+    """Return the hashes of the `k`-word shingles in `paragraphs`
+
+    Text is lowercased and split on whitespace, so differences in case
+    and spacing are ignored.
+    """
+    words = " ".join(paragraphs).lower().split()
+    if len(words) < k:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i : i + k]).encode())
+        for i in range(len(words) - k + 1)
+    }
+
+
+def minhash_signatures(
+    shingle_sets: list[set[int]],
+    *,
+    num_perm: int = 128,
+    seed: int = 0,
+    batch_size: int = 65_536,
+) -> "np.ndarray":
+    """Return the MinHash signature of each (non-empty) shingle set.
+
+    Each of the `num_perm` permutations is a multiply-add-shift hash
+    function `((a * x + b) mod 2**64) >> 32`, which needs no division.
+    The hashes are computed for batches of about `batch_size` shingles
+    at once, and the minimum for each document is found with
+    `np.minimum.reduceat`.
+
+    Returns:
+        a `(len(shingle_sets), num_perm)` array of `uint32`.
+    """
+    np = require_numpy("near-duplicate detection")
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2**64, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**64, size=(num_perm, 1), dtype=np.uint64)
+
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint32)
+    start = 0
+    while start < len(shingle_sets):
+        # group documents so that each batch has about `batch_size` shingles
+        stop, n_shingles = start, 0
+        while stop < len(shingle_sets) and (
+            stop == start or n_shingles + len(shingle_sets[stop]) <= batch_size
+        ):
+            n_shingles += len(shingle_sets[stop])
+            stop += 1
+
+        batch = shingle_sets[start:stop]
+        lengths = np.fromiter(map(len, batch), dtype=np.int64, count=len(batch))
+        x = np.fromiter(
+            (shingle for shingle_set in batch for shingle in shingle_set),
+            dtype=np.uint64,
+            count=int(lengths.sum()),
+        )
+        # (num_perm, n_shingles), so each document's shingles are contiguous
+        hashes = ((a * x + b) >> np.uint64(32)).astype(np.uint32)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        signatures[start:stop] = np.minimum.reduceat(hashes, offsets, axis=1).T
+        start = stop
+
+    return signatures
+
+
+def choose_bands(num_perm: int, threshold: float) -> int:
+    """Return the number of LSH bands for a similarity `threshold`
+
+    With `b` bands of `r` rows, pairs with a similarity above roughly
+    `(1 / b) ** (1 / r)` become candidates. The band count is chosen so
+    this is as close as possible to, but below, `threshold`, so few
+    similar pairs are missed.
+    """
+    candidates = [b for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [b for b in candidates if (1 / b) ** (b / num_perm) <= threshold]
+    return min(below) if below else num_perm
+
+
+def find_near_duplicates(
+    documents: dict[K, list[str]],
+    *,
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    k: int = 5,
+) -> list[list[K]]:
+    """Return clusters of documents whose text is at least `threshold` similar.
+
+    Similarity is the Jaccard similarity of the `k`-word shingles of the
+    documents, estimated with MinHash. Candidate pairs are found with
+    locality-sensitive hashing (LSH): documents whose signatures agree
+    on every row of any band share a bucket. Each document in a bucket
+    is compared with the first document in it, and is clustered with it
+    if the estimated similarity is at least `threshold`. This avoids
+    comparing every pair of documents.
+
+    Returns:
+        clusters of document keys, largest first. Documents without any
+        text, and documents without a near duplicate, are not included.
+    """
+    np = require_numpy("near-duplicate detection")
+    keys = []
+    shingle_sets = []
+    for key, paragraphs in documents.items():
+        if shingle_set := shingles(paragraphs, k=k):
+            keys.append(key)
+            shingle_sets.append(shingle_set)
+    if not keys:
+        return []
+
+    signatures = minhash_signatures(shingle_sets, num_perm=num_perm)
+    bands = choose_bands(num_perm, threshold)
+    rows = num_perm // bands
+
+    # union-find over document indices
+    parent = list(range(len(keys)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        band_signatures = np.ascontiguousarray(
+            signatures[:, band * rows : (band + 1) * rows]
+        )
+        # view each row of the band as a single value so rows can be bucketed
+        buckets = band_signatures.view(
+            np.dtype((np.void, band_signatures.dtype.itemsize * rows))
+        ).ravel()
+        _, bucket_ids = np.unique(buckets, return_inverse=True)
+        bucket_ids = bucket_ids.ravel()
+        # only buckets with more than one document hold candidates
+        shared = np.flatnonzero(np.bincount(bucket_ids)[bucket_ids] > 1)
+        order = shared[np.argsort(bucket_ids[shared], kind="stable")]
+        boundaries = np.flatnonzero(np.diff(bucket_ids[order])) + 1
+        for members in np.split(order, boundaries) if len(order) else []:
+            first = members[0]
+            similarity = (signatures[members[1:]] == signatures[first]).mean(axis=1)
+            for other in members[1:][similarity >= threshold]:
+                parent[find(int(other))] = find(int(first))
+
+    clusters: dict[int, list[K]] = {}
+    for i, key in enumerate(keys):
+        clusters.setdefault(find(i), []).append(key)
+    return sorted(
+        (cluster for cluster in clusters.values() if len(cluster) > 1),
+        key=len,
+        reverse=True,
+    )
@@ -0,0 +1,468 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+from functools import partial
+from pathlib import Path
+from typing import ClassVar, Iterable, Iterator, Protocol
+
+from invoicetool.cache import HashCache
+from invoicetool.hashes import calculate_hash, parallel_map
+from invoicetool.inventory import FileInventory
+from invoicetool.iotools import (
+    build_output_directory,
+    copy_files,
+    ensure_dir,
+    filter_filepaths_of_interest,
+    scan_files,
+)
+from invoicetool.journal import Journal, journal_filepath
+
+# inotify flags & event masks (see sys/inotify.h)
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+# a file is reported once it has been written & closed, or moved into the tree;
+# created directories are watched, and the files already in them are reported
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# the fixed-size header of a `struct inotify_event`: wd, mask, cookie & len
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class Watcher(Protocol):
+    def read(self, timeout: float | None) -> list[str]:
+        """Wait up to `timeout` seconds (forever if `None`) and return the
+        paths of any files which were created or changed"""
+        ...
+
+    def close(self) -> None: ...
+
+
+def _load_libc() -> ctypes.CDLL | None:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        # not Linux, or a libc without inotify
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+_libc = _load_libc()
+
+
+def inotify_available() -> bool:
+    return _libc is not None
+
+
+class InotifyWatcher:
+    """Watch a directory tree for new or changed files with inotify.
+
+    A watch is added for every directory in the tree, and for new
+    directories as they're created. Reads block in `select`, so an
+    idle watcher uses no CPU at all.
+
+    If the limit on the number of watches is reached, the watcher can't
+    be created; if it's reached later, when a new directory is created,
+    the watcher falls back to polling every `poll_interval` seconds.
+    """
+
+    READ_SIZE: ClassVar[int] = 64 * 1024
+
+    def __init__(
+        self,
+        directory: Path,
+        extensions: set[str] | None = None,
+        *,
+        poll_interval: float = 5.0,
+        logger: logging.Logger | None = None,
+    ):
+        if _libc is None:
+            raise OSError("inotify isn't available")
+        self.directory = directory
+        self.extensions = extensions
+        self.poll_interval = poll_interval
+        self.logger = logger
+        self.fd = _libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._directories: dict[int, str] = {}
+        self._fallback: PollingWatcher | None = None
+        try:
+            self._add_watches(directory.as_posix())
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_watch(self, directory: str) -> None:
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(
+                    error,
+                    "The inotify watch limit was reached (see fs.inotify.max_user_watches)",
+                )
+            # the directory may have been removed since it was found
+            if error != errno.ENOENT and self.logger is not None:
+                self.logger.warning(f"⚠️  Can't watch {directory}: {os.strerror(error)}")
+            return
+        self._directories[wd] = directory
+
+    def _add_watches(self, directory: str) -> None:
+        """Watch `directory` and every directory below it"""
+        stack = [directory]
+        while stack:
+            directory = stack.pop()
+            self._add_watch(directory)
+            try:
+                with os.scandir(directory) as it:
+                    stack.extend(entry.path for entry in it if entry.is_dir())
+            except OSError:
+                continue
+
+    def _fall_back_to_polling(self, error: OSError) -> list[str]:
+        """Poll the tree from now on, and report every file in it, as
+        changes in the directories which weren't watched were missed"""
+        if self.logger is not None:
+            self.logger.warning(
+                f"⚠️  {error.strerror or error}, falling back to polling"
+            )
+        os.close(self.fd)
+        self._fallback = PollingWatcher(
+            self.directory, self.extensions, interval=self.poll_interval
+        )
+        return [
+            entry.path
+            for entry in scan_files(self.directory, self.extensions, skip_missing=True)
+        ]
+
+    def read(self, timeout: float | None) -> list[str]:
+        if self._fallback is not None:
+            return self._fallback.read(timeout)
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, self.READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped, so report every file in the tree
+                paths.extend(
+                    entry.path
+                    for entry in scan_files(self.directory, skip_missing=True)
+                )
+            elif mask & IN_IGNORED:
+                self._directories.pop(wd, None)
+            elif wd in self._directories:
+                path = os.path.join(self._directories[wd], name)
+                if mask & IN_ISDIR:
+                    # files may have been added before the directory was watched
+                    try:
+                        self._add_watches(path)
+                    except OSError as e:
+                        return self._fall_back_to_polling(e)
+                    paths.extend(
+                        entry.path for entry in scan_files(path, skip_missing=True)
+                    )
+                elif not mask & IN_CREATE:
+                    # a created file is reported once it's written & closed
+                    paths.append(path)
+        return paths
+
+    def close(self) -> None:
+        if self._fallback is None:
+            os.close(self.fd)
+
+
+class PollingWatcher:
+    """Watch a directory tree for new or changed files by rescanning it
+    every `interval` seconds.
+
+    A file is reported if it's new or its size or modification time
+    has changed since the previous scan. Only files which match
+    `extensions` are tracked.
+    """
+
+    def __init__(
+        self, directory: Path, extensions: set[str] | None, *, interval: float = 5.0
+    ):
+        self.directory = directory
+        self.extensions = extensions
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for entry in scan_files(self.directory, self.extensions, skip_missing=True):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def read(self, timeout: float | None) -> list[str]:
+        wait = self._next_scan - time.monotonic()
+        if timeout is not None and timeout < wait:
+            time.sleep(max(timeout, 0))
+            return []
+        time.sleep(max(wait, 0))
+        self._next_scan = time.monotonic() + self.interval
+
+        snapshot = self._scan()
+        changed = [
+            path
+            for path, signature in snapshot.items()
+            if self._snapshot.get(path) != signature
+        ]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def open_watcher(
+    directory: Path,
+    extensions: set[str],
+    *,
+    poll: bool = False,
+    poll_interval: float = 5.0,
+    logger: logging.Logger | None = None,
+) -> Watcher:
+    """Return an inotify watcher for `directory`, or a polling watcher
+    if `poll=True` or inotify isn't available (e.g., the watch limit
+    was reached)"""
+    if not poll and inotify_available():
+        try:
+            return InotifyWatcher(
+                directory, extensions, poll_interval=poll_interval, logger=logger
+            )
+        except OSError as e:
+            if logger is not None:
+                logger.warning(f"⚠️  {e.strerror or e}, falling back to polling")
+    return PollingWatcher(directory, extensions, interval=poll_interval)
+
+
+def iter_batches(
+    watcher: Watcher, *, debounce: float = 2.0, max_delay: float = 30.0
+) -> Iterator[list[Path]]:
+    """Yield batches of the files reported by `watcher`.
+
+    Events are coalesced: a batch is yielded once no new events have
+    arrived for `debounce` seconds, or `max_delay` seconds after its
+    first event if events keep arriving. A file which changes several
+    times within a batch is only included once.
+    """
+    pending: dict[str, None] = {}
+    first_event = last_event = 0.0
+    while True:
+        if pending:
+            deadline = min(last_event + debounce, first_event + max_delay)
+            timeout = max(deadline - time.monotonic(), 0)
+        else:
+            timeout = None
+        paths = watcher.read(timeout)
+
+        now = time.monotonic()
+        if paths:
+            if not pending:
+                first_event = now
+            last_event = now
+            pending.update(dict.fromkeys(paths))
+        if pending and (now - last_event >= debounce or now - first_event >= max_delay):
+            yield [Path(path) for path in pending]
+            pending = {}
+
+
+def _try_calculate_hash(filepath: Path, hash_function: str) -> str | OSError:
+    """Return the hash of `filepath`, or the error if it can't be read"""
+    try:
+        return calculate_hash(filepath, hash_function)
+    except OSError as e:
+        return e
+
+
+class Ingester:
+    """Hash & copy new or changed documents into the day's output directory.
+
+    Hashes are appended to `hashes.jsonl`, in the same format as
+    `invoicetool hashes --format jsonl`, and documents are copied to
+    the same place as `invoicetool dump-documents`, with the same
+    journal. Documents which are already in the journals, and haven't
+    changed since, are skipped.
+
+    Documents which can't be read, e.g., because they were deleted
+    after they were reported, are skipped and logged to `logger`.
+    """
+
+    def __init__(
+        self,
+        start_dir: Path,
+        base_output_directory: Path,
+        extensions: set[str],
+        hash_function: str,
+        *,
+        cache: HashCache | None = None,
+        jobs: int = 1,
+        copy: bool = True,
+        logger: logging.Logger | None = None,
+    ):
+        self.start_dir = start_dir
+        self.base_output_directory = base_output_directory
+        self.extensions = extensions
+        self.hash_function = hash_function
+        self.cache = cache
+        self.jobs = jobs
+        self.copy = copy
+        self.logger = logger
+        self.output_directory: Path | None = None
+        self._hash_journal: Journal | None = None
+        self._copy_journal: Journal | None = None
+
+    def _open_journals(self) -> None:
+        """Open the journals of today's output directory, e.g., after midnight"""
+        output_directory = build_output_directory(
+            self.base_output_directory, self.start_dir
+        )
+        if output_directory == self.output_directory:
+            return
+        self.close()
+        self.output_directory = output_directory
+        ensure_dir(output_directory.parent)
+        self._hash_journal = Journal(
+            output_directory.parent / "hashes.jsonl",
+            resume=True,
+            context={"hash_function": self.hash_function.lower()},
+        )
+        if self.copy:
+            self._copy_journal = Journal(
+                journal_filepath(output_directory), resume=True
+            )
+
+    def _skip(self, filepath: Path, error: OSError) -> None:
+        if self.logger is not None:
+            self.logger.warning(f"⚠️  Skipping {filepath}: {error}")
+
+    def _hash(self, inventory: FileInventory, indices: list[int]) -> dict[int, str]:
+        """Return the hash of each file at `indices` which can be read,
+        using the cache where possible"""
+        hashes: dict[int, str | None] = {}
+        for i in indices:
+            hashes[i] = (
+                self.cache.get(inventory.path(i), inventory.stat(i), self.hash_function)
+                if self.cache is not None
+                else None
+            )
+        misses = [i for i, digest in hashes.items() if digest is None]
+        new_hashes = parallel_map(
+            partial(_try_calculate_hash, hash_function=self.hash_function),
+            [inventory.filepath(i) for i in misses],
+            jobs=self.jobs,
+        )
+        for i, digest in zip(misses, new_hashes):
+            if isinstance(digest, OSError):
+                self._skip(inventory.filepath(i), digest)
+                del hashes[i]
+                continue
+            hashes[i] = digest
+            if self.cache is not None:
+                self.cache.put(
+                    inventory.path(i), inventory.stat(i), self.hash_function, digest
+                )
+        if self.cache is not None:
+            self.cache.flush()
+        return hashes
+
+    def ingest(self, filepaths: Iterable[Path]) -> dict[str, int]:
+        """Hash & copy the documents in `filepaths` which are new or have changed
+
+        Returns:
+            the number of documents hashed and copied.
+        """
+        self._open_journals()
+        inventory = FileInventory()
+        for filepath in filter_filepaths_of_interest(
+            filepaths, self.extensions, on_error=self._skip
+        ):
+            try:
+                inventory.add(filepath.as_posix(), filepath.stat())
+            except OSError as e:
+                self._skip(filepath, e)
+
+        to_hash = [
+            i
+            for i in range(len(inventory))
+            if not self._hash_journal.is_done(inventory.path(i), inventory.stat(i))
+        ]
+        hashed = 0
+        for i, file_hash in self._hash(inventory, to_hash).items():
+            self._hash_journal.record(
+                inventory.path(i), inventory.stat(i), hash=file_hash
+            )
+            hashed += 1
+        self._hash_journal.flush()
+
+        copied = 0
+        if self.copy:
+            to_copy = [
+                i
+                for i in range(len(inventory))
+                if not self._copy_journal.is_done(inventory.path(i), inventory.stat(i))
+            ]
+
+            def on_copied(i: int) -> None:
+                self._copy_journal.record(
+                    inventory.path(i), inventory.stat(i), status="copied"
+                )
+
+            def on_error(i: int, error: OSError) -> None:
+                self._skip(inventory.filepath(i), error)
+
+            copy_stats = copy_files(
+                self.output_directory,
+                inventory,
+                to_copy,
+                jobs=self.jobs,
+                on_copied=on_copied,
+                on_error=on_error,
+            )
+            copied = copy_stats.files
+            self._copy_journal.flush()
+        return {"hashed": hashed, "copied": copied}
+
+    def close(self) -> None:
+        for journal in (self._hash_journal, self._copy_journal):
+            if journal is not None:
+                journal.close()
+        self._hash_journal = self._copy_journal = None
+
+    def __enter__(self) -> "Ingester":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
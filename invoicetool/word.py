@@ -1,18 +1,76 @@
 from __future__ import annotations
 
 import subprocess
+import zipfile
 from pathlib import Path
-from typing import Any, Iterable
+from typing import IO, Any, Iterable, Iterator
+from xml.etree import ElementTree
 
 from docx import Document
 
 DocxDocument = Any  # mypy doesn't like the docx.Document type
 
+# command used to convert `.doc` files to text
+ANTIWORD_COMMAND = "antiword"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_BODY_PARAGRAPH = (f"{_W}document", f"{_W}body", f"{_W}p")
+# ancestors of run content within a body paragraph, relative to the paragraph
+_RUN_PARENTS = ((f"{_W}r",), (f"{_W}hyperlink", f"{_W}r"))
+# text equivalents of run content elements, as used by python-docx
+_RUN_CONTENT_TEXT = {
+    f"{_W}cr": "\n",
+    f"{_W}noBreakHyphen": "-",
+    f"{_W}ptab": "\t",
+    f"{_W}tab": "\t",
+}
+
 
 def get_paragraphs(doc: DocxDocument) -> Iterable[str]:
     """get all paragraphs from a document"""
-    for paragraph in doc.paragraphs:
-        p = paragraph.text.strip()
+    return clean_paragraphs(paragraph.text for paragraph in doc.paragraphs)
+
+
+def iter_docx_paragraphs(filepath: Path | IO[bytes]) -> Iterator[str]:
+    """Stream the raw text of each paragraph in the body of a `.docx` file.
+
+    `word/document.xml` is parsed incrementally straight out of the zip
+    file, without building a python-docx object graph. The text of each
+    paragraph is the same as `docx.text.paragraph.Paragraph.text`.
+    """
+    with zipfile.ZipFile(filepath) as zf, zf.open("word/document.xml") as f:
+        ancestors: list[str] = []
+        parts: list[str] = []
+        for event, element in ElementTree.iterparse(f, events=("start", "end")):
+            if event == "start":
+                ancestors.append(element.tag)
+                continue
+            ancestors.pop()
+
+            if len(ancestors) == 2:
+                # a direct child of the body (e.g., a paragraph or table) has ended
+                if element.tag == _BODY_PARAGRAPH[2]:
+                    yield "".join(parts)
+                    parts.clear()
+                element.clear()
+            elif (
+                tuple(ancestors[:3]) == _BODY_PARAGRAPH
+                and tuple(ancestors[3:]) in _RUN_PARENTS
+            ):
+                if element.tag == f"{_W}t":
+                    parts.append(element.text or "")
+                elif element.tag == f"{_W}br":
+                    # only line breaks (not page or column breaks) become newlines
+                    if element.get(f"{_W}type", "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                elif element.tag in _RUN_CONTENT_TEXT:
+                    parts.append(_RUN_CONTENT_TEXT[element.tag])
+
+
+def clean_paragraphs(paragraphs: Iterable[str]) -> Iterator[str]:
+    """strip & squeeze whitespace in paragraphs, dropping any blank paragraphs"""
+    for paragraph in paragraphs:
+        p = paragraph.strip()
 
         # get rid of blank lines
         if not p:
@@ -38,9 +96,9 @@ def extract_text_from_document_as_list(filepath: Path) -> list[str]:
         raise ValueError(f"Unsupported file extension: {filepath.suffix}")
 
 
-def extract_text_from_docx_as_list(filepath: Path) -> list[str]:
+def extract_text_from_docx_as_list(filepath: Path, *, fast: bool = False) -> list[str]:
     """Extract all text from a `.docx` file and return a list of paragraphs"""
-    text = extract_text_from_docx(filepath)
+    text = extract_text_from_docx(filepath, fast=fast)
     return text_to_paragraphs(text)
 
 
@@ -65,8 +123,18 @@ def extract_text_from_document(filepath: Path) -> str:
         raise ValueError(f"Unsupported file extension: {filepath.suffix}")
 
 
-def extract_text_from_docx(filepath: Path) -> str:
-    """Extract all text from a `.docx` file and return the text"""
+def extract_text_from_docx(filepath: Path, *, fast: bool = False) -> str:
+    """Extract all text from a `.docx` file and return the text
+
+    With `fast=True` the paragraphs are streamed with `iter_docx_paragraphs`,
+    falling back to python-docx for documents it can't parse.
+    """
+    if fast:
+        try:
+            return "\n".join(clean_paragraphs(iter_docx_paragraphs(filepath)))
+        except (KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+            pass
+
     doc = Document(filepath)
     text = "\n".join(get_paragraphs(doc))
     return text
@@ -76,7 +144,7 @@ def extract_text_from_doc(filepath: Path) -> str:
     """Extract all text from a `.doc` file and return the text"""
     # process is the completed process
     process = subprocess.run(
-        ["antiword", filepath.as_posix()],
+        [ANTIWORD_COMMAND, filepath.as_posix()],
         capture_output=True,
         text=True,
     )
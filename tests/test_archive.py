@@ -0,0 +1,89 @@
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from invoicetool.archive import (
+    ParallelCompressor,
+    available_archive_formats,
+    write_archive,
+)
+
+
+@pytest.fixture
+def documents(tmp_path: Path) -> list[Path]:
+    start_dir = tmp_path / "books"
+    (start_dir / "another-level").mkdir(parents=True)
+    filepaths = [
+        start_dir / "document01.doc",
+        start_dir / "another-level" / "document02.docx",
+    ]
+    for i, filepath in enumerate(filepaths):
+        filepath.write_bytes(bytes(range(256)) * 1000 * (i + 1))
+    return filepaths
+
+
+@pytest.mark.parametrize("archive_format", available_archive_formats())
+@pytest.mark.parametrize("threads", [1, 4])
+def test_write_archive(
+    tmp_path: Path,
+    documents: list[Path],
+    archive_format: str,
+    threads: int,
+    monkeypatch,
+):
+    # force several independently compressed chunks
+    monkeypatch.setattr(ParallelCompressor, "CHUNK_SIZE", 64 * 1024)
+    destination = tmp_path / "dump" / "books"
+
+    archive_path = write_archive(
+        destination, documents, archive_format=archive_format, threads=threads
+    )
+
+    if archive_format == "zip":
+        with zipfile.ZipFile(archive_path) as zf:
+            contents = {name: zf.read(name) for name in zf.namelist()}
+    else:
+        with tarfile.open(archive_path) as tf:
+            contents = {
+                member.name: tf.extractfile(member).read() for member in tf.getmembers()
+            }
+
+    assert contents == {
+        "books/document01.doc": documents[0].read_bytes(),
+        "books/another-level/document02.docx": documents[1].read_bytes(),
+    }
+    assert not destination.exists()
+
+
+def test_write_archive_invalid_format(tmp_path: Path, documents: list[Path]):
+    with pytest.raises(ValueError):
+        write_archive(tmp_path / "books", documents, archive_format="rar")
+
+
+@pytest.mark.parametrize("archive_format,level", [("gz", 42), ("bz2", 0), ("xz", -1)])
+def test_write_archive_invalid_level(
+    tmp_path: Path, documents: list[Path], archive_format: str, level: int
+):
+    with pytest.raises(ValueError, match="Invalid compression level"):
+        write_archive(
+            tmp_path / "books", documents, archive_format=archive_format, level=level
+        )
+    assert list(tmp_path.glob("books.*")) == []
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_write_archive_removes_partial_archive(
+    tmp_path: Path, documents: list[Path], threads: int
+):
+    destination = tmp_path / "dump" / "books"
+
+    with pytest.raises(FileNotFoundError):
+        write_archive(
+            destination,
+            documents + [documents[0].with_name("missing.doc")],
+            archive_format="gz",
+            threads=threads,
+        )
+    assert list(destination.parent.iterdir()) == []
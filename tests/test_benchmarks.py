@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+from docx import Document
+
+from benchmarks.corpus import Corpus, make_corpus, make_invoices_dir
+from benchmarks.run import over_budget_scenarios, run_benchmarks
+from invoicetool.iotools import get_filepaths_of_interest
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory: pytest.TempPathFactory) -> Corpus:
+    """Extend the `invoices_dir` layout with a small synthetic corpus"""
+    return make_corpus(tmp_path_factory.mktemp("corpus"), 50, max_size=64 * 1024)
+
+
+def _layout(directory: Path) -> dict[str, int]:
+    return {
+        path.relative_to(directory).as_posix(): path.stat().st_size
+        for path in directory.rglob("*")
+    }
+
+
+def test_make_invoices_dir_matches_fixture(invoices_dir: Path, tmp_path: Path):
+    corpus = make_invoices_dir(tmp_path)
+
+    assert _layout(tmp_path) == _layout(invoices_dir)
+    assert {path.name for path in corpus.documents} == {
+        "document01.doc",
+        "document02.docx",
+        "document03.doc",
+    }
+
+
+def test_corpus(corpus: Corpus):
+    filepaths = set(get_filepaths_of_interest(corpus.directory, {".doc", ".docx"}))
+
+    assert filepaths == set(corpus.documents)
+    assert len(corpus.documents) == 53
+    assert corpus.other_files
+    # the generated documents can be opened by python-docx
+    assert Document(corpus.docx_documents[0]).paragraphs
+
+
+def test_corpus_is_reproducible(corpus: Corpus, tmp_path: Path):
+    other = make_corpus(tmp_path, 50, max_size=64 * 1024)
+
+    for path, other_path in zip(corpus.documents, other.documents):
+        assert path.relative_to(corpus.directory) == other_path.relative_to(tmp_path)
+        assert path.read_bytes() == other_path.read_bytes()
+
+
+def test_run_benchmarks(corpus: Corpus):
+    results = run_benchmarks(
+        corpus, repeat=2, scenarios=["scan", "hash", "startup"], log=lambda _: None
+    )
+
+    assert list(results) == ["scan", "hash", "startup"]
+    assert results["startup"]["budget_seconds"]
+    assert over_budget_scenarios(
+        {"startup": {**results["startup"], "budget_seconds": 0}}
+    ) == ["startup"]
+    assert len(results["hash"]["timings"]) == 2
+    assert results["hash"]["files"] == len(corpus.documents)
@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import zlib
+from pathlib import Path
+
+import pytest
+
+import invoicetool.hashes
+from invoicetool.cache import HashCache, TextCache
+from invoicetool.hashes import calculate_hashes
+
+
+@pytest.fixture
+def documents_dir(tmp_path: Path) -> Path:
+    directory = tmp_path / "documents"
+    directory.mkdir()
+    for i in range(5):
+        (directory / f"document{i}.doc").write_text(f"invoice {i}")
+    return directory
+
+
+def test_cache_roundtrip(tmp_path: Path, documents_dir: Path):
+    filepath = documents_dir / "document0.doc"
+    stat = os.stat(filepath)
+
+    with HashCache.in_directory(tmp_path) as cache:
+        assert cache.get(filepath.as_posix(), stat, "sha1") is None
+        cache.put(filepath.as_posix(), stat, "sha1", "abc")
+
+    with HashCache.in_directory(tmp_path) as cache:
+        assert cache.get(filepath.as_posix(), stat, "SHA1") == "abc"
+        assert cache.get(filepath.as_posix(), stat, "md5") is None
+
+
+def test_cached_hashes_skip_unchanged_files(
+    tmp_path: Path, documents_dir: Path, monkeypatch
+):
+    extensions = {".doc"}
+    hashed = []
+    original_calculate_digests = invoicetool.hashes.calculate_digests
+
+    def calculate_digests(filename, hash_functions, **kwargs):
+        hashed.append(Path(filename).name)
+        return original_calculate_digests(filename, hash_functions, **kwargs)
+
+    monkeypatch.setattr(invoicetool.hashes, "calculate_digests", calculate_digests)
+
+    with HashCache.in_directory(tmp_path) as cache:
+        first = calculate_hashes(documents_dir, extensions, "sha1", cache=cache)
+    assert len(hashed) == 5
+
+    # modify a single file; only that file should be rehashed
+    hashed.clear()
+    (documents_dir / "document3.doc").write_text("a different invoice")
+
+    with HashCache.in_directory(tmp_path) as cache:
+        second = calculate_hashes(documents_dir, extensions, "sha1", cache=cache)
+    assert hashed == ["document3.doc"]
+    assert second == calculate_hashes(documents_dir, extensions, "sha1")
+    assert second != first
+
+
+def test_text_cache_roundtrip(tmp_path: Path):
+    paragraphs = ["Invoice no. 123", "Total: €100"]
+    with TextCache.in_directory(tmp_path) as cache:
+        assert cache.get("abc", "sha1") is None
+        cache.put("abc", "sha1", paragraphs)
+
+    with TextCache.in_directory(tmp_path) as cache:
+        assert cache.get("abc", "SHA1") == paragraphs
+        assert cache.get("abc", "md5") is None
+
+
+def test_text_cache_evicts_least_recently_used(tmp_path: Path):
+    paragraphs = [os.urandom(512).hex()]
+    entry_size = len(zlib.compress(json.dumps(paragraphs).encode()))
+    # room for two entries, but not three
+    max_bytes = 2 * entry_size + entry_size // 2
+    with TextCache.in_directory(tmp_path, max_bytes=max_bytes) as cache:
+        cache.put("first", "sha1", paragraphs)
+        cache.put("second", "sha1", paragraphs)
+        assert cache.get("first", "sha1") == paragraphs
+        cache.put("third", "sha1", paragraphs)
+
+        assert cache.get("second", "sha1") is None
+        assert cache.get("first", "sha1") == paragraphs
+        assert cache.get("third", "sha1") == paragraphs
+
+
+def test_text_cache_batches_last_used(tmp_path: Path):
+    with TextCache.in_directory(tmp_path) as cache:
+        cache.put("abc", "sha1", ["Invoice no. 123"])
+    connection = sqlite3.connect(tmp_path / TextCache.FILENAME)
+    query = "SELECT last_used FROM texts WHERE digest = 'abc'"
+    (stored,) = connection.execute(query).fetchone()
+
+    with TextCache.in_directory(tmp_path) as cache:
+        cache.get("abc", "sha1")
+        # hits aren't written one transaction at a time
+        assert connection.execute(query).fetchone() == (stored,)
+    (last_used,) = connection.execute(query).fetchone()
+    connection.close()
+
+    assert last_used > stored
@@ -1,12 +1,26 @@
 from pathlib import Path
 
-from invoicetool.config import Config
+from invoicetool.config import Config, load_config_file
 
 
 def test_default_working_directory(config: Config):
     assert config.base_output_directory == Path.home() / ".invoicetool"
 
 
+def test_config_file_is_parsed_once(tmp_path: Path):
+    config_filepath = tmp_path / "config.toml"
+    config_filepath.write_text(
+        f'[invoicetool]\nhash_function_algorithm = "md5"\nbase_output_directory = "{tmp_path / "output"}"\n'
+    )
+
+    config = Config.from_file(config_filepath)
+
+    assert load_config_file(config_filepath) is load_config_file(config_filepath)
+    assert config.hash_function_algorithm == "md5"
+    # the output directory is only created when something is written to it
+    assert not (tmp_path / "output").exists()
+
+
 # def test_env_var_working_directory(monkeypatch, tmp_path):
 #     monkeypatch.setenv("INVOICETOOL_WORKING_DIR", str(tmp_path))
 #     assert get_working_directory() == tmp_path
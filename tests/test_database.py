@@ -0,0 +1,163 @@
+import io
+import stat
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+import invoicetool.extract
+from invoicetool.cli import cli
+from invoicetool.database import (
+    InvoiceDatabase,
+    build_database,
+    extract_fields,
+    quote_query,
+)
+from invoicetool.fields import FieldExtractor, FieldRule
+
+
+@pytest.fixture
+def documents_dir(tmp_path: Path, docx_bytes: io.BytesIO) -> Path:
+    directory = tmp_path / "books"
+    (directory / "another-level").mkdir(parents=True)
+    (directory / "document01.docx").write_bytes(docx_bytes.getvalue())
+    (directory / "another-level" / "document02.docx").write_bytes(docx_bytes.getvalue())
+    (directory / "spreadsheet01.xls").write_text("not a document")
+    return directory
+
+
+def test_build_database(tmp_path: Path, documents_dir: Path):
+    extensions = {".doc", ".docx"}
+    document01 = (documents_dir / "document01.docx").as_posix()
+    document02 = (documents_dir / "another-level" / "document02.docx").as_posix()
+
+    with InvoiceDatabase.in_directory(tmp_path) as database:
+        counts = build_database(database, documents_dir, extensions, "sha1", jobs=1)
+        assert counts == {"scanned": 2, "removed": 0, "extracted": 1}
+
+        ((digest, paths),) = database.duplicates().items()
+        assert paths == sorted([document01, document02])
+        assert database.files_with_hash(digest) == paths
+        assert database.paragraphs(document02) == [
+            "This is the first paragraph.",
+            "This is the second paragraph.",
+        ]
+
+        # nothing has changed, so nothing is extracted again
+        counts = build_database(database, documents_dir, extensions, "sha1", jobs=1)
+        assert counts == {"scanned": 2, "removed": 0, "extracted": 0}
+
+        (documents_dir / "document01.docx").unlink()
+        counts = build_database(database, documents_dir, extensions, "sha1", jobs=1)
+        assert counts == {"scanned": 1, "removed": 1, "extracted": 0}
+        assert database.duplicates() == {}
+        assert database.paragraphs(document01) == []
+
+
+def test_build_database_retries_failed_extractions(tmp_path: Path, monkeypatch):
+    directory = tmp_path / "books"
+    directory.mkdir()
+    document = directory / "document01.doc"
+    document.write_text("Invoice no. 123")
+    antiword = tmp_path / "antiword"
+    antiword.write_text("#!/bin/sh\nexit 1\n")
+    antiword.chmod(antiword.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(invoicetool.extract, "ANTIWORD_COMMAND", str(antiword))
+
+    with InvoiceDatabase.in_directory(tmp_path) as database:
+        counts = build_database(database, directory, {".doc"}, "sha1", jobs=1)
+        assert counts["extracted"] == 1
+        assert database.paragraphs(document.as_posix()) == []
+
+        # e.g., antiword has been installed since
+        antiword.write_text('#!/bin/sh\ncat "$1"\n')
+        counts = build_database(database, directory, {".doc"}, "sha1", jobs=1)
+        assert counts["extracted"] == 1
+        assert database.paragraphs(document.as_posix()) == ["Invoice no. 123"]
+
+        counts = build_database(database, directory, {".doc"}, "sha1", jobs=1)
+        assert counts["extracted"] == 0
+
+
+def test_extract_fields(tmp_path: Path, documents_dir: Path):
+    document01 = (documents_dir / "document01.docx").as_posix()
+    extractor = FieldExtractor([FieldRule("position", r"the (?P<value>\w+) paragraph")])
+
+    with InvoiceDatabase.in_directory(tmp_path) as database:
+        build_database(database, documents_dir, {".docx"}, "sha1", jobs=1)
+        assert extract_fields(database, extractor) == 1
+        assert database.fields(document01) == {"position": "first"}
+
+        # the fields are only extracted again when the rules change
+        assert extract_fields(database, extractor) == 0
+        extractor = FieldExtractor(
+            [FieldRule("position", r"the (?P<value>\w+) paragraph", type="int")]
+        )
+        assert extract_fields(database, extractor) == 1
+        assert database.fields(document01) == {}
+
+
+def test_db_build_command(tmp_path: Path, documents_dir: Path):
+    output_directory = tmp_path / "output"
+    runner = CliRunner()
+
+    result = runner.invoke(
+        cli, ["db", "build", "-j", "1", "-o", output_directory, str(documents_dir)]
+    )
+
+    assert result.exit_code == 0
+    with InvoiceDatabase.in_directory(output_directory) as database:
+        assert len(database.duplicates()) == 1
+
+
+def test_search(tmp_path: Path, documents_dir: Path):
+    with InvoiceDatabase.in_directory(tmp_path) as database:
+        build_database(database, documents_dir, {".docx"}, "sha1", jobs=1)
+        database.add_documents(
+            [
+                ("abc", ["Invoice for Seán O'Brien", "Total: €100.00"], None),
+                ("def", ["Invoice for Mary Smith"], None),
+            ]
+        )
+        database.upsert_files(
+            [
+                (
+                    "/invoices/obrien.doc",
+                    (documents_dir / "document01.docx").stat(),
+                    "abc",
+                ),
+                (
+                    "/invoices/smith.doc",
+                    (documents_dir / "document01.docx").stat(),
+                    "def",
+                ),
+            ],
+            "sha1",
+        )
+
+        (result,) = database.search(quote_query("sean o'brien"))
+        assert result.paths == ["/invoices/obrien.doc"]
+        assert "[O'Brien]" in result.snippet
+
+        assert len(database.search(quote_query("invoice"))) == 2
+        assert len(database.search(quote_query("paragraph"))) == 1
+        assert database.search(quote_query("€100.00 smith")) == []
+
+
+def test_search_command(tmp_path: Path, documents_dir: Path):
+    output_directory = tmp_path / "output"
+    runner = CliRunner()
+    runner.invoke(
+        cli, ["db", "build", "-j", "1", "-o", output_directory, str(documents_dir)]
+    )
+
+    result = runner.invoke(cli, ["search", "-o", output_directory, "second paragraph"])
+
+    assert result.exit_code == 0
+    assert (documents_dir / "document01.docx").as_posix() in result.output
+    assert "[second] [paragraph]" in result.output
+
+    result = runner.invoke(cli, ["search", "-o", output_directory, "--raw", '"second'])
+
+    assert result.exit_code == 1
+    assert "Invalid search query" in result.output
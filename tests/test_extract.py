@@ -0,0 +1,112 @@
+import io
+import json
+import stat
+from pathlib import Path
+
+import pytest
+
+import invoicetool.extract
+from invoicetool.cache import TextCache
+from invoicetool.extract import write_extracted_text
+
+
+@pytest.fixture
+def documents(tmp_path: Path, docx_bytes: io.BytesIO) -> list[Path]:
+    filepaths = []
+    for i in range(3):
+        filepath = tmp_path / f"document{i}.docx"
+        filepath.write_bytes(docx_bytes.getvalue())
+        filepaths.append(filepath)
+
+    filepath = tmp_path / "older-format.doc"
+    filepath.write_text("  First line.\n\nSecond line.\n")
+    filepaths.append(filepath)
+    return filepaths
+
+
+@pytest.fixture
+def fake_antiword(tmp_path: Path, monkeypatch) -> None:
+    """Replace `antiword` with a script which prints the file contents"""
+    script = tmp_path / "antiword"
+    script.write_text('#!/bin/sh\ncat "$1"\n')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(invoicetool.extract, "ANTIWORD_COMMAND", str(script))
+
+
+def test_write_extracted_text(tmp_path: Path, documents: list[Path], fake_antiword):
+    output_filepath = tmp_path / "text.jsonl"
+
+    counts = write_extracted_text(documents, output_filepath, jobs=2)
+
+    assert counts == {"extracted": 4, "failed": 0}
+    records = {
+        record["path"]: record
+        for record in map(json.loads, output_filepath.read_text().splitlines())
+    }
+    assert records[documents[0].as_posix()]["paragraphs"] == [
+        "This is the first paragraph.",
+        "This is the second paragraph.",
+    ]
+    assert records[documents[3].as_posix()]["paragraphs"] == [
+        "First line.",
+        "Second line.",
+    ]
+
+
+def test_write_extracted_text_records_failures(tmp_path: Path):
+    filepath = tmp_path / "broken.docx"
+    filepath.write_text("not a zip file")
+    output_filepath = tmp_path / "text.jsonl"
+
+    counts = write_extracted_text([filepath], output_filepath, jobs=1)
+
+    assert counts == {"extracted": 0, "failed": 1}
+    (record,) = map(json.loads, output_filepath.read_text().splitlines())
+    assert record["paragraphs"] is None
+    assert record["error"]
+
+
+def test_write_extracted_text_records_antiword_failures(tmp_path: Path, monkeypatch):
+    script = tmp_path / "antiword"
+    script.write_text('#!/bin/sh\necho "not a Word document" >&2\nexit 1\n')
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(invoicetool.extract, "ANTIWORD_COMMAND", str(script))
+    filepath = tmp_path / "corrupt.doc"
+    filepath.write_text("garbage")
+    output_filepath = tmp_path / "text.jsonl"
+
+    counts = write_extracted_text([filepath], output_filepath, jobs=1)
+
+    assert counts == {"extracted": 0, "failed": 1}
+    (record,) = map(json.loads, output_filepath.read_text().splitlines())
+    assert record["paragraphs"] is None
+    assert "not a Word document" in record["error"]
+
+
+def test_write_extracted_text_with_cache(
+    tmp_path: Path, documents: list[Path], fake_antiword, monkeypatch
+):
+    extracted = []
+    original_extract = invoicetool.extract._extract
+
+    async def _extract(filepath, *args):
+        extracted.append(filepath)
+        return await original_extract(filepath, *args)
+
+    monkeypatch.setattr(invoicetool.extract, "_extract", _extract)
+    output_filepath = tmp_path / "text.jsonl"
+
+    with TextCache.in_directory(tmp_path / "cache") as text_cache:
+        counts = write_extracted_text(
+            documents, output_filepath, jobs=2, text_cache=text_cache
+        )
+        # the three .docx files are identical so only one is extracted
+        assert counts == {"extracted": 4, "failed": 0}
+        assert len(extracted) == 2
+
+        extracted.clear()
+        write_extracted_text(documents, output_filepath, jobs=2, text_cache=text_cache)
+        assert extracted == []
+
+    records = [json.loads(line) for line in output_filepath.read_text().splitlines()]
+    assert {record["path"] for record in records} == {p.as_posix() for p in documents}
@@ -0,0 +1,96 @@
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from invoicetool.fields import FieldExtractor, FieldRule, load_field_rules
+
+PARAGRAPHS = [
+    "INVOICE",
+    "Invoice No: 2024-017",
+    "Date: 3 February 2024",
+    "Bill to: Acme Ltd.",
+    "Subtotal: 100.00",
+    "Total due: €1,234.50",
+]
+
+
+def test_extract_fields_from_config():
+    extractor = FieldExtractor.from_file()
+
+    assert extractor.extract(PARAGRAPHS) == {
+        "invoice_number": "2024-017",
+        "invoice_date": date(2024, 2, 3),
+        "customer": "Acme Ltd.",
+        "total": Decimal("1234.50"),
+    }
+
+
+def test_extract_fields_keeps_first_valid_match():
+    extractor = FieldExtractor(
+        [
+            FieldRule("quantity", r"qty\s*(?P<value>\S+)", type="int"),
+            FieldRule("code", r"[A-Z]{3}-\d+", ignore_case=False),
+        ]
+    )
+
+    fields = extractor.extract(["qty ten, abc-1", "qty 1,200 ABC-2", "qty 5 ABC-3"])
+
+    # "ten" isn't an int, and "abc-1" doesn't match case-sensitively
+    assert fields == {"quantity": 1200, "code": "ABC-2"}
+
+
+def test_extractor_fingerprint_changes_with_rules():
+    rule = FieldRule("total", r"total (?P<value>\d+)", type="int")
+    other_rule = FieldRule("total", r"total: (?P<value>\d+)", type="int")
+
+    assert FieldExtractor([rule]).fingerprint == FieldExtractor([rule]).fingerprint
+    assert (
+        FieldExtractor([rule]).fingerprint != FieldExtractor([other_rule]).fingerprint
+    )
+    assert FieldExtractor([]).extract(PARAGRAPHS) == {}
+
+
+@pytest.mark.parametrize(
+    "table",
+    [
+        {"pattern": "(unbalanced"},
+        {"pattern": "x", "type": "float"},
+        # valid on their own, but not within the combined pattern
+        {"pattern": r"ref (\w)\1(?P<value>\d+)"},
+        {"pattern": r"(?x) total \s* (?P<value>\d+)"},
+    ],
+)
+def test_invalid_field_rule(tmp_path: Path, table: dict):
+    with pytest.raises(ValueError, match="field invalid"):
+        FieldRule("invalid", **table)
+
+
+def test_field_rules_which_conflict():
+    # each rule is valid, but a named group can only be defined once
+    rules = [
+        FieldRule("first", r"(?P<letter>\w)(?P=letter)"),
+        FieldRule("second", r"(?P<letter>\d)"),
+    ]
+
+    with pytest.raises(ValueError, match="field second"):
+        FieldExtractor(rules)
+
+
+def test_extract_fields_with_scoped_flags_and_named_backreferences():
+    extractor = FieldExtractor(
+        [
+            FieldRule("total", r"total (?P<value>\d+)", type="int"),
+            FieldRule("ref", r"(?x: ref \s+ (?P<c>\w)(?P=c) (?P<value>\d+) )"),
+        ]
+    )
+
+    assert extractor.extract(["Ref AA42", "Total 7"]) == {"ref": "42", "total": 7}
+
+
+def test_load_field_rules_without_fields(tmp_path: Path):
+    config_filepath = tmp_path / "config.toml"
+    config_filepath.write_text('[invoicetool]\nextensions = [".doc"]\n')
+
+    assert load_field_rules(config_filepath) == []
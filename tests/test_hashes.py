@@ -0,0 +1,163 @@
+import hashlib
+import json
+from pathlib import Path
+
+import pytest
+
+from invoicetool.hashes import (
+    available_hash_functions,
+    calculate_digests,
+    calculate_hash,
+    calculate_hashes,
+    find_duplicate_files,
+    get_duplicate_files,
+    read_hashes_jsonl,
+    write_hashes_jsonl,
+)
+
+
+@pytest.fixture
+def hashes_dir(tmp_path: Path) -> Path:
+    """Create a directory of documents with a few duplicates"""
+    (tmp_path / "nested").mkdir()
+    for i in range(20):
+        content = f"invoice {i % 7}".encode()
+        (tmp_path / f"document{i:02d}.doc").write_bytes(content)
+        (tmp_path / "nested" / f"document{i:02d}.docx").write_bytes(content * 1000)
+    return tmp_path
+
+
+@pytest.mark.parametrize("size", [0, 100, 4096, 4097, 3 * 4096 + 1, 20_000])
+@pytest.mark.parametrize("mmap_threshold", [None, 10_000])
+def test_calculate_hash(tmp_path: Path, size: int, mmap_threshold: int | None):
+    filepath = tmp_path / "document.doc"
+    content = bytes(range(256)) * (size // 256) + bytes(size % 256)
+    filepath.write_bytes(content)
+
+    digest = calculate_hash(
+        filepath, "sha256", block_size=4096, mmap_threshold=mmap_threshold
+    )
+
+    assert digest == hashlib.sha256(content).hexdigest()
+
+
+@pytest.mark.parametrize("mmap_threshold", [None, 1])
+def test_calculate_digests(tmp_path: Path, mmap_threshold: int | None):
+    filepath = tmp_path / "document.doc"
+    content = bytes(range(256)) * 100
+    filepath.write_bytes(content)
+    hash_functions = ["md5", "sha256", "blake2b", "blake2s"]
+
+    digests = calculate_digests(
+        filepath, hash_functions, block_size=4096, mmap_threshold=mmap_threshold
+    )
+
+    assert digests == tuple(
+        hashlib.new(hash_function, content).hexdigest()
+        for hash_function in hash_functions
+    )
+
+
+def test_optional_hash_functions(tmp_path: Path):
+    xxhash = pytest.importorskip("xxhash")
+    filepath = tmp_path / "document.doc"
+    filepath.write_bytes(b"invoice" * 1000)
+
+    assert "xxh3_64" in available_hash_functions()
+    assert (
+        calculate_hash(filepath, "xxh3_64")
+        == xxhash.xxh3_64(b"invoice" * 1000).hexdigest()
+    )
+
+
+def test_calculate_hash_invalid_hash_function(tmp_path: Path):
+    (tmp_path / "document.doc").touch()
+    with pytest.raises(ValueError):
+        calculate_hash(tmp_path / "document.doc", "crc32")
+
+
+@pytest.mark.parametrize("jobs, use_processes", [(4, False), (0, False), (2, True)])
+def test_parallel_hashes_match_serial(hashes_dir: Path, jobs, use_processes):
+    extensions = {".doc", ".docx"}
+    serial = calculate_hashes(hashes_dir, extensions, "sha1")
+    parallel = calculate_hashes(
+        hashes_dir, extensions, "sha1", jobs=jobs, use_processes=use_processes
+    )
+    assert parallel == serial
+    assert get_duplicate_files(parallel) == get_duplicate_files(serial)
+
+
+def test_invalid_jobs(hashes_dir: Path):
+    with pytest.raises(ValueError):
+        calculate_hashes(hashes_dir, {".doc"}, "sha1", jobs=-1)
+
+
+def test_find_duplicate_files_matches_full_hashing(hashes_dir: Path):
+    # large files which only differ in the middle survive the partial hash stage
+    (hashes_dir / "large01.doc").write_bytes(b"a" * 10_000 + b"b" + b"a" * 10_000)
+    (hashes_dir / "large02.doc").write_bytes(b"a" * 10_000 + b"c" + b"a" * 10_000)
+    (hashes_dir / "large03.doc").write_bytes(b"a" * 10_000 + b"b" + b"a" * 10_000)
+
+    extensions = {".doc", ".docx"}
+    expected = get_duplicate_files(calculate_hashes(hashes_dir, extensions, "sha1"))
+    duplicates = find_duplicate_files(hashes_dir, extensions, "sha1", sample_size=1024)
+
+    assert duplicates == expected
+    assert list(duplicates) == list(expected)
+    assert not any("large02.doc" in p for group in duplicates.values() for p in group)
+
+
+def test_write_hashes_jsonl(hashes_dir: Path, tmp_path: Path):
+    extensions = {".doc", ".docx"}
+    filepath = tmp_path / "hashes.jsonl"
+
+    n_records, scanned = write_hashes_jsonl(hashes_dir, extensions, "sha1", filepath)
+
+    assert n_records == 40
+    assert len(scanned) == 40
+    assert read_hashes_jsonl(filepath) == calculate_hashes(
+        hashes_dir, extensions, "sha1"
+    )
+
+
+def test_write_hashes_jsonl_resume(hashes_dir: Path, tmp_path: Path):
+    extensions = {".doc", ".docx"}
+    filepath = tmp_path / "hashes.jsonl"
+    write_hashes_jsonl(hashes_dir, extensions, "sha1", filepath)
+
+    # simulate a run which was interrupted part of the way through a record
+    lines = filepath.read_text().splitlines(keepends=True)
+    filepath.write_text("".join(lines[:15]) + lines[15][:20])
+
+    n_records, scanned = write_hashes_jsonl(
+        hashes_dir, extensions, "sha1", filepath, resume=True
+    )
+
+    assert n_records == 25
+    # the files which were skipped are still part of the scan
+    assert len(scanned) == 40
+    assert read_hashes_jsonl(filepath) == calculate_hashes(
+        hashes_dir, extensions, "sha1"
+    )
+
+
+def test_write_hashes_jsonl_extra_hash_functions(hashes_dir: Path, tmp_path: Path):
+    filepath = tmp_path / "hashes.jsonl"
+
+    write_hashes_jsonl(
+        hashes_dir,
+        {".doc"},
+        "sha1",
+        filepath,
+        extra_hash_functions=["MD5", "blake2b"],
+    )
+
+    records = [json.loads(line) for line in filepath.read_text().splitlines()]
+    assert len(records) == 20
+    for record in records:
+        content = Path(record["path"]).read_bytes()
+        assert record["hash"] == hashlib.sha1(content).hexdigest()
+        assert record["digests"] == {
+            "md5": hashlib.md5(content).hexdigest(),
+            "blake2b": hashlib.blake2b(content).hexdigest(),
+        }
@@ -0,0 +1,99 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from invoicetool import inventory as inventory_module
+from invoicetool.hashes import calculate_hashes, hash_inventory
+from invoicetool.inventory import FileInventory, FileStat
+from invoicetool.iotools import scan_files
+
+
+@pytest.fixture
+def documents_dir(tmp_path: Path) -> Path:
+    """Create a directory of documents with a few duplicates"""
+    for directory in ("a", "b", "b/c"):
+        (tmp_path / directory).mkdir()
+    for i in range(12):
+        directory = ("a", "b", "b/c")[i % 3]
+        (tmp_path / directory / f"document{i:02d}.doc").write_bytes(
+            f"invoice {i % 4}".encode() * (1 + i % 2)
+        )
+    return tmp_path
+
+
+@pytest.fixture(params=["python", "numpy"])
+def grouping(request, monkeypatch: pytest.MonkeyPatch) -> str:
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(inventory_module, "NUMPY_GROUP_THRESHOLD", 0)
+    return request.param
+
+
+def test_inventory_round_trip(documents_dir: Path):
+    entries = sorted(scan_files(documents_dir), key=lambda entry: entry.path)
+
+    inventory = FileInventory.from_entries(entries)
+
+    assert len(inventory) == 12
+    # each directory is only stored once
+    assert len(inventory.directories) == 3
+    assert list(inventory.paths()) == [entry.path for entry in entries]
+    assert list(inventory.filepaths()) == [Path(entry.path) for entry in entries]
+    stat = entries[0].stat()
+    assert inventory.stat(0) == FileStat(stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def test_subset_and_set_digests():
+    inventory = FileInventory()
+    for i in range(4):
+        inventory.add(os.path.join("dir", f"{i}.doc"), FileStat(i, i, i))
+    inventory.set_digests("MD5", ["00" * 16, "11" * 16, "22" * 16, "33" * 16])
+
+    subset = inventory.subset([3, 1])
+
+    assert inventory.hash_function == subset.hash_function == "md5"
+    assert list(subset.paths()) == [
+        os.path.join("dir", "3.doc"),
+        os.path.join("dir", "1.doc"),
+    ]
+    assert list(subset.stats()) == [FileStat(3, 3, 3), FileStat(1, 1, 1)]
+    assert [subset.hexdigest(i) for i in range(2)] == ["33" * 16, "11" * 16]
+    with pytest.raises(ValueError):
+        inventory.set_digests("md5", ["00" * 16, "11" * 20, "22" * 16, "33" * 16])
+
+
+def test_group_by_size(grouping: str):
+    inventory = FileInventory()
+    for i, size in enumerate([5, 3, 5, 7, 3, 5]):
+        inventory.add(f"{i}.doc", FileStat(size, 0, i))
+
+    assert inventory.group_by_size() == {5: [0, 2, 5], 3: [1, 4]}
+    assert list(inventory.group_by_size()) == [5, 3]
+    assert inventory.group_by_size(min_count=1)[7] == [3]
+
+
+def test_group_by_hash(documents_dir: Path, grouping: str):
+    inventory = FileInventory.from_entries(scan_files(documents_dir))
+    with pytest.raises(ValueError):
+        inventory.group_by_hash()
+    hash_inventory(inventory, "md5")
+
+    groups = inventory.group_by_hash()
+
+    expected: dict[str, list[int]] = {}
+    for i in range(len(inventory)):
+        expected.setdefault(inventory.hexdigest(i), []).append(i)
+    assert groups == {
+        digest: indices for digest, indices in expected.items() if len(indices) > 1
+    }
+    assert list(groups) == [
+        digest for digest, indices in expected.items() if len(indices) > 1
+    ]
+
+
+def test_to_hashes(documents_dir: Path):
+    inventory = FileInventory.from_entries(scan_files(documents_dir))
+    hash_inventory(inventory, "sha256")
+
+    assert inventory.to_hashes() == calculate_hashes(documents_dir, [".doc"], "sha256")
@@ -1,3 +1,6 @@
+import json
+import subprocess
+import sys
 import tarfile
 from pathlib import Path
 
@@ -6,11 +9,31 @@ from click.testing import CliRunner
 from invoicetool import __version__
 from invoicetool.cli import cli
 from invoicetool.dates_times import today2ymd
+from invoicetool.iotools import read_jsonl
+from invoicetool.journal import journal_filepath
+
+# modules which are slow to import, and only imported by the commands which need them
+LAZY_MODULES = {"docx", "numpy", "asyncio", "multiprocessing", "importlib.metadata"}
 
 
 def test_version():
     assert __version__ == "0.1.0"
 
+    result = CliRunner().invoke(cli, ["--version"])
+    assert result.exit_code == 0
+    assert result.output.endswith("version 0.1.0\n")
+
+
+def test_cli_import_is_cheap():
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, invoicetool.cli; print(*sys.modules)"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert not LAZY_MODULES & set(result.stdout.split())
+
 
 def test_document_dump(invoices_dir, tmp_path):
     runner = CliRunner()
@@ -56,3 +79,194 @@ def test_document_dump_with_archive(invoices_dir, tmp_path, capsys):
     assert result.exit_code == 0
     assert expected_archive_filepath.exists()
     assert len(dumped_document_filepaths) == 3
+
+
+def test_incremental_document_dump(tmp_path):
+    start_dir = tmp_path / "books"
+    (start_dir / "another-level").mkdir(parents=True)
+    (start_dir / "document01.doc").write_text("first invoice")
+    (start_dir / "another-level" / "document02.docx").write_text("second invoice")
+    output_directory = tmp_path / "dumps"
+    args = ["dump-documents", "--incremental", "-o", output_directory, str(start_dir)]
+
+    runner = CliRunner()
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 0
+    assert (output_directory / today2ymd() / "books.manifest.json").exists()
+
+    # pretend the first dump was made on an earlier day
+    (output_directory / today2ymd()).rename(output_directory / "2000-01-01")
+    previous_dump = output_directory / "2000-01-01" / "books"
+    (start_dir / "document01.doc").write_text("first invoice, amended")
+
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 0
+
+    dump = output_directory / today2ymd() / "books"
+    unchanged = "another-level/document02.docx"
+    assert (dump / unchanged).stat().st_ino == (previous_dump / unchanged).stat().st_ino
+    assert (dump / "document01.doc").read_text() == "first invoice, amended"
+    assert (previous_dump / "document01.doc").read_text() == "first invoice"
+    # linked documents are journaled too, so a resumed dump skips them
+    journaled = {record["path"] for record in read_jsonl(journal_filepath(dump))}
+    assert journaled == {
+        (start_dir / "document01.doc").as_posix(),
+        (start_dir / unchanged).as_posix(),
+    }
+
+
+def test_incremental_document_dump_keeps_previous_dump(tmp_path):
+    start_dir = tmp_path / "books"
+    start_dir.mkdir()
+    (start_dir / "document01.doc").write_text("first invoice")
+    output_directory = tmp_path / "dumps"
+    args = ["dump-documents", "--incremental", "-o", output_directory, str(start_dir)]
+
+    runner = CliRunner()
+    assert runner.invoke(cli, args).exit_code == 0
+    (output_directory / today2ymd()).rename(output_directory / "2000-01-01")
+    previous_dump = output_directory / "2000-01-01" / "books"
+    # today's dump links the unchanged document to the previous dump
+    assert runner.invoke(cli, args).exit_code == 0
+
+    # the document changes, and is dumped again on the same day
+    (start_dir / "document01.doc").write_text("first invoice, amended")
+    assert runner.invoke(cli, args).exit_code == 0
+
+    dump = output_directory / today2ymd() / "books"
+    assert (dump / "document01.doc").read_text() == "first invoice, amended"
+    assert (previous_dump / "document01.doc").read_text() == "first invoice"
+
+
+def test_document_dump_with_archive_format(invoices_dir, tmp_path):
+    runner = CliRunner()
+    destination = tmp_path / today2ymd() / invoices_dir.name
+
+    result = runner.invoke(
+        cli,
+        [
+            "dump-documents",
+            "--archive",
+            "--archive-format",
+            "gz",
+            "--jobs",
+            "2",
+            "--output-directory",
+            tmp_path,
+            str(invoices_dir),
+        ],
+    )
+
+    assert result.exit_code == 0
+    with tarfile.open(f"{destination}.tar.gz", "r:gz") as tf:
+        assert len(tf.getnames()) == 3
+    # the documents are archived without being copied to a staging directory
+    assert not destination.exists()
+
+
+def test_document_dump_with_invalid_compression_level(invoices_dir, tmp_path):
+    runner = CliRunner()
+
+    result = runner.invoke(
+        cli,
+        [
+            "dump-documents",
+            "--archive",
+            "-f",
+            "gz",
+            "-l",
+            "42",
+            "-o",
+            tmp_path,
+            str(invoices_dir),
+        ],
+    )
+
+    assert result.exit_code == 2
+    assert "Invalid compression level for gz: 42" in result.output
+    assert not (tmp_path / today2ymd() / f"{invoices_dir.name}.tar.gz").exists()
+
+
+def test_hashes_jsonl(invoices_dir, tmp_path):
+    runner = CliRunner()
+
+    result = runner.invoke(
+        cli, ["hashes", "--format", "jsonl", "-o", tmp_path, str(invoices_dir)]
+    )
+
+    assert result.exit_code == 0
+    records = (tmp_path / today2ymd() / "hashes.jsonl").read_text().splitlines()
+    assert len(records) == 3
+    # the (empty) documents all have the same hash
+    duplicates = json.loads((tmp_path / today2ymd() / "duplicates.json").read_text())
+    assert [len(paths) for paths in duplicates.values()] == [3]
+
+
+def test_hashes_extra_algorithm(invoices_dir, tmp_path):
+    runner = CliRunner()
+    args = ["hashes", "-a", "blake2b", "-e", "md5", "-o", tmp_path, str(invoices_dir)]
+
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 2
+    assert "--format jsonl" in result.output
+
+    result = runner.invoke(cli, [*args, "--format", "jsonl"])
+    assert result.exit_code == 0
+    lines = (tmp_path / today2ymd() / "hashes.jsonl").read_text().splitlines()
+    record = json.loads(lines[0])
+    assert record["hash_function"] == "blake2b"
+    assert list(record["digests"]) == ["md5"]
+
+
+def test_document_dump_resume(invoices_dir, tmp_path):
+    runner = CliRunner()
+    args = ["dump-documents", "--output-directory", tmp_path, str(invoices_dir)]
+    destination = tmp_path / today2ymd() / invoices_dir.name
+
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 0
+    journal = Path(f"{destination}.journal.jsonl")
+    assert len(journal.read_text().splitlines()) == 3
+
+    # documents which were already copied aren't copied again
+    (destination / "document02.docx").write_text("copied")
+    result = runner.invoke(cli, [*args, "--resume"])
+    assert result.exit_code == 0
+    assert (destination / "document02.docx").read_text() == "copied"
+    assert len(journal.read_text().splitlines()) == 3
+
+
+def test_hashes_resume(invoices_dir, tmp_path):
+    runner = CliRunner()
+    args = ["hashes", "--output-directory", tmp_path, str(invoices_dir)]
+
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 0
+    hashes = json.loads((tmp_path / today2ymd() / "hashes.json").read_text())
+
+    result = runner.invoke(cli, [*args, "--resume"])
+    assert result.exit_code == 0
+    journal = tmp_path / today2ymd() / "hashes.journal.jsonl"
+    assert len(journal.read_text().splitlines()) == 3
+    assert json.loads((tmp_path / today2ymd() / "hashes.json").read_text()) == hashes
+
+
+def test_hashes_resume_leaves_out_deleted_files(tmp_path):
+    start_dir = tmp_path / "invoices"
+    start_dir.mkdir()
+    for name in ("a.doc", "b.doc"):
+        (start_dir / name).write_text("invoice")
+    output_directory = tmp_path / "output"
+    runner = CliRunner()
+    args = ["hashes", "--output-directory", output_directory, str(start_dir)]
+
+    result = runner.invoke(cli, args)
+    assert result.exit_code == 0
+    (start_dir / "b.doc").unlink()
+    result = runner.invoke(cli, [*args, "--resume"])
+
+    assert result.exit_code == 0
+    hashes = json.loads((output_directory / today2ymd() / "hashes.json").read_text())
+    assert list(hashes.values()) == [[(start_dir / "a.doc").as_posix()]]
+    duplicates = output_directory / today2ymd() / "duplicates.json"
+    assert json.loads(duplicates.read_text()) == {}
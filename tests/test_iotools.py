@@ -1,13 +1,27 @@
+import inspect
+import os
+import sys
 from pathlib import Path
 
 import pytest
 
+from invoicetool import iotools
+from invoicetool.inventory import FileInventory
 from invoicetool.iotools import (
+    JsonlWriter,
+    copy_file,
+    copy_files,
     directory_is_empty,
     ensure_dir,
+    filter_filepaths_of_interest,
+    get_filepaths_of_interest,
     get_relative_filepath,
+    is_empty_file,
     pathify,
+    read_jsonl,
     remove_empty_directories,
+    scan_files,
+    scantree,
     yield_dirs,
 )
 
@@ -42,41 +56,94 @@ def test_pathify_type():
     assert isinstance(pathify("~/test"), Path)
 
 
-# def test_scantree(invoices_dir):
-#     with tempfile.TemporaryDirectory() as tmpdirname:
-#         # Create a directory with a nested subdirectory and some files
-#         Path(tmpdirname + "/dir1/dir2").mkdir(parents=True, exist_ok=True)
-#         Path(tmpdirname + "/file1.txt").write_text("file1 contents")
-#         Path(tmpdirname + "/dir1/file2.txt").write_text("file2 contents")
-#         Path(tmpdirname + "/dir1/dir2/file3.txt").write_text("file3 contents")
+def test_scantree(tmp_path: Path):
+    (tmp_path / "dir1" / "dir2").mkdir(parents=True)
+    (tmp_path / "file1.txt").write_text("file1 contents")
+    (tmp_path / "dir1" / "file2.txt").write_text("file2 contents")
+    (tmp_path / "dir1" / "dir2" / "file3.txt").write_text("file3 contents")
+
+    assert set(scantree(tmp_path)) == {
+        tmp_path / "file1.txt",
+        tmp_path / "dir1" / "file2.txt",
+        tmp_path / "dir1" / "dir2" / "file3.txt",
+    }
+
+
+def test_scan_files_deep_tree(tmp_path: Path):
+    directory = tmp_path
+    for _ in range(200):
+        directory = directory / "d"
+        directory.mkdir()
+    (directory / "invoice.doc").touch()
+
+    # a recursive walk of this tree would exceed the recursion limit
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(len(inspect.stack()) + 50)
+    try:
+        entries = list(scan_files(tmp_path, {".doc"}))
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+    assert [entry.name for entry in entries] == ["invoice.doc"]
+
+
+def test_scan_files_skips_missing_directories(tmp_path: Path, monkeypatch):
+    (tmp_path / "kept").mkdir()
+    (tmp_path / "kept" / "document01.doc").write_text("invoice")
+    (tmp_path / "removed").mkdir()
+    scandir = os.scandir
+
+    def scandir_after_rmdir(path):
+        # the directory is removed after it was listed, but before it's scanned
+        if os.path.basename(path) == "removed":
+            os.rmdir(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", scandir_after_rmdir)
+
+    with pytest.raises(FileNotFoundError):
+        list(scan_files(tmp_path))
+    (tmp_path / "removed").mkdir()
+    entries = list(scan_files(tmp_path, skip_missing=True))
+
+    assert [entry.name for entry in entries] == ["document01.doc"]
+    assert list(scan_files(tmp_path / "missing", skip_missing=True)) == []
+
+
+def test_filter_filepaths_of_interest(tmp_path: Path, monkeypatch):
+    filepaths = []
+    for name in ("document01.doc", "~$document02.doc", "document03.doc", "notes.txt"):
+        filepaths.append(tmp_path / name)
+        filepaths[-1].write_text("invoice")
+
+    def is_empty_file(path: Path) -> bool:
+        if path.name.startswith("~$"):
+            # e.g., a Word lock file removed between the two checks
+            raise FileNotFoundError(path)
+        if path.name == "document03.doc":
+            raise PermissionError(path)
+        return False
+
+    monkeypatch.setattr(iotools, "is_empty_file", is_empty_file)
+    errors = []
+
+    kept = filter_filepaths_of_interest(
+        filepaths, {".doc"}, on_error=lambda path, e: errors.append(path)
+    )
 
-#         # Test scanning the directory tree for all files
-#         filepaths = [str(p) for p in scantree(tmpdirname)]
-#         assert set(filepaths) == set(
-#             [
-#                 tmpdirname + "/file1.txt",
-#                 tmpdirname + "/dir1/file2.txt",
-#                 tmpdirname + "/dir1/dir2/file3.txt",
-#             ]
-#         )
+    assert list(kept) == [tmp_path / "document01.doc"]
+    assert errors == [tmp_path / "document03.doc"]
+    with pytest.raises(PermissionError):
+        list(filter_filepaths_of_interest(filepaths, {".doc"}))
 
 
-# def test_get_filepaths_of_interest():
-#     with tempfile.TemporaryDirectory() as tmpdirname:
-#         # Create a directory with some temporary MS Word files
-#         Path(tmpdirname + "/~$temp1.doc").write_text("temporary file")
-#         Path(tmpdirname + "/~$temp2.docx").write_text("temporary file")
-#         Path(tmpdirname + "/file1.txt").write_text("file1 contents")
-#         Path(tmpdirname + "/file2.pdf").write_text("file2 contents")
+def test_get_filepaths_of_interest(tmp_path: Path):
+    (tmp_path / "~$temp1.doc").write_bytes(b"0" * 162)
+    (tmp_path / "~$temp2.docx").write_text("not an empty temporary file")
+    (tmp_path / "file1.doc").write_text("file1 contents")
+    (tmp_path / "file2.pdf").write_text("file2 contents")
 
-#         # Test getting the filepaths of interest
-#         filepaths = [str(p) for p in get_filepaths_of_interest(tmpdirname, [".doc", ".docx"])]
-#         assert set(filepaths) == set(
-#             [
-#                 tmpdirname + "/~$temp1.doc",
-#                 tmpdirname + "/~$temp2.docx",
-#             ]
-#         )
+    filepaths = set(get_filepaths_of_interest(tmp_path, {".doc", ".docx"}))
+    assert filepaths == {tmp_path / "~$temp2.docx", tmp_path / "file1.doc"}
 
 
 # def test_remove_temporary_word_files():
@@ -99,16 +166,16 @@ def test_pathify_type():
 #         )
 
 
-# def test_is_empty_file():
-#     with tempfile.TemporaryDirectory() as tmpdirname:
-#         # Create a temporary MS Word file and a regular file
-#         Path(tmpdirname + "/~$temp.doc").write_text("temporary file")
-#         Path(tmpdirname + "/file1.txt").write_text("file1 contents")
+def test_is_empty_file(tmp_path: Path):
+    (tmp_path / "~$temp.doc").write_bytes(b"0" * 162)
+    (tmp_path / "file1.doc").write_bytes(b"0" * 162)
 
-#         # Test that the temporary MS Word file is detected as empty
-#         assert is_empty_file(Path(tmpdirname + "/~$temp.doc")) == True
+    assert is_empty_file(tmp_path / "~$temp.doc")
+    assert not is_empty_file(tmp_path / "file1.doc")
 
-#         # Test that the regular file is not detected as empty
+    entries = {entry.name: entry for entry in scan_files(tmp_path)}
+    assert is_empty_file(entries["~$temp.doc"])
+    assert not is_empty_file(entries["file1.doc"])
 
 
 def test_directory_is_empty(empty_directory: Path, non_empty_directory: Path):
@@ -168,3 +235,84 @@ def test_get_relative_filepath(filepath, starting_directory, expected_filepath):
         get_relative_filepath(Path(filepath), str(starting_directory.name))
         == expected_filepath
     )
+
+
+def test_copy_file_preserves_contents_and_metadata(tmp_path: Path):
+    src = tmp_path / "invoice.doc"
+    src.write_bytes(b"invoice" * 10_000)
+    os.utime(src, ns=(1_000_000_000, 1_000_000_000))
+    dst = tmp_path / "copy.doc"
+
+    assert copy_file(src, dst) == 70_000
+    assert dst.read_bytes() == src.read_bytes()
+    assert dst.stat().st_mtime_ns == src.stat().st_mtime_ns
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "copy_file_range"), reason="copy_file_range isn't available"
+)
+def test_copy_file_when_copy_file_range_copies_nothing(tmp_path: Path, monkeypatch):
+    src = tmp_path / "invoice.doc"
+    src.write_bytes(b"invoice" * 10_000)
+    dst = tmp_path / "copy.doc"
+    monkeypatch.setattr(iotools, "_reflink", lambda src_fd, dst_fd: False)
+    # e.g., a file on procfs, which reads as empty to copy_file_range
+    monkeypatch.setattr(os, "copy_file_range", lambda src_fd, dst_fd, count: 0)
+
+    assert copy_file(src, dst) == 70_000
+    assert dst.read_bytes() == src.read_bytes()
+
+    # a copy which stops part of the way through fails, rather than truncating
+    counts = iter([1000, 0])
+    monkeypatch.setattr(
+        os, "copy_file_range", lambda src_fd, dst_fd, count: next(counts)
+    )
+    with pytest.raises(OSError):
+        copy_file(src, dst)
+    assert dst.read_bytes() == src.read_bytes()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "copy.doc",
+        "invoice.doc",
+    ]
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_copy_files(tmp_path: Path, jobs: int):
+    start_dir = tmp_path / "books"
+    filepaths = []
+    for i in range(10):
+        filepath = start_dir / f"level{i % 3}" / f"document{i}.doc"
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_text(f"invoice {i}")
+        filepaths.append(filepath)
+    destination = tmp_path / "dump" / "books"
+
+    inventory = FileInventory.from_filepaths(filepaths)
+    copied = []
+
+    stats = copy_files(
+        destination, inventory, [9, 0, 4], jobs=jobs, on_copied=copied.append
+    )
+
+    assert stats.files == 3
+    assert copied == [9, 0, 4]
+    assert not (destination / filepaths[1].relative_to(start_dir)).exists()
+
+    stats = copy_files(destination, inventory, jobs=jobs)
+
+    assert stats.files == 10
+    assert stats.bytes == sum(filepath.stat().st_size for filepath in filepaths)
+    for filepath in filepaths:
+        copied = destination / filepath.relative_to(start_dir)
+        assert copied.read_text() == filepath.read_text()
+
+
+def test_jsonl_append_after_partial_line(tmp_path: Path):
+    filepath = tmp_path / "records.jsonl"
+    filepath.write_text('{"a": 1}\n{"a": 2}\n{"a"')
+    assert list(read_jsonl(filepath)) == [{"a": 1}, {"a": 2}]
+
+    with JsonlWriter(filepath, append=True) as writer:
+        writer.write({"a": 3})
+
+    assert list(read_jsonl(filepath)) == [{"a": 1}, {"a": 2}, {"a": 3}]
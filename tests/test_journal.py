@@ -0,0 +1,30 @@
+import os
+from pathlib import Path
+
+from invoicetool.journal import Journal
+
+
+def test_journal_resume(tmp_path: Path):
+    filepath = tmp_path / "run.journal.jsonl"
+    document = tmp_path / "document.docx"
+    document.write_bytes(b"contents")
+    stat = os.stat(document)
+
+    with Journal(filepath, context={"hash_function": "sha1"}) as journal:
+        journal.record(document.as_posix(), stat, hash="abc")
+
+    with Journal(filepath, resume=True, context={"hash_function": "sha1"}) as journal:
+        assert journal.is_done(document.as_posix(), stat)
+        assert journal.completed[document.as_posix()]["hash"] == "abc"
+
+    # a different hash function, or a modified file, has to be redone
+    with Journal(filepath, resume=True, context={"hash_function": "md5"}) as journal:
+        assert not journal.is_done(document.as_posix(), stat)
+    document.write_bytes(b"new contents")
+    with Journal(filepath, resume=True, context={"hash_function": "sha1"}) as journal:
+        assert not journal.is_done(document.as_posix(), os.stat(document))
+
+    # without `resume` the journal is started afresh
+    with Journal(filepath) as journal:
+        assert not journal.completed
+    assert filepath.read_text() == ""
@@ -0,0 +1,51 @@
+import json
+
+from click.testing import CliRunner
+
+from invoicetool.cli import cli
+from invoicetool.dates_times import today2ymd
+from invoicetool.profiling import Profiler
+
+
+def test_profiler_stages():
+    profiler = Profiler(enabled=True)
+    profiler.start()
+
+    with profiler.stage("outer") as outer:
+        outer.add(files=2)
+        for _ in range(2):
+            with profiler.stage("inner") as inner:
+                inner.add(files=1, bytes=10)
+
+    assert list(profiler.stages) == ["outer/inner", "outer"]
+    assert profiler.stages["outer"]["files"] == 2
+    assert profiler.stages["outer/inner"]["bytes"] == 20
+    assert (
+        profiler.stages["outer"]["wall_seconds"]
+        >= profiler.stages["outer/inner"]["wall_seconds"]
+    )
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+
+    with profiler.stage("stage") as stage:
+        stage.add(files=1)
+
+    assert profiler.stages == {}
+
+
+def test_hashes_profile(invoices_dir, tmp_path):
+    runner = CliRunner()
+
+    result = runner.invoke(
+        cli, ["--cprofile", "hashes", "-o", tmp_path, str(invoices_dir)]
+    )
+
+    assert result.exit_code == 0
+    profile_filepath = tmp_path / today2ymd() / "hashes.profile.json"
+    profile = json.loads(profile_filepath.read_text())
+    assert profile["command"] == "hashes"
+    assert set(profile["stages"]) == {"hash", "hash/scan"}
+    assert profile["stages"]["hash"]["files"] == 3
+    assert profile_filepath.with_suffix(".pstats").exists()
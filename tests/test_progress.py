@@ -0,0 +1,65 @@
+import io
+import logging
+
+from invoicetool.progress import Progress
+
+
+class TTY(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+def test_progress_format():
+    progress = Progress(logging.getLogger("test"), stream=io.StringIO())
+    progress.begin("copy", total_files=4, total_bytes=4_000_000)
+    progress.update(bytes=1_000_000)
+
+    line = progress.format(progress._start + 2)
+
+    assert line == (
+        "copy: 1/4 files (25%), 1.0/4.0 MB, 0.5 files/s, 0.5 MB/s, ETA 0:00:06"
+    )
+
+
+def test_progress_logs_each_phase_when_not_a_tty():
+    handler = ListHandler()
+    # not registered with `logging`, so unaffected by `get_logger` in other tests
+    logger = logging.Logger("progress")
+    logger.addHandler(handler)
+    progress = Progress(logger, stream=io.StringIO())
+
+    with progress:
+        progress.begin("scan")
+        progress.update(files=10)
+        progress.begin("hash", total_files=10)
+        for _ in range(10):
+            progress.update()
+
+    assert [message.split(",")[0] for message in handler.messages] == [
+        "→ scan: 10 files",
+        "→ hash: 10/10 files (100%)",
+    ]
+
+
+def test_progress_redraws_a_line_on_a_tty():
+    stream = TTY()
+    progress = Progress(logging.getLogger("test"), stream=stream, interval=0)
+
+    progress.begin("hash", total_files=2 * Progress.CHECK_EVERY)
+    for _ in range(2 * Progress.CHECK_EVERY):
+        progress.update()
+    progress.end()
+
+    lines = stream.getvalue().split("\r")[1:]
+    assert len(lines) == 3
+    assert lines[0].startswith("hash: 64/128 files (50%)")
+    assert lines[-1].endswith("\n")
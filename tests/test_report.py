@@ -0,0 +1,164 @@
+import csv
+import json
+import os
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from invoicetool.cli import cli
+from invoicetool.dates_times import today2ymd
+from invoicetool.hashes import hash_inventory
+from invoicetool.inventory import FileInventory
+from invoicetool.iotools import scan_files
+from invoicetool.report import (
+    duplicate_report,
+    format_bytes,
+    inventory_from_duplicates,
+    write_report,
+)
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def duplicates_dir(tmp_path: Path) -> Path:
+    """Create a directory with two groups of duplicates, where the copy in
+    `originals` is the oldest of each group"""
+    start_dir = tmp_path / "documents"
+    for directory in ("originals", "copies", "more_copies"):
+        (start_dir / directory).mkdir(parents=True)
+    contents = {"small.doc": b"x" * 10, "large.doc": b"y" * 1000, "unique.doc": b"z"}
+    for mtime, directory in enumerate(("originals", "copies", "more_copies")):
+        for name, content in contents.items():
+            if directory == "more_copies" and name != "small.doc":
+                continue
+            if directory != "originals" and name == "unique.doc":
+                continue
+            filepath = start_dir / directory / name
+            filepath.write_bytes(content)
+            os.utime(filepath, ns=(mtime * 10**9, mtime * 10**9))
+    return start_dir
+
+
+def test_duplicate_report(duplicates_dir: Path):
+    inventory = FileInventory.from_entries(scan_files(duplicates_dir))
+    hash_inventory(inventory, "sha1")
+
+    report = duplicate_report(inventory)
+
+    assert report.groups == 2
+    assert report.duplicate_files == 5
+    assert report.redundant_files == 3
+    assert report.reclaimable_bytes == 1000 + 2 * 10
+    # ranked by reclaimable space, with the oldest copy kept
+    large, small = report.top_groups
+    assert (large.size, large.copies, large.reclaimable_bytes) == (1000, 2, 1000)
+    assert (small.size, small.copies, small.reclaimable_bytes) == (10, 3, 20)
+    assert Path(small.paths[0]) == duplicates_dir / "originals" / "small.doc"
+    assert (small.oldest_mtime_ns, small.newest_mtime_ns) == (0, 2 * 10**9)
+    assert [
+        (Path(waste.directory).name, waste.redundant_files, waste.reclaimable_bytes)
+        for waste in report.top_directories
+    ] == [("copies", 2, 1010), ("more_copies", 1, 10)]
+
+    top = duplicate_report(inventory, top=1)
+    assert top.top_groups == [large]
+    assert len(top.top_directories) == 1
+    assert top.reclaimable_bytes == report.reclaimable_bytes
+
+
+def test_inventory_from_duplicates(duplicates_dir: Path):
+    small = [
+        (duplicates_dir / directory / "small.doc").as_posix()
+        for directory in ("originals", "copies", "more_copies")
+    ]
+    duplicates = {"aa" * 20: small, "bb" * 20: small[:1] + ["missing.doc"]}
+
+    report = duplicate_report(inventory_from_duplicates(duplicates, "sha1"))
+
+    # the second group lost its only copy
+    assert report.groups == 1
+    assert report.top_groups[0].paths == small
+
+
+@pytest.mark.parametrize("report_format", ["html", "csv", "json"])
+def test_report_command(duplicates_dir: Path, tmp_path: Path, report_format: str):
+    output_directory = tmp_path / "output"
+
+    result = CliRunner().invoke(
+        cli,
+        [
+            "report",
+            "-o",
+            str(output_directory),
+            "--format",
+            report_format,
+            str(duplicates_dir),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    report_filepath = (
+        output_directory / today2ymd() / f"duplicates_report.{report_format}"
+    )
+    if report_format == "json":
+        report = json.loads(report_filepath.read_text())
+        assert report["reclaimable_bytes"] == 1020
+        assert [group["copies"] for group in report["top_groups"]] == [2, 3]
+    elif report_format == "csv":
+        with open(report_filepath, newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 5
+        assert [row["keep"] for row in rows].count("True") == 2
+    else:
+        assert "1020 B" in report_filepath.read_text()
+
+
+def test_report_command_with_duplicates_file(duplicates_dir: Path, tmp_path: Path):
+    output_directory = tmp_path / "output"
+    small = (duplicates_dir / "originals" / "small.doc").as_posix()
+    copy = (duplicates_dir / "copies" / "small.doc").as_posix()
+    duplicates_filepath = tmp_path / "duplicates.json"
+    duplicates_filepath.write_text(json.dumps({"aa" * 16: [small, copy]}))
+
+    result = CliRunner().invoke(
+        cli,
+        [
+            "report",
+            "-o",
+            str(output_directory),
+            "--format",
+            "json",
+            "--duplicates",
+            str(duplicates_filepath),
+            "-a",
+            "md5",
+            str(duplicates_dir),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    report_filepath = output_directory / today2ymd() / "duplicates_report.json"
+    report = json.loads(report_filepath.read_text())
+    assert report["hash_function"] == "md5"
+    assert report["top_groups"][0]["paths"] == [small, copy]
+
+
+def test_write_report_escapes_html(tmp_path: Path):
+    inventory = FileInventory()
+    for name in ("<a>.doc", "b.doc"):
+        filepath = tmp_path / name
+        filepath.write_text("same")
+        inventory.add(filepath.as_posix(), filepath.stat())
+    inventory.set_digests("md5", ["00" * 16] * 2)
+
+    (filepath,) = write_report(duplicate_report(inventory), tmp_path, "html")
+
+    assert "&lt;a&gt;.doc" in filepath.read_text()
+
+
+def test_format_bytes():
+    assert format_bytes(512) == "512 B"
+    assert format_bytes(1536) == "1.5 KB"
+    assert format_bytes(3 * 1024**3) == "3.0 GB"
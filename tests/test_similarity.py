@@ -0,0 +1,78 @@
+import io
+import json
+import random
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from invoicetool.cli import cli
+from invoicetool.dates_times import today2ymd
+from invoicetool.similarity import choose_bands, find_near_duplicates, shingles
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def documents() -> dict[str, list[str]]:
+    rng = random.Random(0)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    documents = {
+        f"invoice{i}.doc": [" ".join(rng.choices(vocabulary, k=100))] for i in range(50)
+    }
+    words = documents["invoice7.doc"][0].split()
+    # the same invoice, re-saved with a different date & a change in spacing
+    documents["invoice7.docx"] = [
+        " ".join(words[:50]),
+        "  ".join(words[50:-1] + ["2024"]),
+    ]
+    documents["empty.doc"] = []
+    return documents
+
+
+def test_shingles():
+    assert shingles(["A b  c", "d e f"], k=5) == shingles(["a b c d e f"], k=5)
+    assert len(shingles(["a b c d e f"], k=5)) == 2
+    assert len(shingles(["a b"], k=5)) == 1
+    assert shingles([], k=5) == set()
+
+
+def test_choose_bands():
+    bands = choose_bands(128, 0.8)
+    rows = 128 // bands
+    assert (1 / bands) ** (1 / rows) <= 0.8
+
+
+def test_find_near_duplicates(documents):
+    clusters = find_near_duplicates(documents, threshold=0.8)
+    assert [sorted(cluster) for cluster in clusters] == [
+        ["invoice7.doc", "invoice7.docx"]
+    ]
+
+
+def test_find_near_duplicates_threshold(documents):
+    assert find_near_duplicates(documents, threshold=1.0) == []
+
+
+def test_near_duplicates_command(tmp_path: Path, docx_bytes: io.BytesIO):
+    start_dir = tmp_path / "books"
+    start_dir.mkdir()
+    (start_dir / "document01.docx").write_bytes(docx_bytes.getvalue())
+    (start_dir / "document02.docx").write_bytes(docx_bytes.getvalue())
+    output_directory = tmp_path / "output"
+    runner = CliRunner()
+
+    result = runner.invoke(
+        cli, ["near-duplicates", "-o", output_directory, str(start_dir)]
+    )
+
+    assert result.exit_code == 0
+    clusters = json.loads(
+        (output_directory / today2ymd() / "near_duplicates.json").read_text()
+    )
+    assert clusters == [
+        [
+            (start_dir / "document01.docx").as_posix(),
+            (start_dir / "document02.docx").as_posix(),
+        ]
+    ]
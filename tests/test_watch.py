@@ -0,0 +1,215 @@
+import errno
+import logging
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+import invoicetool.iotools
+import invoicetool.watch
+from invoicetool.cli import cli
+from invoicetool.dates_times import today2ymd
+from invoicetool.watch import (
+    Ingester,
+    InotifyWatcher,
+    PollingWatcher,
+    inotify_available,
+    iter_batches,
+    open_watcher,
+)
+
+
+class ScriptedWatcher:
+    """A watcher which reports `(delay, paths)` events on a fake clock"""
+
+    def __init__(self, events: list[tuple[float, list[str]]], monkeypatch):
+        self.events = events
+        self.now = 0.0
+        monkeypatch.setattr(invoicetool.watch.time, "monotonic", lambda: self.now)
+
+    def read(self, timeout: float | None) -> list[str]:
+        if not self.events:
+            self.now += timeout
+            return []
+        delay, paths = self.events[0]
+        if timeout is not None and timeout < delay:
+            self.now += timeout
+            self.events[0] = (delay - timeout, paths)
+            return []
+        self.now += delay
+        self.events.pop(0)
+        return paths
+
+    def close(self) -> None:
+        pass
+
+
+def test_iter_batches_debounces_events(monkeypatch):
+    watcher = ScriptedWatcher(
+        [(0, ["a.doc"]), (1, ["b.doc", "a.doc"]), (1, ["c.doc"]), (10, ["d.doc"])],
+        monkeypatch,
+    )
+    batches = iter_batches(watcher, debounce=2)
+
+    assert next(batches) == [Path("a.doc"), Path("b.doc"), Path("c.doc")]
+    assert watcher.now == 4
+    assert next(batches) == [Path("d.doc")]
+
+
+def test_iter_batches_max_delay(monkeypatch):
+    # events which never stop still produce a batch after `max_delay`
+    watcher = ScriptedWatcher([(1, [f"{i}.doc"]) for i in range(20)], monkeypatch)
+
+    batch = next(iter_batches(watcher, debounce=2, max_delay=5))
+
+    assert batch == [Path(f"{i}.doc") for i in range(6)]
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify isn't available")
+def test_inotify_watcher(tmp_path: Path):
+    watcher = InotifyWatcher(tmp_path)
+    try:
+        (tmp_path / "document01.docx").write_text("invoice")
+        assert watcher.read(timeout=1) == [(tmp_path / "document01.docx").as_posix()]
+
+        # files in new directories are reported, and the directory is watched
+        (tmp_path / "nested").mkdir()
+        assert watcher.read(timeout=1) == []
+        (tmp_path / "nested" / "document02.doc").write_text("invoice")
+        assert watcher.read(timeout=1) == [
+            (tmp_path / "nested" / "document02.doc").as_posix()
+        ]
+        assert watcher.read(timeout=0) == []
+    finally:
+        watcher.close()
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify isn't available")
+def test_inotify_watcher_ignores_removed_directories(tmp_path: Path):
+    watcher = InotifyWatcher(tmp_path)
+    try:
+        # e.g., an editor's temporary directory
+        (tmp_path / "temporary").mkdir()
+        (tmp_path / "temporary").rmdir()
+        assert watcher.read(timeout=1) == []
+
+        (tmp_path / "document01.docx").write_text("invoice")
+        assert watcher.read(timeout=1) == [(tmp_path / "document01.docx").as_posix()]
+    finally:
+        watcher.close()
+
+
+@pytest.fixture
+def logger(monkeypatch) -> logging.Logger:
+    """A logger which hasn't been disabled by the CLI's logging config"""
+    logger = logging.getLogger("test_watch")
+    monkeypatch.setattr(logger, "disabled", False)
+    return logger
+
+
+def _raise_watch_limit(self, directory: str) -> None:
+    raise OSError(errno.ENOSPC, "The inotify watch limit was reached")
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify isn't available")
+def test_open_watcher_falls_back_to_polling(
+    tmp_path: Path, monkeypatch, caplog, logger: logging.Logger
+):
+    monkeypatch.setattr(InotifyWatcher, "_add_watch", _raise_watch_limit)
+
+    watcher = open_watcher(tmp_path, {".doc"}, logger=logger)
+
+    assert isinstance(watcher, PollingWatcher)
+    assert "watch limit was reached" in caplog.text
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify isn't available")
+def test_inotify_watcher_falls_back_to_polling(
+    tmp_path: Path, monkeypatch, caplog, logger: logging.Logger
+):
+    watcher = InotifyWatcher(tmp_path, {".doc"}, poll_interval=0, logger=logger)
+    try:
+        monkeypatch.setattr(InotifyWatcher, "_add_watch", _raise_watch_limit)
+        (tmp_path / "nested").mkdir()
+        (tmp_path / "nested" / "document01.doc").write_text("invoice")
+
+        # every file is reported, as changes in the new directory may be missed
+        assert watcher.read(timeout=1) == [
+            (tmp_path / "nested" / "document01.doc").as_posix()
+        ]
+        assert "falling back to polling" in caplog.text
+        (tmp_path / "nested" / "document02.doc").write_text("invoice")
+        assert watcher.read(timeout=0) == [
+            (tmp_path / "nested" / "document02.doc").as_posix()
+        ]
+    finally:
+        watcher.close()
+
+
+def test_polling_watcher(tmp_path: Path):
+    (tmp_path / "document01.docx").write_text("invoice")
+    watcher = PollingWatcher(tmp_path, {".docx"}, interval=0)
+
+    assert watcher.read(timeout=0) == []
+    (tmp_path / "document02.docx").write_text("invoice")
+    (tmp_path / "spreadsheet01.xls").write_text("not a document")
+    assert watcher.read(timeout=0) == [(tmp_path / "document02.docx").as_posix()]
+
+
+def test_ingester(invoices_dir: Path, tmp_path: Path):
+    filepaths = [
+        invoices_dir / "document01.doc",
+        invoices_dir / "spreadsheet01.xls",
+        invoices_dir / "missing.doc",
+    ]
+
+    with Ingester(invoices_dir, tmp_path, {".doc", ".docx"}, "sha1") as ingester:
+        assert ingester.ingest(filepaths) == {"hashed": 1, "copied": 1}
+        # unchanged documents aren't hashed or copied again
+        assert ingester.ingest(filepaths) == {"hashed": 0, "copied": 0}
+
+    output_directory = tmp_path / today2ymd() / invoices_dir.name
+    assert (output_directory / "document01.doc").exists()
+    assert len((tmp_path / today2ymd() / "hashes.jsonl").read_text().splitlines()) == 1
+
+
+def test_ingester_skips_unreadable_files(
+    invoices_dir: Path, tmp_path: Path, monkeypatch, caplog, logger: logging.Logger
+):
+    filepaths = [invoices_dir / "document01.doc", invoices_dir / "document02.docx"]
+
+    def calculate_hash(filepath: Path, hash_function: str) -> str:
+        if filepath.name == "document01.doc":
+            raise FileNotFoundError(filepath)
+        return "0" * 40
+
+    def copy_file(src: Path, dst: Path) -> int:
+        raise PermissionError(src)
+
+    monkeypatch.setattr(invoicetool.watch, "calculate_hash", calculate_hash)
+    monkeypatch.setattr(invoicetool.iotools, "copy_file", copy_file)
+
+    with Ingester(
+        invoices_dir,
+        tmp_path,
+        {".doc", ".docx"},
+        "sha1",
+        logger=logger,
+    ) as ingester:
+        assert ingester.ingest(filepaths) == {"hashed": 1, "copied": 0}
+
+    assert "Skipping" in caplog.text and "document01.doc" in caplog.text
+    assert "document02.docx" in caplog.text
+
+
+def test_watch_command(invoices_dir: Path, tmp_path: Path):
+    runner = CliRunner()
+
+    result = runner.invoke(
+        cli,
+        ["watch", "--max-batches", "0", "-o", tmp_path, str(invoices_dir)],
+    )
+
+    assert result.exit_code == 0
+    hashes = (tmp_path / today2ymd() / "hashes.jsonl").read_text().splitlines()
+    assert len(hashes) == 3
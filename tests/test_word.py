@@ -1,6 +1,9 @@
+import io
 from pathlib import Path
 
 import pytest
+from docx import Document
+from docx.enum.text import WD_BREAK
 
 from invoicetool.word import (
     extract_text_from_doc,
@@ -8,6 +11,7 @@ from invoicetool.word import (
     extract_text_from_document,
     extract_text_from_docx,
     extract_text_from_docx_as_list,
+    iter_docx_paragraphs,
     text_to_paragraphs,
 )
 
@@ -34,6 +38,34 @@ def test_extract_text_from_docx(docx_bytes):
     assert extract_text_from_docx(docx_bytes) == expected
 
 
+def test_fast_extract_text_from_docx(docx_bytes):
+    expected = "This is the first paragraph.\nThis is the second paragraph."
+    assert extract_text_from_docx(docx_bytes, fast=True) == expected
+
+
+def test_fast_extract_matches_python_docx():
+    doc = Document()
+    doc.add_paragraph("Invoice   no.\t123")
+    paragraph = doc.add_paragraph("line one")
+    paragraph.add_run().add_break()
+    paragraph.add_run("line two")
+    paragraph.add_run().add_break(WD_BREAK.PAGE)
+    paragraph.add_run("after the page break")
+    doc.add_paragraph("")
+    doc.add_table(rows=1, cols=1).cell(0, 0).text = "not a body paragraph"
+    doc.add_paragraph("  last  ")
+    with io.BytesIO() as document_buffer:
+        doc.save(document_buffer)
+        document_bytes = document_buffer.getvalue()
+
+    assert list(iter_docx_paragraphs(io.BytesIO(document_bytes))) == [
+        p.text for p in Document(io.BytesIO(document_bytes)).paragraphs
+    ]
+    assert extract_text_from_docx(
+        io.BytesIO(document_bytes), fast=True
+    ) == extract_text_from_docx(io.BytesIO(document_bytes))
+
+
 def test_extract_text_from_docx_non_existent_file(tmp_path):
     filepath = tmp_path / "nonexistent.docx"
     with pytest.raises(FileNotFoundError):